@@ -1,18 +1,151 @@
 import streamlit as st
-from groq import Groq
-import json, re, os, base64
+import json, os, hashlib, time, uuid
 import streamlit.components.v1 as components
+from spamshield import Detector, VerdictCache
+from spamshield.backends import load as load_backend
+from spamshield.batch import read_messages
+from spamshield.budget import STATS as budget_stats, TOKEN_BUDGET
+from spamshield.campaigns import CampaignIndex
+from spamshield.decision import BAND, Calibration
+from spamshield.history import HistoryStore
+from spamshield.imaging import UNREADABLE, prepare as prepare_image, thumbnail
+from spamshield.metrics import METRICS, component_collector
+from spamshield.models import Router
+from spamshield.ocr import OCR, available as ocr_available
+from spamshield.parsing import STATS as parse_stats
+from spamshield.prompts import CONTENT_TYPES, MODES, Settings
+from spamshield.rules import RuleEngine
+from spamshield.samples import SAMPLES
+from spamshield.transport import ResilientCaller
+from spamshield.urls import Blocklist, UrlAnalyzer
 
 st.set_page_config(page_title="SpamShield AI", page_icon="🛡️", layout="centered")
 
+# ── Rerun meter ───────────────────────────────────────────────────────
+def _meter():
+    """Count the bytes of every message this session sends (cached-message references count as sent).
+
+    Wraps Streamlit's private ``ScriptRunContext._enqueue`` on every run, so it
+    is a debugging aid behind ``SPAMSHIELD_RERUN_BYTES=1``; runs are timed either way.
+    """
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(); inner = ctx._enqueue
+    except Exception:   # private API; fall back to timing only
+        return None
+    while hasattr(inner, "inner"): inner = inner.inner
+    sent = {"bytes": 0}
+    def enqueue(msg):
+        sent["bytes"] += msg.ByteSize(); inner(msg)
+    enqueue.inner = inner
+    ctx._enqueue = enqueue
+    return sent
+_sent = _meter() if os.environ.get("SPAMSHIELD_RERUN_BYTES") == "1" else None
+
+def _sent_bytes():
+    return _sent["bytes"] if _sent else 0
+
+def _fragment_run():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    return bool(getattr(get_script_run_ctx(), "fragment_ids_this_run", None))
+
+def _record_rerun(kind, t0, b0=0):
+    """Server time and bytes sent for one full run or fragment run (last 20 kept)."""
+    perf = st.session_state.setdefault("perf", [])
+    perf.append({"kind": kind, "ms": (time.perf_counter() - t0) * 1000,
+                 "kb": (_sent_bytes() - b0) / 1024 if _sent else None})
+    del perf[:-20]
+_rerun_t0 = time.perf_counter()
+
+backend_spec = os.environ.get("SPAMSHIELD_BACKEND", "groq")
 api_key = os.environ.get("GROQ_API_KEY")
 if not api_key:
     try: api_key = st.secrets["GROQ_API_KEY"]
     except: pass
-if not api_key:
+if not api_key and backend_spec.partition(":")[0] == "groq":
     st.error("⚠️ GROQ_API_KEY missing.")
     st.stop()
-client = Groq(api_key=api_key)
+
+@st.cache_resource
+def _backend(spec, key):
+    # One per process: the client's connection pool, or the loaded local model, is shared by every session.
+    return load_backend(spec, api_key=key, max_retries=0)   # retries live in the shared caller
+backend = _backend(backend_spec, api_key)
+
+@st.cache_resource
+def _caller():
+    # Shared by all sessions so the breaker and latency window see all traffic.
+    # Hedges interactive calls only; Detector.bulk runs batches through caller.plain().
+    return ResilientCaller(timeout=float(os.environ.get("SPAMSHIELD_TIMEOUT", 20)),
+                           retries=int(os.environ.get("SPAMSHIELD_RETRIES", 3)), hedge=True)
+caller = _caller()
+
+@st.cache_resource
+def _verdict_cache():
+    # One cache per server process, shared by every session.
+    return VerdictCache(maxsize=int(os.environ.get("SPAMSHIELD_CACHE_SIZE", 2048)),
+                        ttl=float(os.environ.get("SPAMSHIELD_CACHE_TTL", 86400)),
+                        path=os.environ.get("SPAMSHIELD_CACHE_DB") or None)
+cache = _verdict_cache()
+
+@st.cache_resource
+def _history_store():
+    # Shared by every session; the session id below scopes what each one sees.
+    return HistoryStore(os.environ.get("SPAMSHIELD_HISTORY_DB", "spamshield_history.db"))
+history = _history_store()
+
+@st.cache_resource
+def _campaign_index():
+    return CampaignIndex(capacity=int(os.environ.get("SPAMSHIELD_CAMPAIGN_SIZE", 50000)),
+                         path=os.environ.get("SPAMSHIELD_CAMPAIGN_DB") or None)
+campaigns = _campaign_index()
+
+@st.cache_resource
+def _rule_engine():
+    bl = os.environ.get("SPAMSHIELD_BLOCKLIST")
+    return RuleEngine(urls=UrlAnalyzer(blocklist=Blocklist.load(bl) if bl else None))
+rules = _rule_engine()
+
+@st.cache_resource
+def _local_model(path):
+    from spamshield.local_model import LocalClassifier
+    return LocalClassifier.load(path)
+local_path  = os.environ.get("SPAMSHIELD_LOCAL_MODEL")
+local_model = _local_model(local_path) if local_path and os.path.exists(local_path) else None
+
+@st.cache_resource
+def _calibration(path):
+    return Calibration.load(path)
+cal_path    = os.environ.get("SPAMSHIELD_CALIBRATION")
+calibration = _calibration(cal_path) if cal_path and os.path.exists(cal_path) else None
+
+@st.cache_resource
+def _router(path, spec):
+    # Model registry and cascade policies; SPAMSHIELD_MODELS overrides the backend's defaults.
+    return Router.load(path) if path else backend.router() or Router()
+models_path = os.environ.get("SPAMSHIELD_MODELS")
+router      = _router(models_path if models_path and os.path.exists(models_path) else None, backend_spec)
+
+@st.cache_resource
+def _ocr():
+    return OCR() if ocr_available() else None
+ocr = _ocr()
+
+@st.cache_resource
+def _metrics():
+    # Registered once per process; SPAMSHIELD_METRICS_PORT also serves /metrics for Prometheus.
+    METRICS.register(component_collector(cache=cache, caller=caller, rules=rules, campaigns=campaigns, ocr=ocr,
+                                         router=router))
+    port = os.environ.get("SPAMSHIELD_METRICS_PORT")
+    return METRICS.serve(int(port)) if port else None
+_metrics()
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _prepared(digest, _data, mime):
+    # Keyed by content hash: reruns and repeat uploads reuse the payload and
+    # preview instead of re-decoding and re-encoding the image.
+    prep = prepare_image(_data, mime)
+    return prep, prep.b64, thumbnail(prep.data)
 
 st.markdown("""
 <style>
@@ -313,29 +446,94 @@ div[data-testid="stAlert"] p { color: var(--TX) !important; }
 """, unsafe_allow_html=True)
 
 # ── Session State ─────────────────────────────────────────────────────
-for k, v in [("history", []), ("last_result", None)]:
+for k, v in [("last_result", None), ("hist_before", None), ("sid", None)]:
     if k not in st.session_state: st.session_state[k] = v
+# The session id scopes history; it lives in server-side session state only.
+if st.session_state.sid is None: st.session_state.sid = uuid.uuid4().hex
+sid = st.session_state.sid
 
 # ── Sidebar ───────────────────────────────────────────────────────────
 st.sidebar.markdown("## ⚙️ Detection Settings")
-st.sidebar.markdown("**Detection mode**")
-mode = st.sidebar.selectbox("Mode", ["Auto (Balanced)", "Strict (Low Tolerance)", "Lenient (High Tolerance)"], label_visibility="collapsed")
-st.sidebar.markdown("**Content type**")
-content_type = st.sidebar.selectbox("Type", ["Auto-detect", "Email", "SMS / Text", "Social Media Post", "Comment / Review", "Chat Message"], label_visibility="collapsed")
-st.sidebar.markdown("---")
-st.sidebar.markdown("**Additional checks**")
-check_phishing    = st.sidebar.checkbox("🎣 Phishing link detection",    value=True)
-check_urgency     = st.sidebar.checkbox("⏰ Urgency / pressure tactics", value=True)
-check_offers      = st.sidebar.checkbox("💰 Fake offers & prizes",       value=True)
-check_impersonate = st.sidebar.checkbox("🎭 Impersonation patterns",     value=True)
-check_sentiment   = st.sidebar.checkbox("🧠 Sentiment analysis",         value=False)
-st.sidebar.markdown("---")
-threshold = st.sidebar.slider("Spam threshold (%)", 10, 90, 50, 5)
-st.sidebar.caption(f"Messages ≥ {threshold}% confidence → flagged as spam")
-st.sidebar.markdown("---")
-if st.session_state.history:
+# A form: toggling settings costs nothing until "Apply", instead of a full rerun per click.
+with st.sidebar.form("settings", border=False):
+    st.markdown("**Detection mode**")
+    mode = st.selectbox("Mode", list(MODES), label_visibility="collapsed",
+                        help="Moves the spam threshold locally (Strict −15, Lenient +15); the model's answer is "
+                             "the same in every mode. Without a calibration, Strict also flags a CLEAN answer whose "
+                             "spam score reaches the shifted threshold, and Lenient clears a SUSPICIOUS one scored "
+                             f"more than {BAND} points below it.")
+    st.markdown("**Content type**")
+    content_type = st.selectbox("Type", CONTENT_TYPES, label_visibility="collapsed")
+    st.markdown("---")
+    st.markdown("**Additional checks**")
+    check_phishing    = st.checkbox("🎣 Phishing link detection",    value=True)
+    check_urgency     = st.checkbox("⏰ Urgency / pressure tactics", value=True)
+    check_offers      = st.checkbox("💰 Fake offers & prizes",       value=True)
+    check_impersonate = st.checkbox("🎭 Impersonation patterns",     value=True)
+    check_sentiment   = st.checkbox("🧠 Sentiment analysis",         value=False)
+    st.markdown("---")
+    threshold = st.slider("Spam threshold (%)", 10, 90, 50, 5)
+    st.caption(f"Messages ≥ {threshold}% confidence → flagged as spam")
+    st.markdown("---")
+    use_rules = st.checkbox("⚡ Rule pre-filter (skip AI on obvious spam)", value=True)
+    use_camp  = st.checkbox("🧬 Campaign matching (reuse verdicts of near-duplicates)", value=True)
+    fast_mode = st.checkbox("🏎️ Fast mode (verdict first, explanation on demand)", value=False)
+    use_ocr   = ocr is not None and st.checkbox("🔤 OCR screenshots (text model when legible)", value=True)
+    local_band = 15
+    if local_model is not None:
+        local_band = st.slider("Local model review band (± %)", 0, 50, 15, 5)
+        st.caption(f"Local scores within {threshold - local_band}–{threshold + local_band}% escalate to AI")
+    st.form_submit_button("✔️ Apply settings", use_container_width=True)
+if history.counts(sid)["total"]:
     if st.sidebar.button("🗑️ Clear History"):
-        st.session_state.history = []; st.rerun()
+        history.clear(sid); st.session_state.hist_before = None; st.session_state.last_result = None; st.rerun()
+st.sidebar.markdown("---")
+cs_ = cache.stats(); rs_ = rules.stats()
+if calibration is not None:
+    st.sidebar.caption("🎯 Calibrated · " + " · ".join(f"{m} {c['method']} (n={c['n']})"
+                                                       for m, c in calibration.stats().items()))
+cascade_ = router.policy("text", Settings(content_type=content_type)).cascade
+if len(cascade_) > 1:
+    st.sidebar.caption("🪜 Cascade · " + " → ".join(m.split("/")[-1] for m in cascade_))
+if backend.name != "groq":
+    st.sidebar.caption(f"🖥️ Backend · {backend.name}" + (" · on this machine" if backend.local else ""))
+if local_model is not None:
+    ls_ = local_model.stats()
+    st.sidebar.caption(f"🧮 Local model · decided {ls_['decided']} · escalated {ls_['escalated']}")
+st.sidebar.caption(f"⚡ Pre-filter · decided {rs_['decided']} of {rs_['evaluated']} · {rs_['decided_rate']:.0%} AI calls saved")
+us_ = rs_["urls"]
+st.sidebar.caption(f"🔗 URLs · {us_['urls']} checked · {sum(us_['hits'].values())} flagged · blocklist {us_['blocklist_size']:,}")
+if ocr is not None:
+    os_ = ocr.stats()
+    st.sidebar.caption(f"🔤 OCR · {os_['to_text']} to text model · {os_['to_vision']} to vision · avg {os_['avg_seconds']:.2f}s")
+cm_ = campaigns.stats()
+st.sidebar.caption(f"🧬 Campaigns · {cm_['matches']} matches · {cm_['size']:,} indexed · {cm_['match_rate']:.0%}")
+st.sidebar.caption(f"⚡ Cache · {cs_['hits']} hits · {cs_['misses']} misses · {cs_['hit_rate']:.0%}")
+ps_ = parse_stats.stats(); tr_ = caller.stats()
+st.sidebar.caption(f"🛡️ Provider · breaker {tr_['breaker']} · {tr_['retries']} retries · {tr_['hedges']} hedges · p95 {tr_['p95']:.2f}s")
+bs_ = budget_stats.stats()
+st.sidebar.caption(f"🪙 Tokens · {bs_['prompt_saved']:,} prompt · {bs_['completion_saved']:,} completion reserved saved")
+st.sidebar.caption(f"🧩 JSON · {ps_['repaired']} repaired · {ps_['fix_retries']} fix retries · {ps_['failed']} unparseable")
+with st.sidebar.expander("📈 Metrics"):
+    rows = []
+    for m, s_ in router.stats().items():
+        err = sum(n for t, n in METRICS.series("spamshield_model_errors_total") if t["model"] == m)
+        rows.append({"model": m, "calls": s_["calls"], "p50 s": round(s_["p50"], 3), "p95 s": round(s_["p95"], 3),
+                     "prompt tok": s_["prompt_tokens"], "completion tok": s_["completion_tokens"], "errors": err,
+                     "cost $": round(s_["cost"], 4), "escalated": f"{s_['escalation_rate']:.0%}",
+                     "agree": "—" if s_["agreement"] is None else f"{s_['agreement']:.0%}"})
+    if rows:
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+    for lb, h in METRICS.series("spamshield_requests_seconds"):
+        st.caption(f"{lb['kind']} · {lb['path']} · {h.count} calls · p50 {h.quantile(.5):.3f}s · p95 {h.quantile(.95):.3f}s")
+    mix = {}
+    for lb, n in METRICS.series("spamshield_verdicts_total"):
+        mix[lb["verdict"]] = mix.get(lb["verdict"], 0) + n
+    if mix:
+        st.caption("Verdicts · " + " · ".join(f"{v} {n}" for v, n in sorted(mix.items())))
+    st.download_button("⬇️ Prometheus snapshot", METRICS.render(), file_name="spamshield_metrics.prom",
+                       mime="text/plain")
+    perf_slot = st.empty()   # filled at the end of the run, once this run's cost is known
 st.sidebar.caption("SpamShield AI · v2.0\nPowered by Groq + LLaMA 3")
 
 # ── Navbar ────────────────────────────────────────────────────────────
@@ -374,16 +572,9 @@ st.markdown("""
 </div>""", unsafe_allow_html=True)
 
 col_txt, col_img = st.columns(2, gap="medium")
-user_input = ""; uploaded_img = None; img_b64 = None; img_mime = None
+user_input = ""; uploaded_img = None; img_b64 = None; img_prep = None
 
 with col_txt:
-    SAMPLES = {
-        "— Try a sample —": "",
-        "🔴 Phishing Email":   "URGENT: Your account has been suspended! Click here to verify: http://secure-bank-login.xyz/verify?token=abc123. Failure within 24h = permanent closure.",
-        "🟡 Suspicious Offer": "Congratulations! You've been selected as today's lucky winner of an iPhone 15 Pro! Just pay $2 shipping: claimprize.info",
-        "🟢 Legit Message":    "Hi, just a reminder that our team meeting is tomorrow at 10am in Conference Room B. Please review the agenda I shared last week.",
-        "🔴 Scam SMS":         "FREE MSG: Your loan of Rs.50,000 is approved! Call 9988776655 now to claim. Limited time. Reply STOP to opt out.",
-    }
     selected   = st.selectbox("sample", list(SAMPLES.keys()), label_visibility="collapsed")
     user_input = st.text_area("msg", value=SAMPLES.get(selected,""), height=200,
                               placeholder="Paste an email, SMS, social post, or any suspicious message here…",
@@ -395,14 +586,17 @@ with col_img:
     uploaded_img = st.file_uploader("img", type=["png","jpg","jpeg","webp","gif"],
                                     label_visibility="collapsed", key="img_upload")
     if uploaded_img:
-        img_bytes = uploaded_img.read()
-        img_b64   = base64.b64encode(img_bytes).decode()
-        img_mime  = uploaded_img.type or "image/png"
+        img_bytes = uploaded_img.getvalue()
+        try:
+            img_prep, img_b64, (thumb, tw, _) = _prepared(hashlib.sha256(img_bytes).hexdigest(), img_bytes,
+                                                           uploaded_img.type or "image/png")
+        except UNREADABLE:
+            st.error("❌ Could not read this image."); st.stop()
+        # Served by URL through the media file manager; reruns resend only the URL.
+        st.image(thumb, width=tw // 2 or 340)
         st.markdown(f"""
 <div class="img-preview">
-  <img src="data:{img_mime};base64,{img_b64}"
-       style="width:100%;display:block;max-height:195px;object-fit:contain;padding:6px;"/>
-  <div class="img-meta">✅ {uploaded_img.name} · {len(img_bytes)/1024:.1f} KB</div>
+  <div class="img-meta">✅ {uploaded_img.name} · {len(img_bytes)/1024:.1f} KB → {len(img_prep.data)/1024:.1f} KB sent · preview {len(thumb)/1024:.1f} KB</div>
 </div>""", unsafe_allow_html=True)
     else:
         st.markdown("""
@@ -418,61 +612,100 @@ analyze_btn = st.button("🔍  Analyze", use_container_width=True)
 st.markdown('</div>', unsafe_allow_html=True)
 
 # ── Analysis Logic ────────────────────────────────────────────────────
-def _ctx():
-    checks = []
-    if check_phishing:    checks.append("phishing links, deceptive URLs, lookalike domains")
-    if check_urgency:     checks.append("urgency tactics, pressure language, countdown threats")
-    if check_offers:      checks.append("fake prize claims, lottery wins, suspicious offers")
-    if check_impersonate: checks.append("impersonation of banks, government, brands, support teams")
-    if check_sentiment:   checks.append("overall sentiment and emotional manipulation")
-    cs = "\n".join(f"- {c}" for c in checks) if checks else "- General spam patterns"
-    ms = {"Auto (Balanced)":"Use balanced judgment.",
-          "Strict (Low Tolerance)":"Be strict — flag anything remotely suspicious.",
-          "Lenient (High Tolerance)":"Only flag clear, obvious spam."}[mode]
-    hint = f" Content type: {content_type}." if content_type != "Auto-detect" else ""
-    return cs, ms, hint
-
-SCHEMA = '{"verdict":"SPAM|SUSPICIOUS|CLEAN","confidence":0-100,"reason":"...","signals":[{"label":"...","severity":"high|medium|low"}],"spam_score":0-100,"category":"...","sentiment":"..."}'
-
-def _parse(raw):
-    c = re.sub(r'```json|```','',raw).strip()
-    m = re.search(r'\{.*\}', c, re.DOTALL)
-    return json.loads(m.group() if m else c)
-
-def analyze_text(text):
-    cs, ms, hint = _ctx()
-    prompt = f"""Spam detection AI. Analyze this message.{hint}
-MODE: {ms}
-CHECK: {cs}
-Return ONLY valid JSON: {SCHEMA}
-MESSAGE: \"\"\"{text[:3000]}\"\"\""""
-    r = client.chat.completions.create(
-        model="llama-3.1-8b-instant",
-        messages=[{"role":"system","content":"Return valid JSON only."},{"role":"user","content":prompt}],
-        temperature=0.1, max_tokens=800)
-    result = _parse(r.choices[0].message.content)
-    if result.get("confidence",0) >= threshold and result.get("verdict") == "SUSPICIOUS":
-        result["verdict"] = "SPAM"
-    return result
-
-def analyze_image(b64, mime):
-    cs, ms, hint = _ctx()
-    prompt = f"""Spam detection AI with vision.{hint}
-Image contains screenshot of message/email/SMS.
-STEP 1: Extract ALL visible text. STEP 2: Analyze for spam.
-MODE: {ms} CHECK: {cs}
-Return ONLY valid JSON: {SCHEMA}
-If no text visible, return CLEAN with low confidence."""
-    r = client.chat.completions.create(
-        model="meta-llama/llama-4-scout-17b-16e-instruct",
-        messages=[{"role":"user","content":[
-            {"type":"image_url","image_url":{"url":f"data:{mime};base64,{b64}"}},
-            {"type":"text","text":prompt}]}],
-        temperature=0.1, max_tokens=900)
-    result = _parse(r.choices[0].message.content)
-    if result.get("confidence",0) >= threshold and result.get("verdict") == "SUSPICIOUS":
-        result["verdict"] = "SPAM"
-    return result
+detector = Detector(backend=backend, caller=caller,
+                    settings=Settings(mode, content_type, check_phishing, check_urgency,
+                                      check_offers, check_impersonate, check_sentiment, fast_mode),
+                    threshold=threshold, cache=cache, rules=rules if use_rules else None,
+                    local_model=local_model, band=local_band, ocr=ocr if use_ocr else None,
+                    token_budget=int(os.environ.get("SPAMSHIELD_TOKEN_BUDGET", TOKEN_BUDGET)),
+                    campaigns=campaigns if use_camp else None, calibration=calibration, router=router)
+
+def _card_html(result, pending=False):
+    """Result card for a full or partial (still streaming) result."""
+    verdict    = result.get("verdict","UNKNOWN")
+    confidence = result.get("confidence",0)
+    reason     = result.get("reason","✍️ Writing explanation…" if pending else "No explanation provided.")
+    if result.get("compact"):
+        reason = "🏎️ Fast verdict — explanation on request."
+    signals    = result.get("signals",[])
+    category   = result.get("category","…" if pending else "Unknown")
+    sentiment  = result.get("sentiment","…" if pending else "Neutral")
+    source     = {"rules":" &nbsp;·&nbsp; ⚡ Rule pre-filter",
+                  "local":" &nbsp;·&nbsp; 🧮 Local model",
+                  "campaign":f" &nbsp;·&nbsp; 🧬 Campaign match ({result.get('similarity',0):.0%} similar)",
+                  }.get(result.get("source"), "")
+    if result.get("escalated"):
+        source += f" &nbsp;·&nbsp; 🪜 {result.get('model','').split('/')[-1]}"
+    css, lbl, bar = {
+        "SPAM":       ("spam",  "🚨 SPAM DETECTED", "#dc2626"),
+        "SUSPICIOUS": ("warn",  "⚠️ SUSPICIOUS",    "#d97706"),
+        "CLEAN":      ("clean", "✅ CLEAN",          "#059669"),
+    }.get(verdict, ("warn","⚠️ UNKNOWN","#d97706"))
+    tags = ""
+    if signals:
+        tags_html = []
+        for s in signals:
+            sev = s.get("severity","low")
+            ico = "🔴" if sev=="high" else "🟡" if sev=="medium" else "🟢"
+            tags_html.append(f'<span class="sig {sev}">{ico} {s.get("label","")}</span>')
+        tags = f'<div class="sig-title">🔎 Detected Signals</div><div>{"".join(tags_html)}</div>'
+    return f"""
+<div class="result {css}">
+  <div class="verdict {css}">{lbl}</div>
+  <div class="vmeta">Confidence: {confidence}% &nbsp;·&nbsp; {category} &nbsp;·&nbsp; {sentiment}{source}</div>
+  <div class="conf-track"><div class="conf-fill" style="width:{confidence}%;background:{bar};"></div></div>
+  <div class="reason">{reason}</div>
+  {tags}
+</div>"""
+
+# ── Result ────────────────────────────────────────────────────────────
+# The last result lives in session state and is redrawn from there, so other
+# widgets no longer wipe it. Its Explain button reruns only this fragment.
+# It is re-decided from its raw scores, so a new threshold or mode applies
+# to it at once, without a model call.
+def _explain(last, result):
+    """A fast-mode verdict explained: an image's from its OCR text, or by the vision model when that is unusable."""
+    if last["image"] is not None:
+        b64, mime, key = last["image"]
+        return detector.explain_image(b64, mime, result, image_key=key)
+    return detector.explain(last["text"], result)
+
+
+@st.fragment
+def _result_panel():
+    t0, b0 = time.perf_counter(), _sent_bytes()
+    last = st.session_state.last_result
+    if not last:
+        return
+    result, timing = detector.decide(dict(last["result"])), last["timing"]
+    card, btn = st.empty(), st.empty()
+    if result.get("compact") and btn.button("💬 Explain this verdict", key="explain_btn"):
+        btn.empty()
+        with st.spinner("✍️ Explaining…"):
+            try:
+                t1 = time.perf_counter()
+                result = last["result"] = _explain(last, result)
+                timing["explain"] = time.perf_counter() - t1
+            except Exception as e:
+                st.error(f"❌ Explanation failed: {e}")
+    card.markdown(_card_html(result), unsafe_allow_html=True)
+    ocr_note = f"OCR {timing['ocr']:.2f}s · " if "ocr" in timing else ""
+    tok_note = (f" · 🪙 {timing['prompt_saved']} prompt / {timing['completion_saved']} completion tokens saved"
+                if "prompt_saved" in timing else "")
+    exp_note = f" · explanation {timing['explain']:.2f}s" if "explain" in timing else ""
+    st.caption(f"⏱ {ocr_note}First verdict {timing['first_verdict']:.2f}s · total {timing['total']:.2f}s"
+               f"{exp_note}{tok_note}")
+    counts  = history.counts(sid)
+    n_spam, n_sus, n_clean, total = counts["SPAM"], counts["SUSPICIOUS"], counts["CLEAN"], counts["total"]
+    st.markdown(f"""
+<div class="stats">
+  <div class="stat"><div class="stat-num" style="color:#dc2626">{n_spam}</div><div class="stat-lbl">Spam</div></div>
+  <div class="stat"><div class="stat-num" style="color:#d97706">{n_sus}</div><div class="stat-lbl">Suspicious</div></div>
+  <div class="stat"><div class="stat-num" style="color:#059669">{n_clean}</div><div class="stat-lbl">Clean</div></div>
+  <div class="stat"><div class="stat-num" style="color:#1a3fa8">{total}</div><div class="stat-lbl">Scanned</div></div>
+</div>""", unsafe_allow_html=True)
+    if _fragment_run():
+        _record_rerun("result", t0, b0)
 
 # ── Run ───────────────────────────────────────────────────────────────
 if analyze_btn:
@@ -483,68 +716,98 @@ if analyze_btn:
     elif use_text and len(user_input.strip()) < 5:
         st.warning("Message is too short to analyze.")
     else:
+        card = st.empty()
         with st.spinner("🧠 Analyzing image with AI Vision…" if use_img else "🧠 Analyzing message…"):
             try:
-                result = analyze_image(img_b64, img_mime) if use_img else analyze_text(user_input)
+                events = (detector.stream_image(img_b64, img_prep.mime, image_key=img_prep.key) if use_img
+                          else detector.stream_text(user_input))
+                for event, result, timing in events:
+                    if event == "escalate":
+                        result = dict(result, reason="🪜 Not sure yet — asking a stronger model…")
+                    card.markdown(_card_html(result, pending=event != "done"), unsafe_allow_html=True)
             except json.JSONDecodeError:
                 st.error("❌ AI returned malformed response. Please try again."); st.stop()
             except Exception as e:
                 st.error(f"❌ Analysis failed: {e}"); st.stop()
-
-        verdict    = result.get("verdict","UNKNOWN")
-        confidence = result.get("confidence",0)
-        reason     = result.get("reason","No explanation provided.")
-        signals    = result.get("signals",[])
-        category   = result.get("category","Unknown")
-        sentiment  = result.get("sentiment","Neutral")
-        preview    = f"[Image: {uploaded_img.name}]" if use_img else (user_input[:55]+("…" if len(user_input)>55 else ""))
-
-        css, lbl, bar = {
-            "SPAM":       ("spam",  "🚨 SPAM DETECTED", "#dc2626"),
-            "SUSPICIOUS": ("warn",  "⚠️ SUSPICIOUS",    "#d97706"),
-            "CLEAN":      ("clean", "✅ CLEAN",          "#059669"),
-        }.get(verdict, ("warn","⚠️ UNKNOWN","#d97706"))
-
-        st.session_state.history.insert(0,{"verdict":verdict,"confidence":confidence,"category":category,"preview":preview})
-        if len(st.session_state.history) > 10: st.session_state.history = st.session_state.history[:10]
-
-        st.markdown(f"""
-<div class="result {css}">
-  <div class="verdict {css}">{lbl}</div>
-  <div class="vmeta">Confidence: {confidence}% &nbsp;·&nbsp; {category} &nbsp;·&nbsp; {sentiment}</div>
-  <div class="conf-track"><div class="conf-fill" style="width:{confidence}%;background:{bar};"></div></div>
-  <div class="reason">{reason}</div>""", unsafe_allow_html=True)
-        if signals:
-            tags_html = []
-            for s in signals:
-                sev = s.get("severity","low")
-                ico = "🔴" if sev=="high" else "🟡" if sev=="medium" else "🟢"
-                tags_html.append(f'<span class="sig {sev}">{ico} {s.get("label","")}</span>')
-            tags = "".join(tags_html)
-            st.markdown(f'<div class="sig-title">🔎 Detected Signals</div><div>{tags}</div>', unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
-
-        n_spam  = sum(1 for h in st.session_state.history if h["verdict"]=="SPAM")
-        n_sus   = sum(1 for h in st.session_state.history if h["verdict"]=="SUSPICIOUS")
-        n_clean = sum(1 for h in st.session_state.history if h["verdict"]=="CLEAN")
-        total   = len(st.session_state.history)
-        st.markdown(f"""
-<div class="stats">
-  <div class="stat"><div class="stat-num" style="color:#dc2626">{n_spam}</div><div class="stat-lbl">Spam</div></div>
-  <div class="stat"><div class="stat-num" style="color:#d97706">{n_sus}</div><div class="stat-lbl">Suspicious</div></div>
-  <div class="stat"><div class="stat-num" style="color:#059669">{n_clean}</div><div class="stat-lbl">Clean</div></div>
-  <div class="stat"><div class="stat-num" style="color:#1a3fa8">{total}</div><div class="stat-lbl">Scanned</div></div>
-</div>""", unsafe_allow_html=True)
+        # Fast mode: explain non-CLEAN verdicts right away, CLEAN ones on request.
+        last = {"result": result, "timing": timing, "text": user_input,
+                "image": (img_b64, img_prep.mime, img_prep.key) if use_img else None}
+        if result.get("compact") and result["verdict"] != "CLEAN":
+            try:
+                t0 = time.perf_counter()
+                result = last["result"] = _explain(last, result)
+                timing["explain"] = time.perf_counter() - t0
+            except Exception as e:
+                st.warning(f"Explanation unavailable: {e}")
+        st.session_state.last_result = last
+        card.empty()   # the panel below redraws the final card
+
+        preview = f"[Image: {uploaded_img.name}]" if use_img else (user_input[:55]+("…" if len(user_input)>55 else ""))
+        history.add(result, preview, session=sid)
+        st.session_state.hist_before = None
+
+_result_panel()
+
+# ── Bulk Scan ─────────────────────────────────────────────────────────
+with st.expander("📦 Bulk scan — CSV / JSONL"):
+    st.caption("One message per row. CSV needs a `text` (or `message`/`body`) column, JSONL one object per line; an `id` column is kept if present.")
+    bulk_file = st.file_uploader("bulk", type=["csv","jsonl","ndjson","json"], label_visibility="collapsed", key="bulk_upload")
+    strategy  = st.radio("Strategy", ["Pack into prompts", "Concurrent single calls"], horizontal=True)
+    if strategy == "Pack into prompts":
+        pack_size = st.slider("Messages per request", 5, 50, 20, 5)
+    else:
+        parallel  = st.slider("Parallel requests", 1, 64, 16)
+    if bulk_file and st.button("📦  Run bulk scan", use_container_width=True):
+        skipped = []
+        try:
+            items = read_messages(bulk_file.getvalue(), bulk_file.name, skipped=skipped)
+        except (ValueError, KeyError) as e:
+            st.error(f"❌ Could not read file: {e}"); st.stop()
+        if skipped:
+            st.warning(f"Skipped {len(skipped)} unreadable line(s): " +
+                       "; ".join(f"line {no}: {why}" for no, why in skipped[:5]) + (" …" if len(skipped) > 5 else ""))
+        if not items:
+            st.warning("No messages found in file.")
+        else:
+            bar = st.progress(0.0, text=f"0 / {len(items)}")
+            tick = lambda d, n: bar.progress(d / n, text=f"{d} / {n}")
+            if strategy == "Pack into prompts":
+                res = detector.analyze_batch(items, size=pack_size, progress=tick)
+            else:
+                res = dict(zip((m for m, _ in items),
+                               detector.async_engine(concurrency=parallel).run((t for _, t in items), progress=tick)))
+            rows = []
+            for mid, text in items:
+                r = res[mid]
+                rows.append({"id": mid, "verdict": r.get("verdict","UNKNOWN"), "confidence": r.get("confidence",0),
+                             "category": r.get("category","Unknown"), "reason": r.get("reason",""),
+                             "preview": text[:80]})
+            counts = {v: sum(1 for r in rows if r["verdict"] == v) for v in ("SPAM","SUSPICIOUS","CLEAN")}
+            st.caption(f"🚨 {counts['SPAM']} spam · ⚠️ {counts['SUSPICIOUS']} suspicious · ✅ {counts['CLEAN']} clean · {len(rows)} total")
+            st.dataframe(rows, use_container_width=True, hide_index=True)
+            st.download_button("⬇️ Download results (JSONL)", "\n".join(json.dumps(r) for r in rows),
+                               file_name="spamshield_bulk.jsonl", mime="application/x-ndjson")
 
 # ── History ───────────────────────────────────────────────────────────
-if st.session_state.history:
-    st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
-    st.markdown('<div class="lbl" style="margin-bottom:.7rem;">📜 Recent Scans</div>', unsafe_allow_html=True)
-    DOT  = {"SPAM":"#dc2626","CLEAN":"#059669","SUSPICIOUS":"#d97706"}
-    ICON = {"SPAM":"🚨","CLEAN":"✅","SUSPICIOUS":"⚠️"}
-    for h in st.session_state.history:
-        dc = DOT.get(h["verdict"],"#d97706")
-        st.markdown(f"""
+# Paging reruns only this fragment, not the page.
+HIST_PAGE = 10
+
+def _hist_page(before):
+    st.session_state.hist_before = before
+
+@st.fragment
+def _history_panel():
+    t0, b0 = time.perf_counter(), _sent_bytes()
+    hist_rows = history.page(HIST_PAGE + 1, before=st.session_state.hist_before, session=sid)
+    if hist_rows:
+        st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
+        st.markdown('<div class="lbl" style="margin-bottom:.7rem;">📜 Recent Scans</div>', unsafe_allow_html=True)
+        DOT  = {"SPAM":"#dc2626","CLEAN":"#059669","SUSPICIOUS":"#d97706"}
+        ICON = {"SPAM":"🚨","CLEAN":"✅","SUSPICIOUS":"⚠️"}
+        items = []
+        for h in hist_rows[:HIST_PAGE]:
+            dc = DOT.get(h["verdict"],"#d97706")
+            items.append(f"""
 <div class="hist-item">
   <div class="hist-dot" style="background:{dc};box-shadow:0 0 0 3px {dc}30;"></div>
   <div style="flex:1;overflow:hidden">
@@ -553,7 +816,18 @@ if st.session_state.history:
     <span style="font-size:.78rem;color:#64748b;">{h["confidence"]}% · {h["category"]}</span>
     <div class="hist-preview">{h["preview"]}</div>
   </div>
-</div>""", unsafe_allow_html=True)
+</div>""")
+        st.markdown("".join(items), unsafe_allow_html=True)   # one element per page, not one per scan
+        # Callbacks move the cursor before the rerun, so a click costs one fragment run, not two.
+        c_new, c_old = st.columns(2)
+        if st.session_state.hist_before is not None:
+            c_new.button("‹ Newest", key="hist_newest", on_click=_hist_page, args=(None,))
+        if len(hist_rows) > HIST_PAGE:
+            c_old.button("Older ›", key="hist_older", on_click=_hist_page, args=(hist_rows[HIST_PAGE - 1]["id"],))
+    if _fragment_run():
+        _record_rerun("history", t0, b0)
+
+_history_panel()
 
 # ── Screenshot ────────────────────────────────────────────────────────
 st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
@@ -584,3 +858,9 @@ st.markdown("""
 <div style="text-align:center;color:#94a3b8;font-size:.72rem;font-family:'Fira Code',monospace;letter-spacing:.07em;padding-bottom:1.5rem;margin-top:.5rem;">
   SPAMSHIELD AI · GROQ + LLAMA 3.1 · NOT A SUBSTITUTE FOR PROFESSIONAL SECURITY TOOLS
 </div>""", unsafe_allow_html=True)
+
+_record_rerun("full", _rerun_t0)
+with perf_slot.container():
+    for e in st.session_state.perf[-6:]:
+        kb = f" · {e['kb']:.1f} KB" if e["kb"] is not None else ""
+        st.caption(f"🔁 {e['kind']} run · {e['ms']:.0f} ms{kb}")
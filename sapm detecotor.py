@@ -1,8 +1,7 @@
 import streamlit as st
-from groq import Groq
 import json
-import re
 import os
+from spamshield import Detector, Settings
 
 # ── Page Config ───────────────────────────────────────────────────────
 st.set_page_config(
@@ -23,7 +22,7 @@ if not api_key:
     st.error("⚠️ GROQ_API_KEY missing. Add it in Render → Environment Variables.")
     st.stop()
 
-client = Groq(api_key=api_key)
+detector = Detector(api_key=api_key)
 
 # ── Custom CSS ────────────────────────────────────────────────────────
 st.markdown("""
@@ -170,69 +169,9 @@ st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
 
 # ── Analyze Function ──────────────────────────────────────────────────
 def analyze_spam(text: str) -> dict:
-    checks = []
-    if check_phishing:    checks.append("phishing links, deceptive URLs, lookalike domains")
-    if check_urgency:     checks.append("urgency tactics, pressure language, countdown threats")
-    if check_offers:      checks.append("fake prize claims, lottery wins, suspicious offers, 'too good to be true' deals")
-    if check_impersonate: checks.append("impersonation of banks, government, brands, support teams")
-    if check_sentiment:   checks.append("overall sentiment and emotional manipulation")
-
-    mode_instruction = {
-        "Auto (Balanced)":          "Use balanced judgment.",
-        "Strict (Low Tolerance)":   "Be strict — flag anything remotely suspicious.",
-        "Lenient (High Tolerance)": "Only flag clear, obvious spam.",
-    }[mode]
-
-    content_hint = f" The content type is: {content_type}." if content_type != "Auto-detect" else ""
-    checks_str   = "\n".join(f"- {c}" for c in checks) if checks else "- General spam patterns"
-
-    prompt = f"""You are an expert spam and scam detection AI. Analyze the following message thoroughly.{content_hint}
-
-DETECTION MODE: {mode_instruction}
-
-CHECK FOR:
-{checks_str}
-- General spam indicators (excessive caps, excessive punctuation, grammar errors)
-- Social engineering tactics
-- Request for personal information, passwords, OTPs, money transfers
-
-Respond ONLY with a valid JSON object (no markdown, no extra text):
-{{
-  "verdict": "SPAM" | "SUSPICIOUS" | "CLEAN",
-  "confidence": <integer 0-100>,
-  "reason": "<2-3 sentence explanation of the verdict>",
-  "signals": [
-    {{"label": "<signal name>", "severity": "high" | "medium" | "low"}}
-  ],
-  "spam_score": <integer 0-100>,
-  "category": "<one of: Phishing | Scam | Promotional | Malware | Social Engineering | Legitimate | Unknown>",
-  "sentiment": "<Neutral | Alarming | Enticing | Threatening | Friendly>"
-}}
-
-MESSAGE TO ANALYZE:
-\"\"\"
-{text[:3000]}
-\"\"\"
-"""
-
-    response = client.chat.completions.create(
-        model="llama-3.1-8b-instant",
-        messages=[
-            {"role": "system", "content": "You are a precision spam detection engine. Always return valid JSON only. No extra text, no markdown fences."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.1,
-        max_tokens=800
-    )
-
-    raw     = response.choices[0].message.content.strip()
-    cleaned = re.sub(r'```json|```', '', raw).strip()
-    result  = json.loads(cleaned)
-
-    if result.get("confidence", 0) >= threshold and result.get("verdict") == "SUSPICIOUS":
-        result["verdict"] = "SPAM"
-
-    return result
+    settings = Settings(mode, content_type, check_phishing, check_urgency,
+                        check_offers, check_impersonate, check_sentiment)
+    return detector.analyze_text(text, settings, threshold)
 
 # ── Sample Messages ───────────────────────────────────────────────────
 sample_texts = {
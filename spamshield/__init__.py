@@ -0,0 +1,10 @@
+"""SpamShield detection core shared by the Streamlit app and headless tooling.
+
+Importing the package is cheap: no Streamlit, and the Groq SDK and NumPy
+are only imported by the code paths that need them.
+"""
+from .cache import VerdictCache, make_key, normalize
+from .detector import Detector
+from .prompts import SCHEMA, Settings, parse, promote
+
+__all__ = ["SCHEMA", "Detector", "Settings", "VerdictCache", "make_key", "normalize", "parse", "promote"]
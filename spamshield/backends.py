@@ -0,0 +1,343 @@
+"""Inference backends behind ``Detector`` and ``AsyncEngine``.
+
+The rest of the package speaks one protocol: a client whose
+``chat.completions.create(model=, messages=, temperature=, max_tokens=,
+stream=)`` returns OpenAI-shaped responses, or chunks when streaming.
+Metering, the resilient caller, streaming, packing and the cascade all sit on
+top of it. A backend builds that client: ``client()`` once per backend, shared
+by every detector that uses it, and ``async_client()`` once per engine.
+
+- ``GroqBackend``: the hosted Groq API, the default.
+- ``OpenAIBackend``: any OpenAI-compatible server over HTTP, e.g. llama.cpp's
+  ``llama-server``, vLLM, Ollama or LM Studio on the same box.
+- ``LlamaCppBackend``: a GGUF model in process through ``llama-cpp-python``,
+  on CPU. One generation at a time.
+- ``ClassifierBackend``: an in-process text classifier (a
+  ``local_model.LocalClassifier`` ``.npz``, or an ONNX model taking raw
+  strings) that answers the text prompts with SCHEMA JSON. It reads the
+  request's ``prompts.Prompt.kind`` and ``items``, never the wording. No network and
+  deterministic, so load tests replay exactly.
+
+``local`` is true for the backends whose requests never leave the box.
+``models`` maps the router's model names onto the ones a server serves
+(``"*"`` for any other), so metrics and the cascade keep the router's names.
+The in-process backends have one model, named ``model_name``, and no
+``vision``: image requests raise ``Unsupported``. Their ``router()`` is a
+one-step ``models.Router`` for that model, so the cascade does not ask the
+same model twice and metrics carry its real name. Streams are primed:
+the request is made, and fails, when ``stream(kw)`` is called, inside the
+resilient caller's retries rather than on the first ``next()``.
+
+Chosen by configuration, ``load(spec)`` or ``SPAMSHIELD_BACKEND``::
+
+    groq                                   GROQ_API_KEY
+    openai:http://127.0.0.1:8080/v1        SPAMSHIELD_BACKEND_KEY, SPAMSHIELD_BACKEND_MODEL
+    llamacpp:/models/qwen2.5-3b-instruct-q4_k_m.gguf
+    classifier:model.npz                   or classifier:spam.onnx
+
+``llama_cpp`` and ``onnxruntime`` are imported only when such a backend is built.
+"""
+import asyncio
+import itertools
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+from .clients import wrap
+
+
+class Unsupported(ValueError):
+    pass
+
+
+def _ns(d):
+    """Attribute access over a JSON response or chunk, like the SDK objects."""
+    if isinstance(d, dict):
+        return SimpleNamespace(**{k: _ns(v) for k, v in d.items()})
+    if isinstance(d, list):
+        return [_ns(v) for v in d]
+    return d
+
+
+def _chunk(c):
+    # SDK objects default absent fields to None; a role-only delta has no "content".
+    for ch in c.get("choices") or ():
+        ch.setdefault("delta", {}).setdefault("content", None)
+    return _ns(c)
+
+
+def _text_only(messages, name):
+    for m in messages:
+        if isinstance(m.get("content"), list):
+            raise Unsupported(f"the {name} backend has no vision model")
+
+
+def _primed(chunks):
+    """``chunks`` with the first one already pulled, so the request's errors surface now."""
+    first = next(chunks, None)
+    return itertools.chain(() if first is None else (first,), chunks)
+
+
+def _reply(content, usage=None):
+    return {"choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": "stop"}], "usage": usage}
+
+
+# ── Client shape ──────────────────────────────────────────────────────
+def _client(backend, is_async=False):
+    def create(**kw):
+        kw["model"] = backend.model_for(kw.get("model"))
+        if kw.pop("stream", False):
+            return (_chunk(c) for c in backend.stream(kw))
+        return _ns(backend.complete(kw))
+
+    async def acreate(**kw):
+        kw["model"] = backend.model_for(kw.get("model"))
+        kw.pop("stream", None)                  # the engine does not stream
+        return _ns(await asyncio.to_thread(backend.complete, kw))
+    return wrap(acreate if is_async else create)
+
+
+class Backend(ABC):
+    """``complete(kw)`` returns a response dict and ``stream(kw)`` chunk dicts; the clients wrap them."""
+    name       = "backend"
+    local      = True
+    vision     = False
+    model_name = None           # set by backends that serve every request with one model
+
+    def __init__(self, models=None):
+        self.models  = dict(models or {})
+        self._client = None
+        self._lock   = threading.Lock()
+
+    def model_for(self, name):
+        return self.models.get(name) or self.models.get("*") or name
+
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = _client(self)
+        return self._client
+
+    def async_client(self):
+        # Blocking work goes to the default thread pool; the engine's semaphore bounds it.
+        return _client(self, is_async=True)
+
+    def router(self):
+        """The ``models.Router`` this backend's models need, or ``None`` for the default cascade."""
+        if self.model_name is None:
+            return None
+        from .models import Router
+        return Router.single(self.model_name)
+
+    @abstractmethod
+    def complete(self, kw):
+        ...
+
+    def stream(self, kw):
+        """The whole reply as one chunk, for backends that do not stream."""
+        r = self.complete(kw)
+        return iter([{"choices": [{"index": 0, "delta": {"content": r["choices"][0]["message"]["content"]}}],
+                      "usage": r.get("usage")}])
+
+    def stats(self):
+        return {"backend": self.name, "local": self.local, "vision": self.vision, "model": self.model_name}
+
+
+# ── Hosted ────────────────────────────────────────────────────────────
+class GroqBackend(Backend):
+    """The Groq SDK itself; ``base_url`` defaults to ``GROQ_BASE_URL`` or the API."""
+    name, local, vision = "groq", False, True
+
+    def __init__(self, api_key=None, base_url=None, max_retries=2):
+        super().__init__()
+        self.api_key, self.base_url, self.max_retries = api_key, base_url, max_retries
+
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                from groq import Groq
+                self._client = Groq(api_key=self.api_key, base_url=self.base_url, max_retries=self.max_retries)
+        return self._client
+
+    def async_client(self):
+        from groq import AsyncGroq
+        return AsyncGroq(api_key=self.api_key, base_url=self.base_url, max_retries=self.max_retries)
+
+    def complete(self, kw):
+        return self.client().chat.completions.create(**kw).model_dump()
+
+    def stream(self, kw):
+        return (c.model_dump() for c in self.client().chat.completions.create(stream=True, **kw))
+
+
+class OpenAIBackend(Backend):
+    """``POST {base_url}/chat/completions`` over a pooled httpx client, SSE when streaming."""
+    name, vision = "openai", True
+
+    def __init__(self, base_url, api_key=None, models=None):
+        super().__init__(models)
+        self.base_url = base_url.rstrip("/")
+        self.api_key  = api_key
+        self.local    = urlparse(self.base_url).hostname in ("127.0.0.1", "localhost", "::1")
+        self._http    = None
+
+    def _post(self, kw, stream=False):
+        import httpx
+        with self._lock:
+            if self._http is None:
+                self._http = httpx.Client(limits=httpx.Limits(max_keepalive_connections=16))
+        body = {k: v for k, v in kw.items() if k != "timeout"}
+        if stream:
+            body.update(stream=True, stream_options={"include_usage": True})
+        req = self._http.build_request("POST", self.base_url + "/chat/completions", json=body,
+                                       headers={"Authorization": f"Bearer {self.api_key}"} if self.api_key else {},
+                                       timeout=kw.get("timeout", 60.0))
+        try:
+            r = self._http.send(req, stream=stream)
+        except httpx.TimeoutException as e:     # the shapes ``transport.is_retryable`` knows
+            raise TimeoutError(str(e)) from e
+        except httpx.TransportError as e:
+            raise ConnectionError(str(e)) from e
+        if r.is_error:
+            r.read(); r.close()
+            r.raise_for_status()                # HTTPStatusError carries the response and its status
+        return r
+
+    def complete(self, kw):
+        return self._post(kw).json()
+
+    def stream(self, kw):
+        return self._events(self._post(kw, stream=True))
+
+    @staticmethod
+    def _events(r):
+        try:
+            for line in r.iter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                yield json.loads(data)
+        finally:
+            r.close()
+
+    def stats(self):
+        return dict(super().stats(), base_url=self.base_url)
+
+
+# ── In process ────────────────────────────────────────────────────────
+class LlamaCppBackend(Backend):
+    """A GGUF chat model loaded with ``llama_cpp.Llama``; extra keywords go to its constructor."""
+    name = "llamacpp"
+
+    def __init__(self, model_path, n_ctx=4096, n_threads=None, **kw):
+        super().__init__()
+        from llama_cpp import Llama
+        self.model_path = model_path
+        self.model_name = os.path.splitext(os.path.basename(model_path))[0]
+        self.llm  = Llama(model_path=model_path, n_ctx=n_ctx, n_threads=n_threads, verbose=False, **kw)
+        self._run = threading.Lock()            # a Llama context runs one generation at a time
+
+    def _args(self, kw):
+        _text_only(kw["messages"], self.name)
+        return {"messages": kw["messages"], "temperature": kw.get("temperature", 0.1),
+                "max_tokens": kw.get("max_tokens")}
+
+    def complete(self, kw):
+        args = self._args(kw)
+        with self._run:
+            return self.llm.create_chat_completion(**args)
+
+    def stream(self, kw):
+        args = self._args(kw)
+
+        def chunks():
+            with self._run:
+                yield from self.llm.create_chat_completion(stream=True, **args)
+        return _primed(chunks())
+
+
+class OnnxClassifier:
+    """``predict_proba`` over an ONNX model that takes raw strings, e.g. a skl2onnx TF-IDF pipeline."""
+    def __init__(self, path, spam_label=1):
+        import onnxruntime
+        self.session    = onnxruntime.InferenceSession(path, providers=["CPUExecutionProvider"])
+        self.input      = self.session.get_inputs()[0].name
+        self.spam_label = spam_label
+
+    def predict_proba(self, texts):
+        import numpy as np
+        out = self.session.run(None, {self.input: np.array(texts, dtype=object).reshape(-1, 1)})[-1]
+        if isinstance(out, list):               # ZipMap output: one {label: probability} per row
+            return np.array([row[self.spam_label] for row in out], np.float64)
+        return np.asarray(out, np.float64)[:, self.spam_label]
+
+
+class ClassifierBackend(Backend):
+    """Any ``predict_proba(texts)`` classifier, answering text, compact, explain and packed prompts.
+
+    Scores of ``spam_at`` and up are SPAM, ``suspicious_at`` and up SUSPICIOUS.
+    """
+    name = "classifier"
+
+    def __init__(self, classifier, spam_at=70, suspicious_at=40, model_name="classifier"):
+        super().__init__()
+        self.classifier, self.spam_at, self.suspicious_at = classifier, spam_at, suspicious_at
+        self.model_name = model_name
+
+    @classmethod
+    def load(cls, path, **kw):
+        kw.setdefault("model_name", "classifier:" + os.path.basename(path))
+        if path.lower().endswith(".onnx"):
+            return cls(OnnxClassifier(path), **kw)
+        from .local_model import LocalClassifier
+        return cls(LocalClassifier.load(path), **kw)
+
+    def result(self, p):
+        score = round(float(p) * 100)
+        v = "SPAM" if score >= self.spam_at else "SUSPICIOUS" if score >= self.suspicious_at else "CLEAN"
+        return {"verdict": v, "confidence": 100 - score if v == "CLEAN" else score,
+                "reason": f"Classifier scored this message {score}% spam-like.", "signals": [],
+                "spam_score": score, "category": "Legitimate" if v == "CLEAN" else "Other", "sentiment": "Neutral"}
+
+    def answer(self, prompt):
+        """The reply to a ``prompts.Prompt``, chosen by its ``kind``; the wording is never read."""
+        kind = getattr(prompt, "kind", None)
+        if kind not in ("text", "compact", "explain", "batch"):
+            raise Unsupported(f"the {self.name} backend answers spamshield text prompts, not {kind or 'free text'}")
+        probs = self.classifier.predict_proba([t for _, t in prompt.items]) if prompt.items else []
+        if kind == "batch":
+            return json.dumps([dict(self.result(p), id=i) for (i, _), p in zip(prompt.items, probs)])
+        r = self.result(probs[0])
+        if kind == "compact":
+            return json.dumps({"v": r["verdict"][0], "c": r["confidence"], "k": "L" if r["verdict"] == "CLEAN" else "O"})
+        if kind == "explain":
+            return json.dumps({k: r[k] for k in ("reason", "signals", "spam_score", "sentiment")})
+        return json.dumps(r)
+
+    def complete(self, kw):
+        _text_only(kw["messages"], self.name)
+        return _reply(self.answer(kw["messages"][-1]["content"]))
+
+
+def load(spec=None, api_key=None, max_retries=2):
+    """Backend for a ``kind[:target]`` spec; default ``SPAMSHIELD_BACKEND``, else ``groq``."""
+    spec = spec or os.environ.get("SPAMSHIELD_BACKEND") or "groq"
+    kind, _, target = spec.partition(":")
+    if kind == "groq":
+        return GroqBackend(api_key or os.environ.get("GROQ_API_KEY"), target or None, max_retries)
+    if kind == "openai":
+        served = os.environ.get("SPAMSHIELD_BACKEND_MODEL")
+        return OpenAIBackend(target or "http://127.0.0.1:8080/v1", os.environ.get("SPAMSHIELD_BACKEND_KEY"),
+                             {"*": served} if served else None)
+    if kind == "llamacpp":
+        threads = os.environ.get("SPAMSHIELD_BACKEND_THREADS")
+        return LlamaCppBackend(target, n_threads=int(threads) if threads else None)
+    if kind == "classifier":
+        return ClassifierBackend.load(target)
+    raise ValueError(f"unknown backend {kind!r}: groq, openai, llamacpp or classifier")
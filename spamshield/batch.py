@@ -0,0 +1,191 @@
+"""Bulk scanning: pack many messages into one completion.
+
+Messages are read from CSV or JSONL with stable IDs, packed ``size`` at a
+time into a single prompt and answered with a JSON array of per-ID verdicts
+in the ``SCHEMA`` shape. Anything the model drops or mangles is re-run
+through the single-message path, so one bad item never sinks a pack.
+Messages longer than a pack slot (``PACK_CHARS``) go straight to the single
+path, which reads them whole instead of cut. Packed verdicts that the
+router escalates are packed again for the stronger model (``escalate``),
+a few calls for the whole batch rather than one per message.
+"""
+import csv
+import io
+import json
+
+from .cache import make_key
+from .prompts import PACK_CHARS, SYSTEM, TEXT_MODEL, batch_prompt, error_result, parse_array
+
+TEXT_COLUMNS = ("text", "message", "body", "content", "msg")
+ID_COLUMNS   = ("id", "message_id", "msg_id", "uid")
+
+
+def read_messages(data, name="", label_columns=None, skipped=None):
+    """Return ``[(id, text), ...]`` from CSV or JSONL bytes; rows without text are skipped.
+
+    The file extension decides the format. Without a known one, data that
+    starts with ``{`` is JSONL; a CSV may start with a quoted field. With
+    ``label_columns`` the items are ``(id, text, label)`` and rows without a
+    label are skipped too. A JSONL line that is not an object or a string
+    is skipped, and ``(line number, reason)`` appended to ``skipped``.
+    Repeated ids get ``#n`` suffixes, never one already in the file.
+    """
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig", errors="replace")
+    ext = name.lower().rsplit(".", 1)[-1] if "." in name else ""
+    jsonl = ext in ("jsonl", "ndjson", "json") or (ext != "csv" and data.lstrip()[:1] == "{")
+    rows = list(_jsonl_rows(data, label_columns or (), skipped) if jsonl else _csv_rows(data, label_columns or ()))
+    seen = {str(mid) for mid, _, _ in rows if mid not in (None, "")}     # a generated id must not take one
+    out, taken = [], set()
+    for n, (mid, text, label) in enumerate(rows):
+        if not text or not str(text).strip() or (label_columns and label in (None, "")):
+            continue
+        own  = mid not in (None, "")
+        base = str(mid) if own else f"m{n}"
+        mid, k = base, n
+        while mid in taken or (mid in seen and not (own and mid == base)):
+            mid, k = f"{base}#{k}", k + 1
+        taken.add(mid)
+        out.append((mid, str(text)) if not label_columns else (mid, str(text), label))
+    return out
+
+
+def _pick(keys, wanted):
+    low = {k.lower().strip(): k for k in keys if k}
+    return next((low[w] for w in wanted if w in low), None)
+
+
+def _csv_rows(data, label_columns=()):
+    reader = csv.DictReader(io.StringIO(data))
+    cols   = reader.fieldnames or []
+    lcol   = _pick(cols, label_columns)
+    tcol   = _pick(cols, TEXT_COLUMNS) or next((c for c in reversed(cols) if c != lcol), None)
+    icol   = _pick(cols, ID_COLUMNS)
+    for row in reader:
+        yield (row.get(icol) if icol else None), row.get(tcol), (row.get(lcol) if lcol else None)
+
+
+def _jsonl_rows(data, label_columns=(), skipped=None):
+    for no, line in enumerate(data.splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            obj = json.loads(line)
+        except ValueError as e:
+            obj = e
+        if isinstance(obj, str):
+            yield None, obj, None
+        elif isinstance(obj, dict):
+            yield obj.get(_pick(obj, ID_COLUMNS)), obj.get(_pick(obj, TEXT_COLUMNS)), obj.get(_pick(obj, label_columns))
+        elif skipped is not None:
+            skipped.append((no, f"invalid JSON: {obj}" if isinstance(obj, ValueError) else
+                                f"expected an object or a string, got {type(obj).__name__}"))
+
+
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def complete_pack(client, items, settings, model=TEXT_MODEL):
+    """One completion for a pack; returns ``{id: result}`` for every item that parsed."""
+    r = client.chat.completions.create(
+        model=model,
+        messages=[{"role":"system","content":SYSTEM},
+                  {"role":"user","content":batch_prompt(items, settings)}],
+        temperature=0.1, max_tokens=min(8000, 120 + 180 * len(items)))
+    try:
+        rows = parse_array(r.choices[0].message.content)
+    except ValueError:
+        return {}
+    wanted = {i for i, _ in items}
+    return {str(row["id"]): dict(row, model=model) for row in rows
+            if isinstance(row, dict) and str(row.get("id")) in wanted and "verdict" in row}
+
+
+def escalate(client, router, policy, packed, settings, size=20):
+    """Run ``{id: (text, result)}`` down ``policy.cascade`` in place, one set of packs per step.
+
+    Like ``Router.run``: a message the stronger model's pack does not
+    answer keeps the weaker verdict.
+    """
+    live = list(packed)
+    for step in range(len(policy.cascade)):
+        up = [mid for mid in live if router.escalate(policy, step, packed[mid][1])]
+        if not up:
+            break
+        name, live = policy.cascade[step + 1], []
+        for pack in chunked([(mid, packed[mid][0]) for mid in up], size):
+            try:
+                got = complete_pack(client, pack, settings, name)
+            except Exception:
+                got = {}
+            for mid, text in pack:
+                if mid in got:
+                    got[mid].pop("id", None)
+                    packed[mid] = (text, router.merge(packed[mid][1], got[mid]))
+                    live.append(mid)
+
+
+def analyze_batch(client, items, settings, single, size=20, cache=None, prefilter=None, progress=None,
+                  campaigns=None, model=TEXT_MODEL, router=None, policy=None):
+    """Analyze ``[(id, text), ...]``; returns ``{id: result}`` in input order.
+
+    ``single(text)`` is the one-message fallback for items a pack did not
+    return. With a ``cache`` the per-item keys match the single-message path,
+    so bulk and interactive scans share hits. A ``prefilter`` (``RuleEngine``)
+    settles obvious items before they take a slot in a pack, and a
+    ``CampaignIndex`` answers near-duplicates of already analyzed messages.
+    Packs go to ``model``, or with a ``router`` down ``policy.cascade``
+    (``escalate``) before they are cached.
+    """
+    if policy is not None:
+        model = policy.cascade[0]
+    results, todo = {}, []
+    for mid, text in items:
+        hit = prefilter.check(text, settings) if prefilter else None
+        if hit is None and cache:
+            hit = cache.get(make_key(text, ("text",) + settings.model_key()))
+        if hit is None and campaigns is not None:
+            hit = campaigns.check(text, settings)
+        if hit is not None:
+            results[mid] = hit
+        else:
+            todo.append((mid, text))
+    done = len(results)
+    if progress: progress(done, len(items))
+    alone = [it for it in todo if len(it[1]) > PACK_CHARS]
+    todo  = [it for it in todo if len(it[1]) <= PACK_CHARS]
+    for mid, text in alone:
+        try:
+            results[mid] = single(text)
+        except Exception as e:
+            results[mid] = error_result(e)
+        done += 1
+        if progress: progress(done, len(items))
+    packed = {}                                 # id -> (text, result) for the items a pack answered
+    for pack in chunked(todo, size):
+        try:
+            got = complete_pack(client, pack, settings, model)
+        except Exception:
+            got = {}
+        for mid, text in pack:
+            res = got.get(mid)
+            if res is None:
+                try:
+                    results[mid] = single(text)
+                except Exception as e:
+                    results[mid] = error_result(e)
+            else:
+                res.pop("id", None)
+                packed[mid] = (text, res)
+            done += 1
+        if progress: progress(done, len(items))
+    if router is not None:
+        escalate(client, router, policy, packed, settings, size)
+    for mid, (text, res) in packed.items():
+        if cache: cache.set(make_key(text, ("text",) + settings.model_key()), res)
+        if campaigns is not None: campaigns.add(text, settings, res)
+        results[mid] = res
+    return {mid: results[mid] for mid, _ in items}
@@ -0,0 +1,306 @@
+"""Offline benchmarks for the detection paths.
+
+    python -m spamshield.bench suite --json bench.json    # against a local FakeGroq
+    python -m spamshield.bench compare before.json bench.json
+    python -m spamshield.bench modes                      # full vs fast mode
+    python -m spamshield.bench modes --base-url https://api.groq.com -n 20
+    python -m spamshield.bench suite --backend classifier:model.npz    # in process, no network
+
+``suite`` runs the labeled ``samples.CORPUS`` through the text, image (the
+corpus rendered as screenshots), packed-batch and async paths. Each path
+runs twice, cold then warm, against a seeded :class:`~spamshield.fake_groq.FakeGroq`
+with fixed latency, token rate, error and malformed-output rates. It
+reports throughput, p50/p95/p99 latency, cache hit rate, and
+accuracy/precision/recall (SPAM or SUSPICIOUS counts as flagged). It also
+microbenchmarks ``parse`` on well-formed and broken replies. With
+``--json`` the results and the configuration are saved with the git
+revision; ``compare`` prints the change per metric between two such files.
+``--backend`` (a ``backends.load`` spec) runs against that backend instead of
+the fake provider; an in-process one replays exactly, without network access.
+
+``modes`` times the full SCHEMA path against fast mode (compact verdict,
+plus the lazy explanation that non-CLEAN verdicts trigger): time to the
+first verdict and to the end of the stream in the app, and the blocking
+``analyze_text`` call the HTTP API and bulk scans make. Rules and the cache
+are off, so every request reaches the model. Without ``--base-url``, a
+:class:`~spamshield.fake_groq.FakeGroq` with a fixed first-token latency and
+output token rate stands in for the provider.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import platform
+import subprocess
+import textwrap
+import time
+import timeit
+
+from .backends import GroqBackend, load as load_backend
+from .cache import VerdictCache
+from .detector import Detector
+from .fake_groq import MALFORMED, FakeGroq, malform
+from .imaging import prepare
+from .parsing import STATS as PARSE
+from .prompts import Settings, parse
+from .rules import RuleEngine
+from .samples import CORPUS
+from .transport import ResilientCaller
+
+
+def _pct(xs, q):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))] if xs else 0.0
+
+
+def bench_modes(detector, texts, rounds=1):
+    """``{mode: {"verdict": [s], "total": [s], "call": [s], "explain": [s]}}`` over ``texts`` x ``rounds``."""
+    out = {}
+    for mode, settings in (("full", Settings()), ("fast", Settings(fast=True))):
+        rec = out[mode] = {"verdict": [], "total": [], "call": [], "explain": []}
+        for _ in range(rounds):
+            for text in texts:
+                for event, result, timing in detector.stream_text(text, settings):
+                    pass
+                rec["verdict"].append(timing["first_verdict"])
+                rec["total"].append(timing["total"])
+                t0 = time.perf_counter()
+                detector.analyze_text(text, settings)
+                rec["call"].append(time.perf_counter() - t0)
+                if result.get("compact") and result["verdict"] != "CLEAN":
+                    t0 = time.perf_counter()
+                    detector.explain(text, result, settings)
+                    rec["explain"].append(time.perf_counter() - t0)
+    return out
+
+
+def report(res):
+    lines = [f"{'mode':<6} {'verdict p50':>12} {'verdict p95':>12} {'stream p50':>11} {'call p50':>9} "
+             f"{'explain p50':>12}"]
+    for mode, r in res.items():
+        ex = f"{_pct(r['explain'], .5):>11.3f}s" if r["explain"] else f"{'—':>12}"
+        lines.append(f"{mode:<6} {_pct(r['verdict'], .5):>11.3f}s {_pct(r['verdict'], .95):>11.3f}s "
+                     f"{_pct(r['total'], .5):>10.3f}s {_pct(r['call'], .5):>8.3f}s {ex}")
+    return "\n".join(lines)
+
+
+# ── Suite ───────────────────────────────────────────────────────────
+def render(text, width=640):
+    """PNG "screenshot" of ``text``: black on white, wrapped at 60 columns."""
+    from PIL import Image, ImageDraw
+    lines = textwrap.wrap(text, 60) or [""]
+    img = Image.new("RGB", (width, 24 + 18 * len(lines)), "white")
+    draw = ImageDraw.Draw(img)
+    for i, line in enumerate(lines):
+        draw.text((12, 12 + 18 * i), line, fill="black")
+    out = io.BytesIO()
+    img.save(out, "PNG")
+    return out.getvalue()
+
+
+def classification(labels, verdicts):
+    """Accuracy, precision and recall with SPAM/SUSPICIOUS as the positive (flagged) class."""
+    tp = fp = fn = tn = err = 0
+    for label, v in zip(labels, verdicts):
+        if v not in ("SPAM", "SUSPICIOUS", "CLEAN"):
+            err += 1
+            continue
+        flagged, spam = v != "CLEAN", label == "SPAM"
+        tp += flagged and spam; fp += flagged and not spam; fn += spam and not flagged; tn += not (flagged or spam)
+    n = tp + fp + fn + tn
+    return {"accuracy": (tp + tn) / n if n else 0.0, "precision": tp / (tp + fp) if tp + fp else 0.0,
+            "recall": tp / (tp + fn) if tp + fn else 0.0, "errors": err}
+
+
+def _latency(xs):
+    return {"p50": _pct(xs, .5), "p95": _pct(xs, .95), "p99": _pct(xs, .99),
+            "mean": sum(xs) / len(xs) if xs else 0.0}
+
+
+def bench_path(make, run, corpus, rounds=2):
+    """``run(detector, corpus) -> (verdicts, per-item seconds or None)`` on one fresh detector, cold then warm."""
+    detector, out = make(), []
+    labels = [label for _, label in corpus]
+    for r in range(rounds):
+        before = detector.cache.stats()
+        t0 = time.perf_counter()
+        verdicts, lat = run(detector, corpus)
+        wall = time.perf_counter() - t0
+        after = detector.cache.stats()
+        lookups = after["hits"] + after["misses"] - before["hits"] - before["misses"]
+        out.append({"round": "cold" if r == 0 else "warm", "n": len(corpus), "seconds": wall,
+                    "throughput": len(corpus) / wall if wall else 0.0,
+                    "latency": _latency(lat) if lat else None,
+                    "cache_hit_rate": (after["hits"] - before["hits"]) / lookups if lookups else 0.0,
+                    **classification(labels, verdicts)})
+    return out
+
+
+def _sequential(call):
+    def run(detector, corpus):
+        verdicts, lat = [], []
+        for item in corpus:
+            t0 = time.perf_counter()
+            verdicts.append(call(detector, item)["verdict"])
+            lat.append(time.perf_counter() - t0)
+        return verdicts, lat
+    return run
+
+
+def bench_parse(number=2000):
+    """Microseconds per ``parse`` call on a valid reply and on each malformed shape."""
+    valid = json.dumps(FakeGroq.verdict(CORPUS[0][0]))
+    out = {}
+    for kind in ("valid",) + MALFORMED:
+        raw = valid if kind == "valid" else malform(valid, kind)
+        def once():
+            try:
+                parse(raw)
+            except ValueError:
+                pass
+        out[kind] = timeit.timeit(once, number=number) / number * 1e6
+    return out
+
+
+def suite(url, key="x", corpus=CORPUS, rounds=2, pack=8, concurrency=8, rules=True, fake=None, backend=None):
+    """All paths against the provider at ``url``, or ``backend``; returns a JSON-serializable dict."""
+    backend = backend or GroqBackend(key, url, max_retries=0)
+    images = {}
+    for text, label in corpus:
+        prep = prepare(render(text))
+        images[prep.b64] = prep
+        if fake is not None:
+            fake.images[hashlib.sha256(prep.b64.encode()).hexdigest()] = text
+    shots = list(images.values())
+
+    def make():
+        caller = ResilientCaller(timeout=30, retries=3, backoff=0.05)
+        return Detector(backend=backend, caller=caller,
+                        cache=VerdictCache(maxsize=10000), rules=RuleEngine() if rules else None)
+
+    def batch(detector, corpus):
+        res = detector.analyze_batch([(str(i), t) for i, (t, _) in enumerate(corpus)], size=pack)
+        return [res[str(i)]["verdict"] for i in range(len(corpus))], None
+
+    def concurrent(detector, corpus):
+        res = detector.async_engine(concurrency=concurrency).run(t for t, _ in corpus)
+        return [r["verdict"] for r in res], None
+
+    shot_of = dict(zip((t for t, _ in corpus), shots))
+    image = _sequential(lambda d, item: d.analyze_image(shot_of[item[0]].b64, shot_of[item[0]].mime,
+                                                        image_key=shot_of[item[0]].key))
+    before = PARSE.stats()
+    paths = {"text": bench_path(make, _sequential(lambda d, item: d.analyze_text(item[0])), corpus, rounds)}
+    if backend.vision:
+        paths["image"] = bench_path(make, image, corpus, rounds)
+    paths["batch"] = bench_path(make, batch, corpus, rounds)
+    paths["async"] = bench_path(make, concurrent, corpus, rounds)
+    after = PARSE.stats()
+    out = {"paths": paths, "parse_stats": {k: after[k] - before[k] for k in ("ok", "repaired", "failed", "fix_retries")},
+           "parse_us": bench_parse()}
+    if fake is not None:
+        out["provider"] = {"requests": fake.requests, "errors": fake.errors, "malformed": fake.malformed}
+    return out
+
+
+def suite_report(res):
+    lines = [f"{'path':<6} {'round':<5} {'msg/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'hit':>5} "
+             f"{'acc':>5} {'prec':>5} {'rec':>5} {'err':>4}"]
+    for path, rounds in res["paths"].items():
+        for r in rounds:
+            lat = r["latency"] or {}
+            ms = lambda k: f"{lat[k] * 1000:>6.1f}ms" if k in lat else f"{'—':>8}"
+            lines.append(f"{path:<6} {r['round']:<5} {r['throughput']:>8.1f} {ms('p50')} {ms('p95')} {ms('p99')} "
+                         f"{r['cache_hit_rate']:>5.0%} {r['accuracy']:>5.2f} {r['precision']:>5.2f} "
+                         f"{r['recall']:>5.2f} {r['errors']:>4}")
+    lines.append("parse µs/call  " + "  ".join(f"{k} {v:.1f}" for k, v in res["parse_us"].items()))
+    ps = res["parse_stats"]
+    lines.append(f"parse stats    ok {ps['ok']}  repaired {ps['repaired']}  fix retries {ps['fix_retries']}  "
+                 f"failed {ps['failed']}")
+    if "provider" in res:
+        pv = res["provider"]
+        lines.append(f"provider       {pv['requests']} requests  {pv['errors']} injected errors  "
+                     f"{pv['malformed']} malformed replies")
+    return "\n".join(lines)
+
+
+def _revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _flatten(d, prefix=""):
+    out = {}
+    for k, v in (d.items() if isinstance(d, dict) else enumerate(d)):
+        name = f"{prefix}{k if not isinstance(v, dict) or 'round' not in v else v['round']}"
+        if isinstance(v, (dict, list)):
+            out.update(_flatten(v, name + "."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[name] = v
+    return out
+
+
+def compare(old, new):
+    """One line per metric present in both runs: old, new and relative change."""
+    a, b = _flatten(old["results"]), _flatten(new["results"])
+    lines = [f"{old.get('revision') or 'old'} -> {new.get('revision') or 'new'}"]
+    for k in sorted(a.keys() & b.keys()):
+        if a[k] == b[k]:
+            continue
+        delta = f"{(b[k] - a[k]) / a[k]:+.1%}" if a[k] else "new"
+        lines.append(f"{k:<40} {a[k]:>12.4g} {b[k]:>12.4g} {delta:>8}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m spamshield.bench")
+    ap.add_argument("what", choices=["modes", "suite", "compare"])
+    ap.add_argument("files", nargs="*", help="compare: two --json outputs")
+    ap.add_argument("--base-url", default=None, help="provider URL; default: a local FakeGroq")
+    ap.add_argument("--backend", default=None, help="a backends.load spec, e.g. classifier:model.npz")
+    ap.add_argument("-n", "--rounds", type=int, default=None, help="modes: rounds (5); suite: passes (2)")
+    ap.add_argument("--latency", type=float, default=None, help="FakeGroq first-token latency (s)")
+    ap.add_argument("--token-rate", type=float, default=750, help="FakeGroq output tokens/s")
+    ap.add_argument("--error-rate", type=float, default=0.02, help="suite: FakeGroq injected error rate")
+    ap.add_argument("--malformed-rate", type=float, default=0.1, help="suite: FakeGroq broken-JSON rate")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--pack", type=int, default=8, help="suite: messages per batch prompt")
+    ap.add_argument("--concurrency", type=int, default=8, help="suite: async engine concurrency")
+    ap.add_argument("--no-rules", action="store_true", help="suite: send everything to the model")
+    ap.add_argument("--json", default=None, help="suite: write results here")
+    a = ap.parse_args(argv)
+    if a.what == "compare":
+        if len(a.files) != 2:
+            ap.error("compare needs two result files")
+        with open(a.files[0]) as f0, open(a.files[1]) as f1:
+            print(compare(json.load(f0), json.load(f1)))
+        return
+    url, key, fake = a.base_url, os.environ.get("GROQ_API_KEY", "x"), None
+    backend = load_backend(a.backend) if a.backend else None
+    if url is None and backend is None:
+        suite_mode = a.what == "suite"
+        fake = FakeGroq(latency=a.latency if a.latency is not None else 0.05 if suite_mode else 0.2,
+                        token_rate=a.token_rate, seed=a.seed,
+                        error_rate=a.error_rate if suite_mode else 0.0,
+                        malformed_rate=a.malformed_rate if suite_mode else 0.0)
+        srv, url = fake.serve()
+    if a.what == "suite":
+        res = suite(url, key, rounds=a.rounds or 2, pack=a.pack, concurrency=a.concurrency,
+                    rules=not a.no_rules, fake=fake, backend=backend)
+        print(suite_report(res))
+        if a.json:
+            config = {k: v for k, v in vars(a).items() if k not in ("what", "files", "json")}
+            with open(a.json, "w") as f:
+                json.dump({"revision": _revision(), "python": platform.python_version(), "config": config,
+                           "corpus": len(CORPUS), "results": res}, f, indent=1)
+        return
+    detector = Detector(backend=backend or GroqBackend(key, url, max_retries=0))
+    print(report(bench_modes(detector, [t for t, _ in CORPUS], a.rounds or 5)))
+
+
+if __name__ == "__main__":
+    main()
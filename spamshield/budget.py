@@ -0,0 +1,183 @@
+"""Token-aware input budgeting for the text model.
+
+A flat ``text[:3000]`` cut spends tokens on signatures and legal footers and
+can drop the phishing link at the bottom of a long email. ``fit`` counts
+tokens with a local approximation of the Llama 3 tokenizer and keeps whole
+sentences in priority order:
+
+1. sender / subject style header lines,
+2. sentences containing URLs (bare URLs if the sentence alone is too big),
+3. the first and last paragraphs,
+4. sentences that trip a text rule (urgency, prizes, credentials, ...),
+5. everything else, front to back.
+
+Kept sentences are reassembled in their original order with ``[…]`` marking
+gaps. ``completion_budget`` sizes ``max_tokens`` from the enabled checks and
+the input length instead of a flat 800. Groq counts ``max_tokens`` against
+the tokens-per-minute limit, so a smaller reserve buys throughput even when
+the reply itself is the same length. The reserve is measured, not guessed:
+a pretty-printed, fenced SCHEMA reply with a three-sentence reason
+(``REPLY_TOKENS``) plus one signal (``SIGNAL_TOKENS``) per enabled check and
+one more, with ``HEADROOM`` on top. A truncated reply is invalid JSON and
+costs a fix round trip, so the reserve errs long. ``STATS`` tracks tokens saved.
+Messages many times the budget are not fitted but split (``chunking``).
+"""
+import json
+import re
+import threading
+from typing import NamedTuple
+
+from .rules import RULES
+
+TOKEN_BUDGET = 750              # input tokens; roughly the old 3000-character cut
+MAX_TOKENS   = 800              # the flat completion budget this replaces
+GAP          = "[…]"
+
+_PIECE   = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+_PARA    = re.compile(r"\n\s*\n")
+_SENT    = re.compile(r"(?<=[.!?])\s+")
+_URL     = re.compile(r"(?:https?://|www\.)\S+|\b(?:[\w-]+\.)+[a-z]{2,}/\S*", re.I)
+_HEAD    = re.compile(r"^\s*(?:from|sender|reply-to|to|subject|date)\s*:", re.I)
+_TRIGGER = [re.compile(r.pattern, re.M) for r in RULES if r.scope == "text"]
+_CHECKS  = ("check_phishing", "check_urgency", "check_offers", "check_impersonate", "check_sentiment")
+
+
+def count_tokens(text):
+    """Approximate Llama 3 token count: short words are one token, long words and digit runs split."""
+    n = 0
+    for m in _PIECE.finditer(text):
+        w = m.end() - m.start()
+        c = text[m.start()]
+        n += -(-w // 3) if c.isdigit() else 1 + (w - 1) // 8 if c.isalpha() else 1
+    return n
+
+
+class Fitted(NamedTuple):
+    text: str
+    tokens_in: int      # the whole input
+    tokens_out: int     # what is sent
+
+    @property
+    def saved(self):
+        return self.tokens_in - self.tokens_out
+
+
+class _Unit(NamedTuple):
+    para: int
+    line: int
+    text: str
+    tokens: int
+    prio: int
+
+
+def _units(text, max_unit, edge_cap):
+    paras = [p for p in _PARA.split(text.strip()) if p.strip()]
+    units = []
+    for pi, para in enumerate(paras):
+        own = []
+        for li, line in enumerate(para.splitlines()):
+            if not line.strip():
+                continue
+            head = _HEAD.match(line) is not None
+            for sent in _SENT.split(line):
+                sent = sent.strip()
+                if not sent:
+                    continue
+                words = sent.split(" ")
+                # A run-on "sentence" (no punctuation at all) is cut into word chunks.
+                step  = max(1, len(words) * max_unit // max(1, count_tokens(sent)))
+                for i in range(0, len(words), step):
+                    piece = " ".join(words[i:i + step])
+                    prio  = (0 if head else 1 if _URL.search(piece)
+                             else 3 if any(rx.search(piece.lower()) for rx in _TRIGGER) else 4)
+                    own.append(_Unit(pi, li, piece, count_tokens(piece), prio))
+        # The opening of the first paragraph and the close of the last one,
+        # up to ``edge_cap`` tokens each, so one huge paragraph cannot starve the rest.
+        for edge, order in ((pi == 0, range(len(own))), (pi == len(paras) - 1, range(len(own) - 1, -1, -1))):
+            spent = 0
+            for j in order if edge else ():
+                spent += own[j].tokens
+                if spent > edge_cap:
+                    break
+                if own[j].prio > 2:
+                    own[j] = own[j]._replace(prio=2)
+        units.extend(own)
+    return units
+
+
+def fit(text, budget=TOKEN_BUDGET):
+    """``Fitted`` with ``text`` trimmed to about ``budget`` tokens, highest-value sentences first."""
+    total = count_tokens(text)
+    if total <= budget:
+        return Fitted(text, total, total)
+    units  = _units(text, max(8, budget // 4), budget // 4)
+    chosen = {}
+    used   = 0
+    for i in sorted(range(len(units)), key=lambda i: (units[i].prio, i)):
+        u = units[i]
+        if used + u.tokens + 1 <= budget:
+            chosen[i] = u.text
+            used += u.tokens + 1
+        elif u.prio == 1:
+            urls = " ".join(_URL.findall(u.text))
+            cost = count_tokens(urls) + 2
+            if used + cost <= budget:
+                chosen[i] = urls
+                used += cost
+    if not chosen:                       # one unbreakable blob: plain cut
+        cut = text[:budget * 3]
+        return Fitted(cut, total, count_tokens(cut))
+    out, prev, gap = [], None, False
+    for i, u in enumerate(units):
+        if i not in chosen:
+            gap = True
+            continue
+        if prev is not None:
+            out.append("\n\n" if u.para != prev.para else "\n" if u.line != prev.line else " ")
+        if gap:
+            out.append(GAP + " ")
+        out.append(chosen[i])
+        prev, gap = u, False
+    if gap:
+        out.append(" " + GAP)
+    fitted = "".join(out)
+    return Fitted(fitted, total, count_tokens(fitted))
+
+
+# ── Completion budget ─────────────────────────────────────────────────
+_REPLY  = {"verdict": "SUSPICIOUS", "confidence": 72, "signals": [], "spam_score": 68,
+           "reason": "The message claims your account will be suspended unless you confirm your login within "
+                     "24 hours, and the link points to a lookalike domain rather than the bank's own site. "
+                     "Urgency combined with a credential request is a classic phishing pattern.",
+           "category": "Social Engineering", "sentiment": "Manipulative"}
+_SIGNAL = {"label": "Lookalike domain imitating the bank's login page", "severity": "medium"}
+
+REPLY_TOKENS  = count_tokens("```json\n" + json.dumps(_REPLY, indent=2) + "\n```")
+SIGNAL_TOKENS = count_tokens(json.dumps(_SIGNAL, indent=2))
+HEADROOM      = 1.5     # for the tokenizer approximation and wordier replies
+
+
+def completion_budget(settings, tokens_in=0):
+    """``max_tokens`` for one SCHEMA reply: the measured reply, a signal per enabled check, a little for long inputs."""
+    checks = sum(bool(getattr(settings, c, False)) for c in _CHECKS)
+    return min(MAX_TOKENS, round(HEADROOM * (REPLY_TOKENS + SIGNAL_TOKENS * (checks + 1))) + tokens_in // 8)
+
+
+class BudgetStats:
+    def __init__(self):
+        self.requests = self.trimmed = self.prompt_saved = self.completion_saved = 0
+        self._lock = threading.Lock()
+
+    def add(self, fitted, max_tokens):
+        with self._lock:
+            self.requests         += 1
+            self.trimmed          += fitted.saved > 0
+            self.prompt_saved     += fitted.saved
+            self.completion_saved += MAX_TOKENS - max_tokens
+
+    def stats(self):
+        return {"requests": self.requests, "trimmed": self.trimmed, "prompt_saved": self.prompt_saved,
+                "completion_saved": self.completion_saved}
+
+
+STATS = BudgetStats()
@@ -0,0 +1,101 @@
+"""Content-addressed verdict cache.
+
+Keys are a SHA-256 over the normalized message plus the detection settings,
+so the same spam blast scanned with the same sidebar settings is answered
+from memory instead of another completion. Two tiers:
+
+- an in-process LRU bounded by ``maxsize`` with a per-entry TTL;
+- an optional SQLite file shared by every session/worker that survives restarts.
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+_WS = re.compile(r"\s+")
+
+
+def normalize(text):
+    """NFKC-fold and collapse whitespace so trivial re-formatting still hits."""
+    return _WS.sub(" ", unicodedata.normalize("NFKC", text or "")).strip()
+
+
+def make_key(text, settings=()):
+    h = hashlib.sha256(normalize(text).encode("utf-8"))
+    h.update(b"\x00")
+    h.update(json.dumps(list(settings), default=str, separators=(",", ":")).encode("utf-8"))
+    return h.hexdigest()
+
+
+class VerdictCache:
+    def __init__(self, maxsize=1024, ttl=86400.0, path=None):
+        self.maxsize = maxsize
+        self.ttl     = ttl
+        self.path    = path
+        self._mem    = OrderedDict()   # key -> (expires, json)
+        self._lock   = threading.Lock()
+        self._db     = None
+        self.hits = self.misses = self.disk_hits = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS verdicts "
+                             "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None:
+                if hit[0] > now:
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(hit[1])
+                del self._mem[key]
+            if self._db is not None:
+                row = self._db.execute("SELECT value, expires FROM verdicts WHERE key=?", (key,)).fetchone()
+                if row and row[1] > now:
+                    self._put_mem(key, row[0], row[1])
+                    self.hits += 1; self.disk_hits += 1
+                    return json.loads(row[0])
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        blob    = json.dumps(value, separators=(",", ":"))
+        expires = time.time() + self.ttl
+        with self._lock:
+            self._put_mem(key, blob, expires)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO verdicts VALUES (?,?,?)", (key, blob, expires))
+
+    def _put_mem(self, key, blob, expires):
+        self._mem[key] = (expires, blob)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.maxsize:
+            self._mem.popitem(last=False)
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            for k in [k for k, (exp, _) in self._mem.items() if exp <= now]:
+                del self._mem[k]
+            if self._db is not None:
+                self._db.execute("DELETE FROM verdicts WHERE expires<=?", (now,))
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM verdicts")
+            self.hits = self.misses = self.disk_hits = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "disk_hits": self.disk_hits,
+                "size": len(self._mem), "hit_rate": self.hits / total if total else 0.0}
@@ -0,0 +1,200 @@
+"""Near-duplicate campaign index (MinHash + LSH banding).
+
+Spam blasts are templates: the same text with a different name, amount,
+phone number or tracking token, so the exact-hash ``VerdictCache`` misses
+every variant. Messages are normalized first: a URL becomes its hostname and
+digit runs, e-mail addresses and long hex or base64 tokens become
+placeholders. Each message is then reduced to a MinHash signature over word
+bigrams.
+
+A signature is ``num_perm`` 32-bit values in an ``array('I')``, 256 bytes at
+the default 64. Signatures are split into ``bands`` buckets, so lookups touch
+only messages that share a band. Candidates are confirmed by estimated
+Jaccard similarity at or above ``threshold``. A match reuses the stored
+verdict, tagged ``source="campaign"`` with its ``similarity``.
+
+Only SPAM and SUSPICIOUS verdicts are reused. A phishing message cloned
+from a real notice differs from it in little more than the link, so a
+CLEAN near-duplicate is not evidence that a message is clean.
+
+The index holds at most ``capacity`` messages, evicting the least recently
+matched first. With ``path`` it is persisted to SQLite (WAL) and reloaded on
+start. Matches are scoped by settings, like the verdict cache.
+"""
+import json
+import random
+import re
+import sqlite3
+import threading
+import zlib
+from array import array
+from collections import OrderedDict
+
+from .cache import make_key
+
+_URL   = re.compile(r"(?:https?://)?((?:[\w-]+\.)+[a-z]{2,})(?:[/?#]\S*)?")
+_EMAIL = re.compile(r"\b[\w.+-]+@[\w-]+\.[\w.]+\b")
+_TOKEN = re.compile(r"\b(?=[a-z0-9_-]*\d)[a-z0-9_-]{12,}\b")
+_NUM   = re.compile(r"\d[\d,.]*")
+_WORD  = re.compile(r"[^\W_]+|[#@]")
+
+REUSE  = ("SPAM", "SUSPICIOUS")      # verdicts a near-duplicate may inherit
+
+_PRIME = (1 << 61) - 1
+_MASK  = 0xFFFFFFFF
+
+
+def shingles(text):
+    """Hashed word bigrams of the template-normalized text."""
+    t = text.lower()
+    t = _EMAIL.sub(" @ ", t)
+    t = _URL.sub(lambda m: " " + m.group(1) + " ", t)
+    t = _TOKEN.sub(" # ", t)
+    t = _NUM.sub(" # ", t)
+    words = _WORD.findall(t)
+    if len(words) < 2:
+        return {zlib.crc32(w.encode()) for w in words}
+    return {zlib.crc32(f"{a} {b}".encode()) for a, b in zip(words, words[1:])}
+
+
+class CampaignIndex:
+    def __init__(self, threshold=0.75, num_perm=64, bands=16, capacity=50000, min_shingles=4,
+                 path=None, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold    = threshold
+        self.num_perm     = num_perm
+        self.bands        = bands
+        self.rows         = num_perm // bands
+        self.capacity     = capacity
+        self.min_shingles = min_shingles
+        self.path         = path
+        rnd = random.Random(seed)
+        self._perms   = [(rnd.randrange(1, _PRIME), rnd.randrange(0, _PRIME)) for _ in range(num_perm)]
+        self._entries = OrderedDict()                   # id -> (scope, signature, result json)
+        self._buckets = [{} for _ in range(bands)]      # band key -> {ids}
+        self._next    = 1
+        self._lock    = threading.Lock()
+        self._db      = None
+        self.lookups = self.matches = self.evictions = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS campaigns "
+                             "(id INTEGER PRIMARY KEY, scope TEXT NOT NULL, sig BLOB NOT NULL, value TEXT NOT NULL)")
+            self._load()
+
+    def signature(self, text):
+        """MinHash signature, or ``None`` for messages too short to match safely."""
+        sh = shingles(text)
+        if len(sh) < self.min_shingles:
+            return None
+        return array("I", [min(((a * x + b) % _PRIME) & _MASK for x in sh) for a, b in self._perms])
+
+    def _band_keys(self, scope, sig):
+        r = self.rows
+        return [hash((scope, sig[i * r:(i + 1) * r].tobytes())) for i in range(self.bands)]
+
+    @staticmethod
+    def _scope(settings):
+        return make_key("", ("campaign",) + (settings.model_key() if settings else ()))[:16]
+
+    def similarity(self, a, b):
+        return sum(x == y for x, y in zip(a, b)) / self.num_perm
+
+    def match(self, text, settings=None):
+        """``(result, similarity)`` for the closest known message above ``threshold``, else ``None``."""
+        sig = self.signature(text)
+        scope = self._scope(settings)
+        with self._lock:
+            self.lookups += 1
+            if sig is None:
+                return None
+            cand = set()
+            for band, key in zip(self._buckets, self._band_keys(scope, sig)):
+                cand.update(band.get(key, ()))
+            best, best_sim = None, self.threshold
+            for eid in cand:
+                e_scope, e_sig, _ = self._entries[eid]
+                if e_scope != scope:
+                    continue
+                sim = self.similarity(sig, e_sig)
+                if sim >= best_sim:
+                    best, best_sim = eid, sim
+            if best is None:
+                return None
+            self.matches += 1
+            self._entries.move_to_end(best)
+            return json.loads(self._entries[best][2]), best_sim
+
+    def check(self, text, settings=None):
+        """Pre-filter protocol: a tagged copy of the matched verdict, else ``None``."""
+        hit = self.match(text, settings)
+        if hit is None:
+            return None
+        result, sim = hit
+        if result.get("verdict") not in REUSE:      # indexed before CLEAN was excluded
+            return None
+        result.update(source="campaign", similarity=round(sim, 2))
+        return result
+
+    def add(self, text, settings, result):
+        """Index ``text`` with its (unpromoted) model verdict, if it is one that ``REUSE`` allows."""
+        if result.get("verdict") not in REUSE or result.get("source"):
+            return
+        sig = self.signature(text)
+        if sig is None:
+            return
+        scope = self._scope(settings)
+        blob  = json.dumps(result, separators=(",", ":"))
+        with self._lock:
+            eid = self._next
+            self._next += 1
+            self._insert(eid, scope, sig, blob)
+            if self._db is not None:
+                self._db.execute("INSERT INTO campaigns VALUES (?,?,?,?)", (eid, scope, sig.tobytes(), blob))
+            while len(self._entries) > self.capacity:
+                self._evict()
+
+    def _insert(self, eid, scope, sig, blob):
+        self._entries[eid] = (scope, sig, blob)
+        for band, key in zip(self._buckets, self._band_keys(scope, sig)):
+            band.setdefault(key, set()).add(eid)
+
+    def _evict(self):
+        eid, (scope, sig, _) = self._entries.popitem(last=False)
+        for band, key in zip(self._buckets, self._band_keys(scope, sig)):
+            ids = band.get(key)
+            if ids is not None:
+                ids.discard(eid)
+                if not ids:
+                    del band[key]
+        if self._db is not None:
+            self._db.execute("DELETE FROM campaigns WHERE id=?", (eid,))
+        self.evictions += 1
+
+    def _load(self):
+        rows = self._db.execute("SELECT id, scope, sig, value FROM campaigns ORDER BY id").fetchall()
+        for eid, scope, raw, blob in rows[-self.capacity:]:
+            sig = array("I")
+            sig.frombytes(raw)
+            if len(sig) == self.num_perm:
+                self._insert(eid, scope, sig, blob)
+        if len(rows) > self.capacity:
+            self._db.execute("DELETE FROM campaigns WHERE id<?", (rows[-self.capacity][0],))
+        self._next = rows[-1][0] + 1 if rows else 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for band in self._buckets:
+                band.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM campaigns")
+            self.lookups = self.matches = self.evictions = 0
+
+    def stats(self):
+        return {"size": len(self._entries), "capacity": self.capacity, "lookups": self.lookups,
+                "matches": self.matches, "evictions": self.evictions,
+                "match_rate": self.matches / self.lookups if self.lookups else 0.0}
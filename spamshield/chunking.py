@@ -0,0 +1,119 @@
+"""Map-reduce over long messages.
+
+``budget.fit`` keeps a message in one prompt by dropping its lowest-value
+sentences. A little over budget that costs nothing. At many times the
+budget it drops whole sections, and a payload at the bottom of a long
+newsletter can go with them. Past ``LONG`` budgets, ``split`` cuts the
+message into chunks of about the budget instead. Cuts fall on sentence or
+line ends where possible, and neighbouring chunks share ``OVERLAP`` tokens,
+so a link or sentence at a cut appears whole in one of them.
+
+The chunks are analyzed concurrently (``Detector`` on a thread pool,
+``AsyncEngine`` as tasks). ``reduce`` folds their verdicts into one SCHEMA
+result. It takes the riskiest chunk's verdict, reason and category and the
+highest ``spam_score``, keeps every chunk's signals, and records
+``chunks = {"total", "analyzed", "riskiest", "span"}``. A chunk that comes
+back ``decisive`` (SPAM at ``DECISIVE`` confidence or more) settles the
+message: the chunks still queued are cancelled. Wall-clock time is then
+about that of one chunk, however long the message.
+
+``spamshield_chunks_total{outcome}`` counts chunks analyzed, failed and
+cancelled.
+"""
+import re
+from typing import NamedTuple
+
+from .budget import GAP, count_tokens
+from .metrics import METRICS
+
+LONG       = 1.5    # split above this many token budgets, fit below
+OVERLAP    = 60     # tokens repeated on both sides of a cut
+MAX_CHUNKS = 16     # past this the chunks grow instead; also the fan-out
+DECISIVE   = 85     # SPAM at this confidence stops the map
+
+_WORD  = re.compile(r"\S+")
+_RANK  = {"SPAM": 2, "SUSPICIOUS": 1, "CLEAN": 0}
+_SEV   = {"high": 2, "medium": 1, "low": 0}
+
+
+class Chunk(NamedTuple):
+    start: int          # character span in the message
+    end: int
+    text: str           # the span, with ``[…]`` at cut edges
+    tokens: int
+
+
+def is_long(text, budget):
+    return count_tokens(text) > budget * LONG
+
+
+def split(text, budget, overlap=OVERLAP, max_chunks=MAX_CHUNKS):
+    """Overlapping ``Chunk`` s of about ``budget`` tokens (more if that would exceed ``max_chunks``)."""
+    words = list(_WORD.finditer(text))
+    cost  = [count_tokens(m.group()) for m in words]
+    size  = max(budget, -(-(sum(cost) - overlap) // max_chunks) + overlap)
+    while True:
+        out = _cut(text, words, cost, size, overlap)
+        if len(out) <= max_chunks:
+            return out
+        size += size // 8                       # cuts backed up to sentence ends; widen and retry
+
+
+def _cut(text, words, cost, size, overlap):
+    out, start = [], 0
+    while start < len(words):
+        end, used = start, 0
+        while end < len(words) and used + cost[end] <= size:
+            used += cost[end]; end += 1
+        end = max(end, start + 1)
+        if end < len(words):
+            # Back up to a sentence or line end in the last quarter of the window.
+            for j in range(end - 1, start + (end - start) * 3 // 4, -1):
+                if words[j].group()[-1] in ".!?" or "\n" in text[words[j].end():words[j + 1].start()]:
+                    end = j + 1
+                    break
+        a, b  = words[start].start(), words[end - 1].end()
+        chunk = (GAP + " " if start else "") + text[a:b] + (" " + GAP if end < len(words) else "")
+        out.append(Chunk(a, b, chunk, count_tokens(chunk)))
+        if end >= len(words):
+            break
+        k, back = end, 0
+        while k > start + 1 and back + cost[k - 1] <= overlap:
+            k -= 1; back += cost[k]
+        start = k
+    return out
+
+
+def decisive(result, at=DECISIVE):
+    return result.get("verdict") == "SPAM" and int(result.get("confidence", 0) or 0) >= at
+
+
+def _risk(r):
+    return _RANK.get(r.get("verdict"), 1), int(r.get("spam_score", 0) or 0), int(r.get("confidence", 0) or 0)
+
+
+def reduce(done, chunks):
+    """One SCHEMA result from ``{chunk index: result}``; CLEAN is only as confident as its least sure chunk."""
+    i   = max(done, key=lambda i: _risk(done[i]))
+    top = done[i]
+    out = dict(top, spam_score=max(int(r.get("spam_score", 0) or 0) for r in done.values()))
+    if top.get("verdict") == "CLEAN":
+        out["confidence"] = min(int(r.get("confidence", 0) or 0) for r in done.values())
+    signals = {}
+    for r in done.values():
+        for s in r.get("signals") or ():
+            label = str(s.get("label", "")).strip().lower()
+            if label not in signals or _SEV.get(s.get("severity"), 0) > _SEV.get(signals[label].get("severity"), 0):
+                signals[label] = s
+    out["signals"] = sorted(signals.values(), key=lambda s: -_SEV.get(s.get("severity"), 0))
+    if out.get("reason") and len(chunks) > 1:
+        out["reason"] = f"Part {i + 1} of {len(chunks)}: {out['reason']}"
+    out["chunks"] = {"total": len(chunks), "analyzed": len(done), "riskiest": i,
+                     "span": [chunks[i].start, chunks[i].end]}
+    return out
+
+
+def record(analyzed, failed, cancelled):
+    for outcome, n in (("analyzed", analyzed), ("failed", failed), ("cancelled", cancelled)):
+        if n:
+            METRICS.inc("spamshield_chunks_total", n, outcome=outcome)
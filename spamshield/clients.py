@@ -0,0 +1,27 @@
+"""The client shape every layer speaks, built in one place.
+
+``wrap(create, real)`` is a client whose ``chat.completions.create(**kw)`` is
+``create(**kw)``; any other attribute is looked up on ``real``. Metering
+(``metrics.metered``), the resilient caller (``transport.resilient``), the
+in-process backends (``backends.Backend.client``) and the async facade over
+a blocking client (``engine.threaded``) are each one ``create`` function on
+top of it.
+"""
+from types import SimpleNamespace
+
+
+class Client:
+    def __init__(self, create, real=None):
+        self._real = real
+        self.chat  = SimpleNamespace(completions=SimpleNamespace(create=create))
+
+    def __getattr__(self, name):
+        real = self.__dict__.get("_real")
+        if real is None:
+            raise AttributeError(name)
+        return getattr(real, name)
+
+
+def wrap(create, real=None):
+    """A client around ``create``; other attributes come from ``real``."""
+    return Client(create, real)
@@ -0,0 +1,308 @@
+"""Local verdict decisions from the model's raw scores.
+
+The first time a result is decided, the model's own answer is stored on it
+as ``raw`` (verdict, confidence, spam_score, model). The reported verdict is
+always derived from ``raw`` with the threshold and mode. Moving either one
+re-decides a result without a new completion. ``sweep`` re-decides 10k past
+scans for a whole range of thresholds in a few milliseconds. Mode is no
+longer sent to the model (see ``Settings.model_key``); it shifts the threshold.
+
+Mode shifts the threshold ``t`` by ``MODE_SHIFT`` points, Strict down and
+Lenient up. Without a calibration, a model verdict moves at most one step,
+and keeps the confidence the model gave:
+
+- SUSPICIOUS at ``t`` confidence or more is reported as SPAM (in Auto,
+  the only rule: the app's original promotion);
+- in Strict, CLEAN with a spam_score of ``t`` or more is reported as
+  SUSPICIOUS;
+- in Lenient, SUSPICIOUS with a spam_score more than ``BAND`` below ``t``
+  is reported as CLEAN.
+
+So Strict flags borderline CLEAN answers and Lenient clears weak
+SUSPICIOUS ones, as the mode prompts used to ask the model to. SPAM stays
+SPAM. Rule and local-model verdicts keep only the first rule. With a
+``Calibration``, the raw
+spam_score of a model verdict (not a rule or local-model one) is mapped to
+a spam probability per model. The map is Platt scaling or isotonic
+regression, fitted offline on labeled results. The verdict then comes from
+that probability:
+
+- SPAM at or above the threshold;
+- SUSPICIOUS within ``BAND`` points below it;
+- CLEAN otherwise.
+
+Confidence is reported on the calibrated scale, so verdicts from different
+models compare.
+
+    python -m spamshield.decision fit labeled.jsonl --method isotonic -o calibration.json
+    python -m spamshield.decision sweep labeled.jsonl --calibration calibration.json
+
+A labeled file has one result per line (as returned by the API, with or
+without ``raw``) plus ``"label": "SPAM"`` or ``"CLEAN"``.
+"""
+import argparse
+import bisect
+import json
+import math
+import sys
+import time
+
+from .parsing import coerce
+
+VERDICTS   = ("SPAM", "SUSPICIOUS", "CLEAN")
+MODE_SHIFT = {"Auto (Balanced)": 0, "Strict (Low Tolerance)": -15, "Lenient (High Tolerance)": 15}
+BAND       = 20     # SUSPICIOUS this many points below the threshold
+LOCAL      = ("rules", "local")   # pre-filter verdicts: their own scale, never calibrated
+
+
+def raw_of(result):
+    """The model's own answer: ``result["raw"]`` once captured, else read from its current fields."""
+    raw = result.get("raw")
+    if raw is None:
+        r       = coerce({k: result[k] for k in ("verdict", "confidence", "spam_score") if k in result})
+        verdict = r.get("verdict", "UNKNOWN")
+        conf    = r.get("confidence", 0)
+        score   = r.get("spam_score")
+        raw = {"verdict": verdict, "confidence": conf,
+               "spam_score": score if score is not None else (100 - conf if verdict == "CLEAN" else conf),
+               "model": result.get("model") or result.get("source") or "*"}
+    return raw
+
+
+def decide(result, threshold=50, mode=None, calibration=None):
+    """Set ``verdict`` and ``confidence`` from ``raw`` in place; returns ``result``. Repeatable."""
+    raw = result["raw"] = raw_of(result)
+    if raw["verdict"] not in VERDICTS:           # ERROR / partial stream results pass through
+        return result
+    shift = MODE_SHIFT.get(mode, 0)
+    t     = threshold + shift
+    if calibration is None or raw["model"] in LOCAL:
+        v, score = raw["verdict"], raw["spam_score"]
+        if v == "SUSPICIOUS" and raw["confidence"] >= t:
+            v = "SPAM"
+        elif raw["model"] in LOCAL:
+            pass
+        elif shift < 0 and v == "CLEAN" and score >= t:
+            v = "SUSPICIOUS"
+        elif shift > 0 and v == "SUSPICIOUS" and score < t - BAND:
+            v = "CLEAN"
+        result["verdict"], result["confidence"] = v, raw["confidence"]
+        return result
+    p = 100 * calibration.prob(raw["spam_score"], raw["model"])
+    result["verdict"]    = "SPAM" if p >= t else "SUSPICIOUS" if p >= t - BAND else "CLEAN"
+    result["confidence"] = round(p if result["verdict"] != "CLEAN" else 100 - p)
+    return result
+
+
+# ── Calibration ───────────────────────────────────────────────────────
+def fit_platt(xs, ys, iters=50):
+    """``(a, b)`` with ``P(spam) = 1 / (1 + exp(a * x + b))``, Newton's method on Platt's smoothed targets."""
+    n1 = sum(ys); n0 = len(ys) - n1
+    hi, lo = (n1 + 1) / (n1 + 2), 1 / (n0 + 2)
+    ts = [hi if y else lo for y in ys]
+    a, b = 0.0, math.log((n0 + 1) / (n1 + 1))
+    for _ in range(iters):
+        ga = gb = haa = hab = hbb = 0.0
+        for x, t in zip(xs, ts):
+            p = _sigmoid(-(a * x + b))
+            d, w = t - p, p * (1 - p)
+            ga += d * x; gb += d
+            haa += w * x * x; hab += w * x; hbb += w
+        haa += 1e-9; hbb += 1e-9
+        det = haa * hbb - hab * hab
+        da, db = (hbb * ga - hab * gb) / det, (haa * gb - hab * ga) / det
+        a, b = a - da, b - db
+        if abs(da) < 1e-9 and abs(db) < 1e-9:
+            break
+    return a, b
+
+
+def fit_isotonic(xs, ys):
+    """``(x, y)`` knots of the monotone (pool-adjacent-violators) fit; ties in ``x`` are pooled first."""
+    pooled = {}
+    for x, y in zip(xs, ys):
+        s = pooled.setdefault(x, [0.0, 0])
+        s[0] += y; s[1] += 1
+    blocks = []                                  # [sum y, count, sum x * count]
+    for x in sorted(pooled):
+        sy, n = pooled[x]
+        blocks.append([sy, n, x * n])
+        while len(blocks) > 1 and blocks[-2][0] / blocks[-2][1] >= blocks[-1][0] / blocks[-1][1]:
+            sy, n, sx = blocks.pop()
+            blocks[-1][0] += sy; blocks[-1][1] += n; blocks[-1][2] += sx
+    return [b[2] / b[1] for b in blocks], [b[0] / b[1] for b in blocks]
+
+
+def _sigmoid(z):
+    return 1 / (1 + math.exp(-z)) if z >= 0 else math.exp(z) / (1 + math.exp(z))
+
+
+class Calibration:
+    """Per-model maps from a raw spam_score (0-100) to P(spam); model ``"*"`` is the fallback."""
+    def __init__(self, maps=None):
+        self.maps = maps or {}    # model -> {"method": "platt", "a", "b"} | {"method": "isotonic", "x", "y"}
+
+    def prob(self, score, model="*"):
+        m = self.maps.get(model) or self.maps.get("*")
+        if m is None:
+            return score / 100
+        if m["method"] == "platt":
+            return _sigmoid(-(m["a"] * score / 100 + m["b"]))
+        x, y = m["x"], m["y"]
+        i = bisect.bisect_right(x, score)
+        if i == 0:
+            return y[0]
+        if i == len(x):
+            return y[-1]
+        return y[i - 1] + (y[i] - y[i - 1]) * (score - x[i - 1]) / (x[i] - x[i - 1])
+
+    @classmethod
+    def fit(cls, rows, method="platt", per_model=True, min_rows=30):
+        """``rows`` is ``[(raw, is_spam), ...]``; models with fewer than ``min_rows`` use the ``"*"`` map."""
+        groups = {"*": rows}
+        if per_model:
+            by = {}
+            for raw, y in rows:
+                by.setdefault(raw.get("model", "*"), []).append((raw, y))
+            groups.update((m, g) for m, g in by.items() if len(g) >= min_rows and m != "*")
+        maps = {}
+        for model, g in groups.items():
+            xs, ys = [raw["spam_score"] for raw, _ in g], [int(bool(y)) for _, y in g]
+            if method == "platt":
+                a, b = fit_platt([x / 100 for x in xs], ys)
+                maps[model] = {"method": "platt", "a": a, "b": b, "n": len(g)}
+            elif method == "isotonic":
+                kx, ky = fit_isotonic(xs, ys)
+                maps[model] = {"method": "isotonic", "x": kx, "y": ky, "n": len(g)}
+            else:
+                raise ValueError(f"unknown calibration method {method!r}")
+        return cls(maps)
+
+    def brier(self, rows):
+        """Mean squared error of the calibrated probabilities against the labels."""
+        return sum((self.prob(raw["spam_score"], raw.get("model", "*")) - bool(y)) ** 2
+                   for raw, y in rows) / max(1, len(rows))
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.maps, f, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def stats(self):
+        return {m: {"method": v["method"], "n": v.get("n", 0)} for m, v in self.maps.items()}
+
+
+# ── Threshold sweep ───────────────────────────────────────────────────
+def sweep(rows, thresholds=range(10, 91, 5), mode=None, calibration=None):
+    """Verdict mix per threshold for ``[(raw, label), ...]`` without deciding each row per threshold.
+
+    Every row reduces to two keys: SPAM when ``spam_key >= t``, else
+    SUSPICIOUS when ``flag_key >= t``. The keys are sorted once, so each
+    threshold costs a few bisections. Rows with a label (True = spam) add
+    precision, recall and F1 of SPAM verdicts.
+    """
+    inf, shift = float("inf"), MODE_SHIFT.get(mode, 0)
+    keys = {True: ([], []), False: ([], []), None: ([], [])}
+    for raw, label in rows:
+        v = raw["verdict"]
+        if v not in VERDICTS:
+            continue
+        if raw.get("model") in LOCAL:
+            spam_key = inf if v == "SPAM" else raw["confidence"] if v == "SUSPICIOUS" else -inf
+            flag_key = -inf if v == "CLEAN" else inf
+        elif calibration is None:
+            score    = raw["spam_score"]
+            spam_key = inf if v == "SPAM" else raw["confidence"] if v == "SUSPICIOUS" else -inf
+            if v == "CLEAN":
+                flag_key = score if shift < 0 else -inf
+            else:
+                flag_key = max(spam_key, score + BAND) if v == "SUSPICIOUS" and shift > 0 else inf
+        else:
+            spam_key = 100 * calibration.prob(raw["spam_score"], raw.get("model", "*"))
+            flag_key = spam_key + BAND
+        k = keys[None if label is None else bool(label)]
+        k[0].append(spam_key); k[1].append(flag_key)
+    for s, f in keys.values():
+        s.sort(); f.sort()
+    out = []
+    for th in thresholds:
+        t, row = th + shift, {"threshold": th}
+        at_least = lambda xs: len(xs) - bisect.bisect_left(xs, t)
+        spam = {lb: at_least(s) for lb, (s, _) in keys.items()}
+        flag = {lb: at_least(f) for lb, (_, f) in keys.items()}
+        total = sum(len(s) for s, _ in keys.values())
+        row.update(SPAM=sum(spam.values()), SUSPICIOUS=sum(flag.values()) - sum(spam.values()),
+                   CLEAN=total - sum(flag.values()))
+        pos = len(keys[True][0])
+        if pos or keys[False][0]:
+            tp, fp = spam[True], spam[False]
+            p = tp / (tp + fp) if tp + fp else 0.0
+            r = tp / pos if pos else 0.0
+            row.update(precision=round(p, 4), recall=round(r, 4), f1=round(2 * p * r / (p + r) if p + r else 0.0, 4))
+        out.append(row)
+    return out
+
+
+# ── CLI ───────────────────────────────────────────────────────────────
+def read_labeled(path):
+    """``[(raw, label), ...]`` from a JSONL file; ``label`` is True/False, or None when absent."""
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            d = json.loads(line)
+            lb = d.get("label")
+            if isinstance(lb, str):
+                lb = lb.strip().upper() in ("SPAM", "1", "TRUE", "YES")
+            rows.append((raw_of(d), None if lb is None else bool(lb)))
+    return rows
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m spamshield.decision")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    f = sub.add_parser("fit", help="fit a calibration on labeled results")
+    f.add_argument("path"); f.add_argument("-o", "--out", default="calibration.json")
+    f.add_argument("--method", choices=("platt", "isotonic"), default="platt")
+    f.add_argument("--global-only", action="store_true", help="one map for every model")
+    f.add_argument("--min-rows", type=int, default=30)
+    s = sub.add_parser("sweep", help="verdict mix and accuracy for every threshold")
+    src = s.add_mutually_exclusive_group(required=True)
+    src.add_argument("path", nargs="?"); src.add_argument("--history", help="a SPAMSHIELD_HISTORY_DB file")
+    s.add_argument("--calibration"); s.add_argument("--mode", choices=list(MODE_SHIFT), default=None)
+    s.add_argument("--json", action="store_true")
+    a = ap.parse_args(argv)
+
+    if a.cmd == "fit":
+        rows = [r for r in read_labeled(a.path) if r[1] is not None]
+        cal  = Calibration.fit(rows, a.method, per_model=not a.global_only, min_rows=a.min_rows)
+        cal.save(a.out)
+        print(f"{len(rows)} labeled results · Brier {Calibration().brier(rows):.4f} raw → "
+              f"{cal.brier(rows):.4f} {a.method} · maps {', '.join(cal.maps)} → {a.out}")
+        return
+    if a.history:
+        from .history import HistoryStore
+        rows = [(raw, None) for raw in HistoryStore(a.history).raws()]
+    else:
+        rows = read_labeled(a.path)
+    cal = Calibration.load(a.calibration) if a.calibration else None
+    t0  = time.perf_counter()
+    out = sweep(rows, mode=a.mode, calibration=cal)
+    dt  = time.perf_counter() - t0
+    if a.json:
+        json.dump(out, sys.stdout, indent=1); print()
+        return
+    cols = [c for c in ("threshold", "SPAM", "SUSPICIOUS", "CLEAN", "precision", "recall", "f1") if c in out[0]]
+    print("  ".join(f"{c:>10}" for c in cols))
+    for row in out:
+        print("  ".join(f"{row[c]:>10}" for c in cols))
+    print(f"{len(rows)} results · {len(out)} thresholds in {dt * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,505 @@
+"""The single detection API used by the app, the HTTP server and scripts.
+
+``Detector`` is side-effect free: settings are explicit arguments rather
+than sidebar globals, nothing touches Streamlit, and the inference client
+is only built the first time a completion is actually needed. ``backend=``
+(a ``backends.Backend``) picks where completions run: Groq by default, an
+OpenAI-compatible server, or a model in process. Pass ``client=`` to run
+against a stub offline, and ``caller=`` (a ``ResilientCaller``) for
+timeouts, retries, hedging and the circuit breaker on every model call.
+With ``ocr=`` (an ``ocr.OCR``), screenshots that read cleanly go to the
+text model instead of the vision model. With ``campaigns=`` (a
+``campaigns.CampaignIndex``), near-duplicates of already analyzed text reuse
+their verdict when the exact cache misses. Verdicts are decided locally
+from the model's raw answer (``decision.decide``), with ``calibration=`` (a
+``decision.Calibration``) mapping raw scores to calibrated probabilities;
+``decide`` re-applies another threshold or mode to any returned result.
+Bulk work (``analyze_batch``, ``async_engine``) goes through
+``caller.plain()``: hedging doubles load that nobody is waiting on.
+Which models are called is up to ``router=`` (a ``models.Router``, by
+default the backend's): the fastest model first, a stronger one only for
+low-confidence or SUSPICIOUS verdicts, per content type. Messages many times the token budget are
+split into overlapping chunks and analyzed concurrently (``chunking``).
+Every call is recorded in ``metrics.METRICS``: latency by verdict path,
+verdict mix, and per-model latency and tokens.
+"""
+import base64
+import copy
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .backends import GroqBackend
+from .batch import analyze_batch
+from .budget import MAX_TOKENS, STATS as BUDGET, TOKEN_BUDGET, completion_budget, fit
+from .cache import make_key
+from .chunking import MAX_CHUNKS, decisive, is_long, record, reduce, split
+from .metrics import FAST, METRICS, metered
+from .models import Router
+from .parsing import STATS, coerce
+from .prompts import (COMPACT, COMPACT_MAX_TOKENS, SCHEMA, SYSTEM, Settings, compact_prompt, explain_prompt,
+                      fix_prompt, image_prompt, parse, parse_compact, promote, text_prompt)
+from .rules import Chain
+from .stream import IncrementalJSON
+from .transport import resilient
+
+
+# ── Shared steps ──────────────────────────────────────────────────────
+# The pipeline is written once, as generators: each yields the model call it
+# needs as ``(messages, model, max_tokens, temperature)`` (or, for the text
+# pipeline, the text it needs a verdict for) and gets the answer back.
+# ``drive`` answers with blocking calls (``Detector``), ``adrive`` with
+# awaited ones (``engine.AsyncEngine``).
+
+def drive(steps, send):
+    """Run ``steps`` to its return value, answering each request with ``send(request)``."""
+    try:
+        req = next(steps)
+        while True:
+            req = steps.send(send(req))
+    except StopIteration as stop:
+        return stop.value
+
+
+async def adrive(steps, send):
+    """``drive`` with an ``async`` ``send``."""
+    try:
+        req = next(steps)
+        while True:
+            req = steps.send(await send(req))
+    except StopIteration as stop:
+        return stop.value
+
+
+class Detector:
+    def __init__(self, api_key=None, client=None, settings=Settings(), threshold=50,
+                 cache=None, rules=None, local_model=None, band=15, caller=None, ocr=None,
+                 token_budget=TOKEN_BUDGET, campaigns=None, calibration=None, router=None, backend=None):
+        self.settings     = settings
+        self.threshold    = threshold
+        self.cache        = cache
+        self.rules        = rules
+        self.local_model  = local_model
+        self.band         = band
+        self.caller       = caller
+        self.ocr          = ocr
+        self.token_budget = token_budget
+        self.campaigns    = campaigns
+        self.calibration  = calibration
+        # The caller owns retries; the SDK's own would multiply them.
+        self.backend      = backend or GroqBackend(api_key, max_retries=0 if caller else 2)
+        self.router       = router or self.backend.router() or Router()
+        self._given       = client
+        self._client      = resilient(metered(client), caller) if client is not None else None
+        self._lock        = threading.Lock()
+        self._bulk        = None
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = resilient(metered(self.backend.client()), self.caller)
+        return self._client
+
+    @property
+    def bulk(self):
+        """This detector with a non-hedging caller, sharing everything else."""
+        if self.caller is None or not self.caller.hedge:
+            return self
+        with self._lock:
+            if self._bulk is None:
+                bulk = copy.copy(self)
+                bulk.caller, bulk._lock = self.caller.plain(), threading.Lock()
+                bulk._client = resilient(metered(self._given), bulk.caller) if self._given is not None else None
+                self._bulk   = bulk
+        return self._bulk
+
+    def _args(self, settings, threshold):
+        return (self.settings if settings is None else settings,
+                self.threshold if threshold is None else threshold)
+
+    def decide(self, result, settings=None, threshold=None):
+        """``result`` re-decided for another threshold or mode, from its ``raw`` scores; no model call."""
+        settings, threshold = self._args(settings, threshold)
+        return promote(result, threshold, settings.mode, self.calibration)
+
+    def prefilter(self, threshold=None):
+        local = None
+        if self.local_model is not None:
+            from .local_model import LocalTier
+            local = LocalTier(self.local_model, self._args(None, threshold)[1], self.band)
+        return Chain(self.rules, local)
+
+    def text_request(self, text, settings, budget=None):
+        """``(messages, max_tokens, fitted)`` with ``text`` fitted to the token budget."""
+        fitted = fit(text, budget or self.token_budget)
+        if settings.fast:
+            prompt, max_tokens = compact_prompt(fitted.text, settings), COMPACT_MAX_TOKENS
+        else:
+            prompt, max_tokens = text_prompt(fitted.text, settings), completion_budget(settings, fitted.tokens_out)
+        BUDGET.add(fitted, max_tokens)
+        return [{"role":"system","content":SYSTEM},{"role":"user","content":prompt}], max_tokens, fitted
+
+    def complete_text(self, text, settings=None, budget=None):
+        """Model verdict for ``text`` down the routing cascade; no pre-filter, cache or threshold.
+
+        A long ``text`` is map-reduced over chunks instead.
+        """
+        settings, _ = self._args(settings, None)
+        if budget is None and is_long(text, self.token_budget):
+            for chunks, done in self._map(text, settings):
+                pass
+            return reduce(done, chunks)
+        messages, max_tokens = self.text_request(text, settings, budget)[:2]
+
+        def call(model):
+            r = self.client.chat.completions.create(model=model.name, messages=messages,
+                                                    temperature=0.1, max_tokens=model.cap(max_tokens))
+            return self._parse(r.choices[0].message.content, model.name, compact=settings.fast)
+        return self.router.run(self.router.policy("text", settings), call)
+
+    def _map(self, text, settings):
+        """``(chunks, {index: result})`` as each chunk's verdict lands, until a decisive one."""
+        chunks = split(text, self.token_budget)
+        pool   = ThreadPoolExecutor(max_workers=min(len(chunks), MAX_CHUNKS), thread_name_prefix="chunk")
+        futs   = {pool.submit(self.complete_text, c.text, settings, budget=c.tokens): i for i, c in enumerate(chunks)}
+        done, errors = {}, []
+        try:
+            for f in as_completed(futs):
+                try:
+                    done[futs[f]] = f.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                yield chunks, done
+                if decisive(done[futs[f]]):
+                    return
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            record(len(done), len(errors), sum(f.cancelled() for f in futs))
+        if errors:
+            raise errors[0]                     # a chunk left unread could hold the payload
+
+    def _send(self, req):
+        messages, model, max_tokens, temperature = req
+        r = self.client.chat.completions.create(model=model, messages=messages,
+                                                temperature=temperature, max_tokens=max_tokens)
+        return r.choices[0].message.content
+
+    def _parse(self, raw, model, compact=False):
+        return drive(self.parse_steps(raw, model, compact), self._send)
+
+    def parse_steps(self, raw, model, compact=False):
+        """``parse`` with one targeted, low-token "fix this JSON" retry instead of failing the scan.
+
+        The retry goes to ``model``, the one that wrote ``raw``, and asks for
+        the same shape (``COMPACT`` when ``compact``), read by the same parser.
+        """
+        t0   = time.perf_counter()
+        read = parse_compact if compact else parse
+        try:
+            return read(raw)
+        except json.JSONDecodeError:
+            STATS.add("fix_retries")
+            fixed = yield ([{"role":"system","content":SYSTEM},
+                            {"role":"user","content":fix_prompt(raw, COMPACT if compact else SCHEMA)}],
+                           model, COMPACT_MAX_TOKENS if compact else 300, 0)
+            return read(fixed)
+        finally:
+            METRICS.observe("spamshield_parse_seconds", time.perf_counter() - t0, buckets=FAST)
+
+    @staticmethod
+    def _observe(kind, path, seconds, result, ocr=None):
+        METRICS.observe("spamshield_requests_seconds", seconds, kind=kind, path=path)
+        if ocr:                                 # 0 on an OCR cache hit
+            METRICS.observe("spamshield_ocr_seconds", ocr)
+        METRICS.inc("spamshield_verdicts_total", kind=kind, verdict=result.get("verdict", "UNKNOWN"))
+        return result
+
+    def analyze_text(self, text, settings=None, threshold=None):
+        t0 = time.perf_counter()
+        result, path = self._analyze_text(text, *self._args(settings, threshold))
+        return self._observe("text", path, time.perf_counter() - t0, result)
+
+    def _analyze_text(self, text, settings, threshold):
+        return drive(self.text_steps(text, settings, threshold), lambda t: self.complete_text(t, settings))
+
+    def text_steps(self, text, settings, threshold):
+        """``(promoted result, path)``; yields ``text`` when only a model verdict will do.
+
+        ``path`` says which stage produced the verdict.
+        """
+        hit = self.prefilter(threshold).check(text, settings)
+        if hit is not None:
+            return self.decide(hit, settings, threshold), hit["source"]
+        key    = make_key(text, ("text",) + settings.model_key())
+        result = self._recall(key, text, settings)
+        path   = "model" if result is None else result.get("source", "cache")
+        if result is None:
+            result = yield text
+            self._remember(key, text, settings, result)
+        return self.decide(result, settings, threshold), path
+
+    def _recall(self, key, text, settings):
+        """Exact cache hit, else a campaign (near-duplicate) match, else ``None``."""
+        hit = self.cache.get(key) if self.cache else None
+        if hit is None and self.campaigns is not None:
+            hit = self.campaigns.check(text, settings)
+        return hit
+
+    def _remember(self, key, text, settings, result):
+        if self.cache: self.cache.set(key, result)
+        if self.campaigns is not None: self.campaigns.add(text, settings, result)
+
+    def explain(self, text, result, settings=None, threshold=None):
+        """Fill in reason, signals, score and sentiment for a fast-mode (``compact``) result.
+
+        Results that already carry an explanation are returned unchanged. The
+        explained result replaces the compact one in the cache, so asking again
+        is free.
+        """
+        settings, threshold = self._args(settings, threshold)
+        if not result.get("compact"):
+            return result
+        key    = make_key(text, ("text",) + settings.model_key())
+        base   = (self.cache.get(key) if self.cache else None) or dict(result)
+        if "chunks" in base:                    # explain the chunk the verdict came from
+            a, b = base["chunks"]["span"]
+            text = text[a:b]
+        fitted = fit(text, self.token_budget)
+        model  = self.router.explainer(base, settings)
+        r = self.client.chat.completions.create(
+            model=model,
+            messages=[{"role":"system","content":SYSTEM},
+                      {"role":"user","content":explain_prompt(fitted.text, settings, base)}],
+            temperature=0.1, max_tokens=completion_budget(settings._replace(fast=False), fitted.tokens_out))
+        base = self._explained(base, self._parse(r.choices[0].message.content, model))
+        if self.cache: self.cache.set(key, base)
+        return self.decide(dict(base), settings, threshold)
+
+    def explain_image(self, b64, mime, result, settings=None, threshold=None, image_key=None):
+        """``explain`` for an image's fast-mode verdict.
+
+        The OCR text is explained when it reads cleanly; otherwise the vision
+        model's full answer supplies the explanation fields.
+        """
+        settings, threshold = self._args(settings, threshold)
+        if not result.get("compact"):
+            return result
+        text = self.ocr_text(b64, image_key)[0]
+        if text is not None:
+            return self.explain(text, result, settings, threshold)
+        model = self.router.policy("image").cascade[0]
+        r = self.client.chat.completions.create(model=model, messages=self._image_messages(b64, mime, settings),
+                                                temperature=0.1, max_tokens=self.router.model(model).cap(900))
+        return self.decide(self._explained(dict(result), self._parse(r.choices[0].message.content, model)),
+                           settings, threshold)
+
+    @staticmethod
+    def _explained(base, extra):
+        """``base`` with the explanation fields of ``extra``; no longer compact."""
+        base.update({k: extra[k] for k in ("reason", "signals", "spam_score", "sentiment") if k in extra})
+        if "raw" in base and "spam_score" in extra:
+            base["raw"] = dict(base["raw"], spam_score=extra["spam_score"])
+        base.pop("compact", None)
+        return base
+
+    def _image_messages(self, b64, mime, settings):
+        return [{"role":"user","content":[
+            {"type":"image_url","image_url":{"url":f"data:{mime};base64,{b64}"}},
+            {"type":"text","text":image_prompt(settings)}]}]
+
+    def ocr_text(self, b64, image_key=None):
+        """``(text, seconds)``: OCR text when the read is clean enough for the text model, else ``None``."""
+        if self.ocr is None:
+            return None, 0.0
+        res = self.ocr.read(base64.b64decode(b64), image_key)
+        return (res.text if self.ocr.usable(res) else None), res.seconds
+
+    def analyze_image(self, b64, mime, settings=None, threshold=None, image_key=None):
+        """``image_key`` (e.g. ``PreparedImage.key``) enables the verdict cache for images."""
+        settings, threshold = self._args(settings, threshold)
+        t0     = time.perf_counter()
+        key    = make_key(image_key, ("image",) + settings.model_key()) if image_key else None
+        result = self.cache.get(key) if key and self.cache else None
+        path   = "cache"
+        ocr_s  = None
+        if result is None:
+            text, ocr_s = self.ocr_text(b64, image_key)
+            if text is not None:
+                result, path = self._analyze_text(text, settings, threshold)
+                return self._observe("image", path, time.perf_counter() - t0, result, ocr_s)
+            messages = self._image_messages(b64, mime, settings)
+
+            def call(model):
+                r = self.client.chat.completions.create(model=model.name, messages=messages,
+                                                        temperature=0.1, max_tokens=model.cap(900))
+                return self._parse(r.choices[0].message.content, model.name)
+            result, path = self.router.run(self.router.policy("image"), call), "model"
+            if key and self.cache: self.cache.set(key, result)
+        return self._observe("image", path, time.perf_counter() - t0, self.decide(result, settings, threshold), ocr_s)
+
+    # ── Streaming ─────────────────────────────────────────────────────
+    # Each stream_* call yields (event, result, timing) tuples:
+    #   "verdict" once, when verdict and confidence are both complete and
+    #             no later field can change the decided verdict (in Strict,
+    #             Lenient or with a calibration that means spam_score too),
+    #   "field"   for every later top-level field,
+    #   "escalate" when the router sends the verdict on to a stronger
+    #             model, whose events follow as "field"s,
+    #   "done"    with the full result.
+    # A long text streams one "verdict", then a "field" per chunk, each
+    # carrying the chunks reduced so far.
+    # ``result`` is a promoted copy of everything read so far; ``timing``
+    # carries "first_verdict" and, on "done", "total" in seconds, plus
+    # "ocr" for images when the OCR stage ran and, for model calls on text,
+    # "prompt_saved" / "completion_saved" tokens from the budgeter. The
+    # "done" timing also names the ``path`` that produced the verdict.
+
+    def _observed(self, kind, events):
+        for event, result, timing in events:
+            if event == "done":
+                self._observe(kind, timing.get("path", "model"), timing["total"], result, timing.get("ocr"))
+            yield event, result, timing
+
+    def stream_text(self, text, settings=None, threshold=None):
+        yield from self._observed("text", self._stream_text(text, *self._args(settings, threshold)))
+
+    def _stream_text(self, text, settings, threshold):
+        t0  = time.perf_counter()
+        hit = self.prefilter(threshold).check(text, settings)
+        key = make_key(text, ("text",) + settings.model_key())
+        if hit is None:
+            hit = self._recall(key, text, settings)
+        if hit is not None:
+            dt = time.perf_counter() - t0
+            yield "done", self.decide(hit, settings, threshold), {"first_verdict": dt, "total": dt, "path": hit.get("source", "cache")}
+            return
+        if settings.fast:
+            # A compact verdict is a handful of tokens; streaming it buys nothing.
+            result = self.complete_text(text, settings)
+            self._remember(key, text, settings, result)
+            dt = time.perf_counter() - t0
+            yield "done", self.decide(result, settings, threshold), {"first_verdict": dt, "total": dt, "path": "model"}
+            return
+        if is_long(text, self.token_budget):
+            first = None
+            for chunks, done in self._map(text, settings):
+                result = reduce(done, chunks)
+                first  = first or time.perf_counter() - t0
+                yield "field" if len(done) > 1 else "verdict", self.decide(dict(result), settings, threshold), {"first_verdict": first}
+            self._remember(key, text, settings, result)
+            yield "done", self.decide(result, settings, threshold), {"first_verdict": first, "path": "model",
+                                                                      "total": time.perf_counter() - t0}
+            return
+        messages, max_tokens, fitted = self.text_request(text, settings)
+        yield from self._stream_cascade(self.router.policy("text", settings), messages, max_tokens, settings,
+                                        threshold, t0, store=lambda r: self._remember(key, text, settings, r),
+                                        meta={"prompt_saved": fitted.saved, "completion_saved": MAX_TOKENS - max_tokens})
+
+    def stream_image(self, b64, mime, settings=None, threshold=None, image_key=None):
+        yield from self._observed("image", self._stream_image(b64, mime, *self._args(settings, threshold), image_key))
+
+    def _stream_image(self, b64, mime, settings, threshold, image_key):
+        t0  = time.perf_counter()
+        key = make_key(image_key, ("image",) + settings.model_key()) if image_key else None
+        hit = self.cache.get(key) if key and self.cache else None
+        if hit is not None:
+            dt = time.perf_counter() - t0
+            yield "done", self.decide(hit, settings, threshold), {"first_verdict": dt, "total": dt, "path": "cache"}
+            return
+        text, ocr_s = self.ocr_text(b64, image_key)
+        if text is not None:
+            events = self._stream_text(text, settings, threshold)
+        else:
+            events = self._stream_cascade(self.router.policy("image"), self._image_messages(b64, mime, settings), 900,
+                                          settings, threshold, t0,
+                                          store=(lambda r: self.cache.set(key, r)) if key and self.cache else None)
+        offset = time.perf_counter() - t0 if text is not None else 0.0
+        for event, result, timing in events:
+            if self.ocr is not None:
+                timing = dict(timing, ocr=ocr_s)
+                for k in ("first_verdict", "total"):
+                    if k in timing: timing[k] += offset
+            yield event, result, timing
+
+    def _stream_cascade(self, policy, messages, max_tokens, settings, threshold, t0, store=None, meta=None):
+        """``_stream`` down ``policy.cascade``; "first_verdict" stays the first model's."""
+        result = first = None
+        for step, name in enumerate(policy.cascade):
+            got = []
+            try:
+                for event, partial, timing in self._stream(messages, name, self.router.model(name).cap(max_tokens),
+                                                           settings, threshold, t0, store=got.append, meta=meta):
+                    if first is not None:       # a stronger model: its verdict lands as a field
+                        timing = dict(timing, first_verdict=first)
+                        event  = "field" if event == "verdict" else event
+                    if event != "done":
+                        yield event, partial, timing
+            except Exception:
+                if result is None:
+                    raise
+                break                           # keep the weaker model's verdict
+            first  = timing["first_verdict"]
+            result = got[0] if result is None else self.router.merge(result, got[0])
+            if not self.router.escalate(policy, step, result):
+                break
+            yield "escalate", self.decide(dict(result), settings, threshold), dict(timing)
+        if store: store(result)
+        yield "done", self.decide(dict(result), settings, threshold), dict(timing, total=time.perf_counter() - t0)
+
+    def _partial(self, fields, settings, threshold):
+        """``fields`` decided, or None while the decision still hangs on a spam_score not yet read."""
+        if "spam_score" in fields:
+            partial = self.decide(fields, settings, threshold)
+        else:
+            lo, hi = (self.decide(dict(fields, spam_score=s), settings, threshold) for s in (0, 100))
+            if (lo["verdict"], lo["confidence"]) != (hi["verdict"], hi["confidence"]):
+                return None
+            partial = dict(fields, verdict=lo["verdict"], confidence=lo["confidence"])
+        partial.pop("raw", None)                # a partial's raw is not the model's answer
+        return partial
+
+    def _stream(self, messages, model, max_tokens, settings, threshold, t0, store=None, meta=None):
+        reader, raw, timing = IncrementalJSON(), [], {"first_verdict": None, **(meta or {})}
+        chunks = self.client.chat.completions.create(model=model, messages=messages, temperature=0.1,
+                                                     max_tokens=max_tokens, stream=True)
+        for chunk in chunks:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            raw.append(delta)
+            # Nothing is decided until the model has given both verdict and confidence.
+            if reader.feed(delta) and "verdict" in reader.fields and "confidence" in reader.fields:
+                partial = self._partial(coerce(dict(reader.fields, model=model)), settings, threshold)
+                if partial is None:
+                    continue
+                event = "verdict" if timing["first_verdict"] is None else "field"
+                if timing["first_verdict"] is None:
+                    timing["first_verdict"] = time.perf_counter() - t0
+                yield event, partial, dict(timing)
+        result = self._parse("".join(raw), model)  # coerced and repaired, like the blocking path
+        result["model"] = model
+        timing["total"] = time.perf_counter() - t0
+        if timing["first_verdict"] is None:
+            timing["first_verdict"] = timing["total"]
+        if store: store(result)
+        yield "done", self.decide(dict(result), settings, threshold), timing
+
+    def analyze_batch(self, items, settings=None, threshold=None, size=20, progress=None):
+        """``[(id, text), ...]`` packed into shared prompts; returns ``{id: result}`` in input order."""
+        settings, threshold = self._args(settings, threshold)
+        bulk = self.bulk
+        res = analyze_batch(bulk.client, items, settings, lambda t: bulk.analyze_text(t, settings, threshold),
+                            size=size, cache=self.cache, prefilter=self.prefilter(threshold), progress=progress,
+                            campaigns=self.campaigns, router=self.router, policy=self.router.policy("text", settings))
+        return {mid: self.decide(r, settings, threshold) for mid, r in res.items()}
+
+    def async_engine(self, concurrency=8, timeout=30.0, settings=None, threshold=None):
+        """An ``AsyncEngine`` sharing this detector's settings, cache, pre-filters and ``client=`` stub."""
+        from .engine import AsyncEngine, threaded
+        settings, threshold = self._args(settings, threshold)
+        return AsyncEngine(client=threaded(self._given) if self._given is not None else None,
+                           settings=settings, threshold=threshold, concurrency=concurrency, timeout=timeout,
+                           caller=self.bulk.caller, detector=self.bulk)
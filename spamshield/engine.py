@@ -0,0 +1,157 @@
+"""Asyncio analysis engine on the backend's async client (``backends``).
+
+Many analyses run concurrently under a semaphore (``concurrency``), each with
+its own timeout, and results are delivered in input order. The pipeline is
+the ``Detector``'s own (``text_steps``, ``parse_steps``, ``text_request``,
+``decide`` and its metrics), driven with ``adrive``: only the model calls
+are awaited, so a verdict does not depend on which engine made it. Long
+messages fan out into chunk tasks (``chunking``); a decisive chunk cancels
+the ones still in flight.
+"""
+import asyncio
+import time
+from collections import deque
+
+from .chunking import decisive, is_long, record, reduce, split
+from .budget import TOKEN_BUDGET
+from .clients import wrap
+from .detector import Detector, adrive
+from .metrics import metered
+from .prompts import Settings, error_result
+from .transport import resilient
+
+
+def threaded(client):
+    """An async client over a blocking one (e.g. a test stub): each ``create`` runs on the default thread pool."""
+    create = client.chat.completions.create
+    return wrap(lambda **kw: asyncio.to_thread(create, **kw))
+
+
+class AsyncEngine:
+    """``detector=`` shares that detector's pipeline; otherwise one is built from the other arguments."""
+    def __init__(self, client=None, api_key=None, settings=Settings(), threshold=50, backend=None,
+                 concurrency=8, timeout=30.0, cache=None, prefilter=None, caller=None,
+                 token_budget=TOKEN_BUDGET, campaigns=None, calibration=None, router=None, detector=None):
+        self.detector     = detector or Detector(api_key, settings=settings, threshold=threshold, cache=cache,
+                                                 rules=prefilter, caller=caller, token_budget=token_budget,
+                                                 campaigns=campaigns, calibration=calibration, router=router,
+                                                 backend=backend)
+        self.settings     = settings
+        self.threshold    = threshold
+        self.concurrency  = concurrency
+        self.timeout      = timeout
+        self.caller       = caller
+        self.backend      = self.detector.backend
+        self.router       = self.detector.router
+        self.token_budget = self.detector.token_budget
+        self._client      = resilient(metered(client, is_async=True), caller, is_async=True) if client is not None else None
+        self._sem         = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            raw = self.backend.async_client()
+            self._client = resilient(metered(raw, is_async=True), self.caller, is_async=True)
+        return self._client
+
+    def _limit(self):
+        # Created lazily so the semaphore binds to the running loop.
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.concurrency)
+        return self._sem
+
+    async def _send(self, req):
+        messages, model, max_tokens, temperature = req
+        async with self._limit():
+            r = await asyncio.wait_for(
+                self.client.chat.completions.create(model=model, messages=messages,
+                                                    temperature=temperature, max_tokens=max_tokens),
+                self.timeout)
+        return r.choices[0].message.content
+
+    async def _complete(self, messages, model, max_tokens, compact=False):
+        raw    = await self._send((messages, model, max_tokens, 0.1))
+        result = await adrive(self.detector.parse_steps(raw, model, compact), self._send)
+        result["model"] = model
+        return result
+
+    async def analyze_text(self, text):
+        t0 = time.perf_counter()
+        result, path = await adrive(self.detector.text_steps(text, self.settings, self.threshold),
+                                    self._complete_text)
+        return self.detector._observe("text", path, time.perf_counter() - t0, result)
+
+    async def _complete_text(self, text, budget=None):
+        if budget is None and is_long(text, self.token_budget):
+            return await self._map(text)
+        messages, max_tokens = self.detector.text_request(text, self.settings, budget)[:2]
+        return await self.router.arun(self.router.policy("text", self.settings), lambda m: self._complete(
+            messages, m.name, m.cap(max_tokens), compact=self.settings.fast))
+
+    async def _map(self, text):
+        """Chunks of a long ``text`` as concurrent tasks, reduced; a decisive chunk cancels the rest."""
+        chunks  = split(text, self.token_budget)
+        tasks   = {asyncio.ensure_future(self._complete_text(c.text, c.tokens)): i for i, c in enumerate(chunks)}
+        pending = set(tasks)
+        done, errors, settled = {}, [], False
+        try:
+            while pending:
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in finished:
+                    if t.exception() is not None:
+                        errors.append(t.exception())
+                    else:
+                        done[tasks[t]] = t.result()
+                if any(decisive(done[tasks[t]]) for t in finished if tasks[t] in done):
+                    settled = True
+                    break
+        finally:
+            for t in pending:
+                t.cancel()
+            record(len(done), len(errors), len(pending))
+        if errors and not settled:
+            raise errors[0]
+        return reduce(done, chunks)
+
+    async def analyze_image(self, b64, mime):
+        t0       = time.perf_counter()
+        messages = self.detector._image_messages(b64, mime, self.settings)
+        result   = await self.router.arun(self.router.policy("image"),
+                                          lambda m: self._complete(messages, m.name, m.cap(900)))
+        result   = self.detector.decide(result, self.settings, self.threshold)
+        return self.detector._observe("image", "model", time.perf_counter() - t0, result)
+
+    async def _safe(self, coro):
+        try:
+            return await coro
+        except Exception as e:
+            return error_result(e)
+
+    async def iter_ordered(self, texts):
+        """Yield ``(index, result)`` in input order as soon as each prefix is done.
+
+        At most ``4 * concurrency`` tasks are in flight, so a 100k-message scan
+        does not materialize 100k coroutines up front.
+        """
+        window, it = deque(), iter(enumerate(texts))
+        for i, t in it:
+            window.append((i, asyncio.ensure_future(self._safe(self.analyze_text(t)))))
+            if len(window) >= 4 * self.concurrency:
+                break
+        while window:
+            i, task = window.popleft()
+            yield i, await task
+            nxt = next(it, None)
+            if nxt is not None:
+                window.append((nxt[0], asyncio.ensure_future(self._safe(self.analyze_text(nxt[1])))))
+
+    async def map(self, texts, progress=None):
+        out = []
+        async for i, res in self.iter_ordered(texts):
+            out.append(res)
+            if progress: progress(i + 1, len(texts))
+        return out
+
+    def run(self, texts, progress=None):
+        """Blocking entry point for sync callers (Streamlit, CLI)."""
+        return asyncio.run(self.map(list(texts), progress))
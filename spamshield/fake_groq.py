@@ -0,0 +1,206 @@
+"""Local stand-in for the Groq chat completions endpoint.
+
+Speaks the OpenAI-compatible ``POST /openai/v1/chat/completions`` that the
+Groq SDK uses, both plain and ``stream=True`` (SSE), with injectable latency,
+a per-output-token generation rate and errors, so retries, hedging, the
+circuit breaker, streaming and output-length savings can be exercised offline::
+
+    python -m spamshield.fake_groq --port 8765 --latency 0.3 --error-rate 0.1
+    GROQ_BASE_URL=http://127.0.0.1:8765 GROQ_API_KEY=x streamlit run app.py
+
+Replies are canned: a keyword heuristic picks a SCHEMA verdict (or the
+compact, explanation, batch-array or JSON-fix form when the prompt asks for
+it), or set ``reply`` to return fixed content. ``images`` maps the SHA-256
+of an image's base64 payload to the text it shows, so vision requests get
+the verdict for that text. With ``malformed_rate``, replies come back the
+way small models break JSON (fenced, wrapped in prose, single-quoted,
+trailing comma, truncated, or prose only), all drawn from the seeded RNG.
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_SPAMMY  = re.compile(r"urgent|verify|winner|prize|claim|loan|suspended|password|otp|click|free", re.I)
+_PACKED  = re.compile(r'^\[([^\]\n]+)\] """(.*?)"""$', re.S | re.M)
+_VERDICT = re.compile(r"\b(SPAM|SUSPICIOUS|CLEAN)\b")
+_CONF    = {"SPAM": 90, "SUSPICIOUS": 60, "CLEAN": 85}
+MALFORMED = ("fenced", "prose", "single_quotes", "trailing_comma", "truncated", "prose_only")
+
+
+def malform(text, kind):
+    """``text`` (a JSON object) broken the way ``kind`` names."""
+    if kind == "fenced":         return f"```json\n{text}\n```"
+    if kind == "prose":          return f"Here is my analysis:\n{text}\nLet me know if you need more."
+    if kind == "single_quotes":  return text.replace('"', "'")
+    if kind == "trailing_comma": return text[:-1] + ",}"
+    if kind == "truncated":      return text[:max(1, len(text) - 12)]
+    d = json.loads(text)
+    return f"This message is {d.get('verdict', 'CLEAN')} with {d.get('confidence', 50)}% confidence."
+
+
+class FakeGroq:
+    def __init__(self, latency=0.05, jitter=0.0, error_rate=0.0, error_codes=(429, 500, 503),
+                 retry_after=None, reply=None, chunk_chars=8, token_rate=None, seed=None, images=None,
+                 malformed_rate=0.0):
+        self.latency     = latency
+        self.jitter      = jitter
+        self.error_rate  = error_rate
+        self.error_codes = tuple(error_codes)
+        self.retry_after = retry_after
+        self.reply       = reply
+        self.chunk_chars = chunk_chars
+        self.token_rate  = token_rate       # output tokens/s; None = instant
+        self.images      = images or {}     # sha256(base64 payload) -> text shown in the image
+        self.malformed_rate = malformed_rate
+        self.malformed   = 0
+        self.rng         = random.Random(seed)
+        self.requests    = 0
+        self.errors      = 0
+        self._lock       = threading.Lock()
+
+    @staticmethod
+    def verdict(text):
+        """The canned SCHEMA reply for a message: three or more spam keywords is SPAM, one is SUSPICIOUS."""
+        hits = len(_SPAMMY.findall(text))
+        verdict = "SPAM" if hits >= 3 else "SUSPICIOUS" if hits else "CLEAN"
+        return {"verdict": verdict, "confidence": _CONF[verdict],
+                "reason": f"Fake server matched {hits} spam keywords.",
+                "signals": [{"label": "keyword match", "severity": "high" if hits >= 3 else "low"}] if hits else [],
+                "spam_score": min(100, hits * 30), "category": "Scam" if hits else "Legitimate",
+                "sentiment": "Alarming" if hits else "Neutral"}
+
+    def content(self, messages):
+        if self.reply is not None:
+            return self.reply(messages) if callable(self.reply) else self.reply
+        last = messages[-1]["content"] if messages else ""
+        if isinstance(last, list):
+            urls = [p["image_url"]["url"] for p in last if isinstance(p, dict) and p.get("type") == "image_url"]
+            last = " ".join(p.get("text", "") for p in last if isinstance(p, dict))
+            for u in urls:
+                shown = self.images.get(hashlib.sha256(u.split(",", 1)[-1].encode()).hexdigest())
+                if shown is not None:
+                    last += "\nMESSAGE: " + shown
+        if last.startswith("Rewrite the text below"):
+            m = _VERDICT.search(last.split("TEXT:", 1)[-1])
+            v = m.group(1) if m else "CLEAN"
+            return json.dumps(dict(self.verdict(""), verdict=v, confidence=_CONF[v]))
+        if "\nMESSAGES:\n" in last:
+            return json.dumps([{"id": mid, **self.verdict(t)} for mid, t in _PACKED.findall(last.split("\nMESSAGES:\n", 1)[1])])
+        full = self.verdict(last.split("MESSAGE:")[-1])
+        if '"v":"S|U|C"' in last:
+            return json.dumps({"v": full["verdict"][0], "c": full["confidence"],
+                               "k": "S" if full["spam_score"] else "L"}, separators=(",", ":"))
+        if "Explain that verdict" in last:
+            full = {k: full[k] for k in ("reason", "signals", "spam_score", "sentiment")}
+        text = json.dumps(full)
+        with self._lock:
+            kind = self.rng.choice(MALFORMED) if self.rng.random() < self.malformed_rate else None
+            if kind: self.malformed += 1
+        return malform(text, kind) if kind else text
+
+    def gen_seconds(self, text):
+        """Generation time for ``text`` at ``token_rate`` (about 4 characters per token)."""
+        return len(text) / 4 / self.token_rate if self.token_rate else 0.0
+
+    def _fault(self):
+        with self._lock:
+            self.requests += 1
+            fail = self.rng.random() < self.error_rate
+            if fail: self.errors += 1
+            delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+            code  = self.rng.choice(self.error_codes) if fail else None
+        return delay, code
+
+    def handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *a):
+                pass
+
+            def _json(self, code, obj, headers=()):
+                body = json.dumps(obj).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for k, v in headers:
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                req = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                delay, code = fake._fault()
+                time.sleep(delay)
+                if code:
+                    hdr = [("Retry-After", str(fake.retry_after))] if code == 429 and fake.retry_after is not None else []
+                    return self._json(code, {"error": {"message": f"injected {code}", "type": "fake"}}, hdr)
+                text  = fake.content(req.get("messages", []))
+                model = req.get("model", "fake")
+                usage = {"prompt_tokens": sum(len(str(m.get("content", ""))) for m in req.get("messages", [])) // 4,
+                         "completion_tokens": len(text) // 4}
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                if not req.get("stream"):
+                    time.sleep(fake.gen_seconds(text))
+                    return self._json(200, {"id": "fake", "object": "chat.completion", "created": int(time.time()),
+                                            "model": model, "usage": usage,
+                                            "choices": [{"index": 0, "finish_reason": "stop",
+                                                         "message": {"role": "assistant", "content": text}}]})
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for i in range(0, len(text), fake.chunk_chars):
+                    time.sleep(fake.gen_seconds(text[i:i + fake.chunk_chars]))
+                    chunk = {"id": "fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                             "choices": [{"index": 0, "delta": {"content": text[i:i + fake.chunk_chars]}, "finish_reason": None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                # Groq reports streaming usage on a final, empty chunk.
+                chunk = {"id": "fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                         "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                         "x_groq": {"id": "fake", "usage": usage}}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+        return Handler
+
+    def serve(self, host="127.0.0.1", port=0):
+        """Start in a daemon thread; returns ``(server, base_url)``."""
+        srv = ThreadingHTTPServer((host, port), self.handler())
+        srv.daemon_threads = True
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        return srv, f"http://{host}:{srv.server_address[1]}"
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m spamshield.fake_groq")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--jitter", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--retry-after", type=float, default=None)
+    ap.add_argument("--token-rate", type=float, default=None, help="output tokens per second")
+    ap.add_argument("--malformed-rate", type=float, default=0.0, help="share of replies with broken JSON")
+    ap.add_argument("--seed", type=int, default=None)
+    a = ap.parse_args(argv)
+    srv, url = FakeGroq(a.latency, a.jitter, a.error_rate, retry_after=a.retry_after, token_rate=a.token_rate,
+                        malformed_rate=a.malformed_rate, seed=a.seed).serve(a.host, a.port)
+    print(f"fake Groq on {url}  (GROQ_BASE_URL={url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        srv.shutdown()
+
+
+if __name__ == "__main__":
+    main()
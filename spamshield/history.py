@@ -0,0 +1,108 @@
+"""Persistent scan history shared by every session and worker.
+
+Scans are appended to a SQLite table in WAL mode, so readers never block the
+writer. The rowid is the time order. Pages are keyset queries
+(``id < before ORDER BY id DESC LIMIT n``) on an index, which costs the same
+at row ten and row ten million. Per-verdict totals live in a small
+``scan_counts`` table. Triggers update it in the same transaction as each
+insert or delete, so ``counts`` is a primary-key read whatever the history
+size. Totals are kept both globally (scope ``"*"``) and per session.
+Each scan also keeps the model's raw answer (``decision.raw_of``), so
+``raws`` can feed a threshold sweep or a calibration fit.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+from .decision import raw_of
+
+VERDICTS = ("SPAM", "SUSPICIOUS", "CLEAN")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL NOT NULL, session TEXT NOT NULL,
+    verdict TEXT NOT NULL, confidence INTEGER NOT NULL, category TEXT NOT NULL,
+    preview TEXT NOT NULL, source TEXT, raw TEXT);
+CREATE INDEX IF NOT EXISTS scans_session ON scans (session, id);
+CREATE INDEX IF NOT EXISTS scans_verdict ON scans (verdict, id);
+CREATE TABLE IF NOT EXISTS scan_counts (
+    scope TEXT NOT NULL, verdict TEXT NOT NULL, n INTEGER NOT NULL, PRIMARY KEY (scope, verdict)) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS scans_ins AFTER INSERT ON scans BEGIN
+    INSERT INTO scan_counts VALUES ('*', NEW.verdict, 1), (NEW.session, NEW.verdict, 1)
+        ON CONFLICT (scope, verdict) DO UPDATE SET n = n + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS scans_del AFTER DELETE ON scans BEGIN
+    UPDATE scan_counts SET n = n - 1 WHERE verdict = OLD.verdict AND scope IN ('*', OLD.session);
+END;
+"""
+
+_COLS = ("id", "ts", "session", "verdict", "confidence", "category", "preview", "source")
+
+
+class HistoryStore:
+    def __init__(self, path=":memory:"):
+        self.path  = path
+        self._db   = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        if "raw" not in {r[1] for r in self._db.execute("PRAGMA table_info(scans)")}:   # pre-raw files
+            self._db.execute("ALTER TABLE scans ADD COLUMN raw TEXT")
+
+    def add(self, result, preview, session=""):
+        """Record one scan; returns its id."""
+        row = (time.time(), session, result.get("verdict", "UNKNOWN"), int(result.get("confidence", 0) or 0),
+               result.get("category", "Unknown"), preview, result.get("source"), json.dumps(raw_of(result)))
+        with self._lock:
+            return self._db.execute("INSERT INTO scans (ts, session, verdict, confidence, category, preview, source, raw) "
+                                    "VALUES (?,?,?,?,?,?,?,?)", row).lastrowid
+
+    def page(self, limit=10, before=None, session=None, verdict=None):
+        """Newest-first scans older than id ``before``, optionally for one session and/or verdict."""
+        where, args = [], []
+        if before is not None:
+            where.append("id < ?"); args.append(before)
+        if session is not None:
+            where.append("session = ?"); args.append(session)
+        if verdict is not None:
+            where.append("verdict = ?"); args.append(verdict)
+        sql = f"SELECT {', '.join(_COLS)} FROM scans" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY id DESC LIMIT ?"
+        with self._lock:
+            rows = self._db.execute(sql, args + [limit]).fetchall()
+        return [dict(zip(_COLS, r)) for r in rows]
+
+    def counts(self, session=None):
+        """``{"SPAM": n, "SUSPICIOUS": n, "CLEAN": n, "total": n}`` from the maintained counters."""
+        with self._lock:
+            rows = self._db.execute("SELECT verdict, n FROM scan_counts WHERE scope = ?",
+                                    ("*" if session is None else session,)).fetchall()
+        out = dict.fromkeys(VERDICTS, 0)
+        out.update(rows)
+        out["total"] = sum(n for _, n in rows)
+        return out
+
+    def raws(self, limit=None, session=None):
+        """Newest-first raw model answers, for ``decision.sweep`` and ``Calibration.fit``."""
+        sql, args = "SELECT raw FROM scans WHERE raw IS NOT NULL", []
+        if session is not None:
+            sql += " AND session = ?"; args.append(session)
+        sql += " ORDER BY id DESC" + (" LIMIT ?" if limit else "")
+        with self._lock:
+            rows = self._db.execute(sql, args + ([limit] if limit else [])).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def clear(self, session=None):
+        """Delete one session's scans, or everything."""
+        with self._lock:
+            if session is None:
+                self._db.execute("DELETE FROM scans")
+                self._db.execute("DELETE FROM scan_counts")
+            else:
+                self._db.execute("DELETE FROM scans WHERE session = ?", (session,))
+                self._db.execute("DELETE FROM scan_counts WHERE scope = ?", (session,))
+
+    def stats(self):
+        c = self.counts()
+        return {"scans": c["total"], "spam": c["SPAM"], "suspicious": c["SUSPICIOUS"], "clean": c["CLEAN"]}
@@ -0,0 +1,101 @@
+"""Image preprocessing before vision calls.
+
+Uploads are decoded once, reduced to their first frame (animated GIFs),
+EXIF-rotated, flattened onto white, downscaled so the long side is at most
+``max_side`` pixels and re-encoded as JPEG. Screenshots stay legible at the
+resolution the vision model actually uses, while an 8 MB phone capture
+shrinks to a few hundred KB. ``key`` is a SHA-256 of the uploaded bytes, so
+the verdict cache only answers for the very same image. Same-layout
+screenshots with different text share a dHash, so the 64-bit difference
+hash is kept only as a similarity hint (``phash``) and never as a key.
+
+``thumbnail`` makes the small preview the UI shows instead of the upload.
+
+Pillow is optional: without it the original bytes are sent unchanged and
+there is no ``phash``.
+"""
+import base64
+import hashlib
+import io
+from typing import NamedTuple
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - Pillow ships with Streamlit
+    Image = None
+
+# What ``prepare`` raises for an upload it cannot read, an oversized one included.
+UNREADABLE = (OSError, ValueError) + ((Image.DecompressionBombError,) if Image else ())
+
+MAX_SIDE = 1280
+QUALITY  = 82
+PREVIEW  = (680, 390)        # 2x the preview box in the app, for sharp HiDPI rendering
+
+
+class PreparedImage(NamedTuple):
+    data: bytes
+    mime: str
+    width: int
+    height: int
+    bytes_in: int
+    key: str
+    phash: str = ""
+
+    @property
+    def b64(self):
+        return base64.b64encode(self.data).decode()
+
+
+def dhash(img, size=8):
+    """64-bit difference hash as 16 hex chars."""
+    g = img.convert("L").resize((size + 1, size), Image.LANCZOS)
+    px = g.tobytes()
+    bits = 0
+    for y in range(size):
+        row = px[y * (size + 1):(y + 1) * (size + 1)]
+        for x in range(size):
+            bits = (bits << 1) | (row[x] > row[x + 1])
+    return f"{bits:0{size * size // 4}x}"
+
+
+def _flatten(img):
+    """RGB with any transparency composited onto white."""
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        bg  = Image.new("RGB", img.size, (255, 255, 255))
+        bg.paste(img, mask=img.getchannel("A"))
+        return bg
+    return img if img.mode == "RGB" else img.convert("RGB")
+
+
+def prepare(data, mime="image/png", max_side=MAX_SIDE, quality=QUALITY):
+    key = "sha256:" + hashlib.sha256(data).hexdigest()
+    if Image is None:
+        return PreparedImage(data, mime or "image/png", 0, 0, len(data), key)
+    img = Image.open(io.BytesIO(data))
+    size = img.size                      # of the bytes as uploaded
+    img.seek(0)                          # first frame of animated GIF/WebP
+    img.draft("RGB", (max_side, max_side))   # JPEG: decode at reduced scale
+    img = _flatten(ImageOps.exif_transpose(img))
+    img.thumbnail((max_side, max_side), Image.LANCZOS)
+    phash = dhash(img)
+    out = io.BytesIO()
+    img.save(out, "JPEG", quality=quality, optimize=True)
+    small = out.getvalue()
+    if len(small) >= len(data) and (mime or "").lower() in ("image/jpeg", "image/png", "image/webp"):
+        # Already compact; re-encoding would only add artifacts.
+        return PreparedImage(data, mime, *size, len(data), key, phash)
+    return PreparedImage(small, "image/jpeg", img.width, img.height, len(data), key, phash)
+
+
+def thumbnail(data, box=PREVIEW, quality=75):
+    """``(jpeg_bytes, width, height)`` fitting ``box``; pass ``PreparedImage.data`` to skip a full decode."""
+    if Image is None:
+        return data, 0, 0
+    img = Image.open(io.BytesIO(data))
+    img.draft("RGB", box)
+    img = _flatten(ImageOps.exif_transpose(img))
+    img.thumbnail(box, Image.LANCZOS)
+    out = io.BytesIO()
+    img.save(out, "JPEG", quality=quality, optimize=True)
+    return out.getvalue(), img.width, img.height
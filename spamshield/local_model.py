@@ -0,0 +1,163 @@
+"""Local CPU classifier tier (pure NumPy).
+
+Messages are turned into hashed sparse features (words, word bigrams and
+character 3-5-grams, CRC32 into ``n_features`` buckets, L2-normalized) and
+scored by a logistic regression trained with full-batch Adagrad. Scoring a
+message takes microseconds. Only messages whose probability lands inside
+``threshold ± band`` escalate to the LLM; the rest map straight onto the
+usual verdict/confidence/category fields.
+
+Train from a labeled CSV/JSONL::
+
+    python -m spamshield.local_model train labeled.csv -o model.npz
+    python -m spamshield.local_model eval labeled.csv -m model.npz
+"""
+import argparse
+import re
+import threading
+import zlib
+
+import numpy as np
+
+from .batch import read_messages
+
+LABEL_COLUMNS = ("label", "verdict", "spam", "class", "y", "target")
+SPAM_LABELS   = {"1", "spam", "true", "yes", "suspicious", "phishing", "scam"}
+
+_WORD = re.compile(r"[a-z0-9$₹€£]+(?:['.][a-z0-9]+)*")
+
+
+def tokens(text):
+    words = _WORD.findall(text.lower())
+    out   = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for w in words:
+        w = f"<{w}>"
+        for n in (3, 4, 5):
+            out.extend(w[i:i + n] for i in range(len(w) - n + 1))
+    return out
+
+
+def featurize(texts, n_features):
+    """CSR triplet ``(indptr, indices, values)`` with L2-normalized counts per row."""
+    indptr, indices, values = [0], [], []
+    for text in texts:
+        row = {}
+        for t in tokens(text):
+            h = zlib.crc32(t.encode("utf-8")) % n_features
+            row[h] = row.get(h, 0) + 1
+        v = np.fromiter(row.values(), np.float32, len(row))
+        v /= np.sqrt((v * v).sum()) or 1.0
+        indices.extend(row); values.append(v)
+        indptr.append(len(indices))
+    return (np.asarray(indptr, np.int64), np.asarray(indices, np.int64),
+            np.concatenate(values) if values else np.zeros(0, np.float32))
+
+
+def _dot(w, X):
+    indptr, indices, values = X
+    contrib = np.concatenate([[0.0], np.cumsum(w[indices] * values, dtype=np.float64)])
+    return contrib[indptr[1:]] - contrib[indptr[:-1]]
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+
+class LocalClassifier:
+    def __init__(self, n_features=2 ** 18):
+        self.n_features = n_features
+        self.w          = np.zeros(n_features, np.float32)
+        self.b          = 0.0
+        self.decided = self.escalated = 0
+        self._lock      = threading.Lock()
+
+    def fit(self, texts, labels, epochs=60, lr=0.5, l2=1e-6):
+        X = featurize(texts, self.n_features)
+        y = np.asarray(labels, np.float64)
+        rows = np.repeat(np.arange(len(y)), np.diff(X[0]))
+        Gw, Gb = np.full(self.n_features, 1e-8), 1e-8
+        w = self.w.astype(np.float64)
+        for _ in range(epochs):
+            g  = _sigmoid(_dot(w, X) + self.b) - y
+            gw = np.bincount(X[1], weights=X[2] * g[rows], minlength=self.n_features) / len(y) + l2 * w
+            gb = g.mean()
+            Gw += gw * gw; Gb += gb * gb
+            w  -= lr * gw / np.sqrt(Gw)
+            self.b -= lr * gb / np.sqrt(Gb)
+        self.w = w.astype(np.float32)
+        return self
+
+    def predict_proba(self, texts):
+        return _sigmoid(_dot(self.w, featurize(texts, self.n_features)) + self.b)
+
+    def decide(self, p, threshold=50, band=15):
+        """Map a spam probability onto a verdict, or ``None`` inside the uncertainty band."""
+        score = p * 100
+        if abs(score - threshold) < band:
+            with self._lock: self.escalated += 1
+            return None
+        with self._lock: self.decided += 1
+        spam = score >= threshold
+        return {"verdict": "SPAM" if spam else "CLEAN",
+                "confidence": round(score if spam else 100 - score),
+                "reason": f"Local classifier scored this message {score:.0f}% spam-like, outside the ±{band}% review band.",
+                "signals": [], "spam_score": round(score),
+                "category": "Unknown" if spam else "Legitimate", "sentiment": "Neutral",
+                "source": "local"}
+
+    def stats(self):
+        total = self.decided + self.escalated
+        return {"decided": self.decided, "escalated": self.escalated,
+                "decided_rate": self.decided / total if total else 0.0}
+
+    def save(self, path):
+        np.savez_compressed(path, w=self.w, b=np.float64(self.b), n_features=np.int64(self.n_features))
+
+    @classmethod
+    def load(cls, path):
+        z = np.load(path)
+        m = cls(int(z["n_features"]))
+        m.w, m.b = z["w"].astype(np.float32), float(z["b"])
+        return m
+
+
+class LocalTier:
+    """Pre-filter adapter: ``check(text, settings)`` like ``RuleEngine``, bound to a threshold and band."""
+    def __init__(self, model, threshold=50, band=15):
+        self.model, self.threshold, self.band = model, threshold, band
+
+    def check(self, text, settings=None):
+        return self.model.decide(float(self.model.predict_proba([text])[0]), self.threshold, self.band)
+
+
+def read_labeled(data, name=""):
+    """``(texts, labels)`` from labeled CSV/JSONL bytes; labels are 1 for spam-like, else 0."""
+    items = read_messages(data, name, LABEL_COLUMNS)
+    return [t for _, t, _ in items], [int(str(l).strip().lower() in SPAM_LABELS) for _, _, l in items]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m spamshield.local_model")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    tr = sub.add_parser("train"); tr.add_argument("data"); tr.add_argument("-o", "--out", default="model.npz")
+    tr.add_argument("--features", type=int, default=2 ** 18); tr.add_argument("--epochs", type=int, default=60)
+    ev = sub.add_parser("eval"); ev.add_argument("data"); ev.add_argument("-m", "--model", default="model.npz")
+    ev.add_argument("--threshold", type=int, default=50); ev.add_argument("--band", type=int, default=15)
+    a = ap.parse_args(argv)
+    with open(a.data, "rb") as f:
+        texts, labels = read_labeled(f.read(), a.data)
+    if a.cmd == "train":
+        LocalClassifier(a.features).fit(texts, labels, epochs=a.epochs).save(a.out)
+        print(f"trained on {len(texts)} messages ({sum(labels)} spam) -> {a.out}")
+        return
+    m = LocalClassifier.load(a.model)
+    p = m.predict_proba(texts) * 100
+    y = np.asarray(labels)
+    sure = np.abs(p - a.threshold) >= a.band
+    acc = ((p[sure] >= a.threshold) == y[sure]).mean() if sure.any() else float("nan")
+    print(f"{len(texts)} messages · decided locally {sure.mean():.1%} · accuracy on decided {acc:.1%} · "
+          f"escalated {(~sure).sum()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""Process-wide metrics in Prometheus text format.
+
+``METRICS`` holds labelled counters and fixed-bucket histograms. Updates
+cost one dict lookup under a lock, and nothing is exported unless someone
+asks. The detector records:
+
+- ``spamshield_requests_seconds{kind,path}``: an ``analyze_*`` / ``stream_*``
+  call, end to end. ``path`` is where the verdict came from (rules, local,
+  cache, campaign, model).
+- ``spamshield_verdicts_total{kind,verdict}``: the verdict mix after promotion.
+- ``spamshield_model_seconds{model}``: one provider attempt. With
+  ``metered`` inside ``resilient``, retries and hedges count separately.
+- ``spamshield_model_tokens_total{model,type}``: prompt and completion tokens
+  from ``usage``.
+- ``spamshield_model_errors_total{model,error}``.
+- ``spamshield_model_cancelled_total{model}``: async attempts cancelled by a
+  timeout, a winning hedge or a decisive chunk; not errors, and not timed.
+- ``spamshield_parse_seconds``: ``_parse``, including a fix retry.
+- ``spamshield_ocr_seconds``: the OCR stage of an image scan, blocking or
+  streamed.
+- ``spamshield_cascade_*``: cascade steps and agreement (``models.Router``).
+- ``spamshield_chunks_total{outcome}``: long-message chunks (``chunking``).
+
+``register`` adds collectors that turn component ``stats()`` dicts into
+gauges at scrape time. ``component_collector`` covers the cache, provider,
+rules, campaigns, OCR and per-model cost. ``render()`` returns the text, and
+``serve(port)`` exposes it on ``/metrics`` for processes (like Streamlit)
+that have no HTTP routes of their own.
+"""
+import asyncio
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .clients import wrap
+
+LATENCY = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+FAST    = (.00001, .00005, .0001, .0005, .001, .005, .01, .05, .1, .5, 1, 5)
+
+HELP = {
+    "spamshield_requests_seconds": ("histogram", "End-to-end detector call latency by verdict path."),
+    "spamshield_verdicts_total": ("counter", "Verdicts returned, after threshold promotion."),
+    "spamshield_model_seconds": ("histogram", "Latency of one provider call attempt."),
+    "spamshield_model_tokens_total": ("counter", "Tokens reported by the provider."),
+    "spamshield_model_errors_total": ("counter", "Provider call attempts that raised."),
+    "spamshield_model_cancelled_total": ("counter", "Async provider call attempts cancelled before an answer."),
+    "spamshield_parse_seconds": ("histogram", "Model output parsing, including a fix retry."),
+    "spamshield_ocr_seconds": ("histogram", "Local OCR of an uploaded image, cache hits excluded."),
+    "spamshield_cascade_steps_total": ("counter", "Cascade steps by model, settled there or escalated."),
+    "spamshield_cascade_agreement_total": ("counter", "Escalated verdicts compared with the stronger model's."),
+    "spamshield_chunks_total": ("counter", "Chunks of long messages analyzed, failed or cancelled."),
+}
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY):
+        self.buckets = buckets
+        self.counts  = [0] * (len(buckets) + 1)      # last slot: +Inf
+        self.sum     = 0.0
+        self.count   = 0
+
+    def observe(self, v):
+        self.counts[bisect.bisect_left(self.buckets, v)] += 1
+        self.sum   += v
+        self.count += 1
+
+    def quantile(self, q):
+        """Bucket-interpolated estimate, as PromQL ``histogram_quantile`` computes it."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            if seen + c >= rank and c:
+                lo = self.buckets[i - 1] if i else 0.0
+                hi = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lo + (hi - lo) * (rank - seen) / c
+            seen += c
+        return self.buckets[-1]
+
+
+def _escape(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}" if labels else ""
+
+
+def _num(v):
+    return repr(float(v)) if isinstance(v, float) else str(int(v))
+
+
+class Metrics:
+    def __init__(self):
+        self.counters   = {}     # (name, labels) -> value
+        self.histograms = {}     # (name, labels) -> Histogram
+        self.collectors = []
+        self._lock      = threading.Lock()
+
+    def inc(self, name, n=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def observe(self, name, value, buckets=LATENCY, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            h = self.histograms.get(key)
+            if h is None:
+                h = self.histograms[key] = Histogram(buckets)
+            h.observe(value)
+
+    def register(self, collector):
+        """``collector()`` returns ``[(name, value, labels dict), ...]``, exported as gauges."""
+        self.collectors.append(collector)
+
+    def series(self, name):
+        """``[(labels dict, value or Histogram), ...]`` for one metric, e.g. for a dashboard."""
+        with self._lock:
+            src = self.histograms if HELP.get(name, ("",))[0] == "histogram" else self.counters
+            return [(dict(labels), v) for (n, labels), v in sorted(src.items(), key=lambda kv: kv[0]) if n == name]
+
+    def render(self):
+        """Prometheus text exposition (format 0.0.4)."""
+        out, typed = [], set()
+        def head(name, kind, text):
+            if name not in typed:
+                typed.add(name)
+                out.append(f"# HELP {name} {text}\n# TYPE {name} {kind}")
+        with self._lock:
+            counters = sorted(self.counters.items())
+            hists    = sorted((k, (list(h.counts), h.sum, h.count, h.buckets)) for k, h in self.histograms.items())
+        for (name, labels), v in counters:
+            head(name, "counter", HELP.get(name, ("", name))[1])
+            out.append(f"{name}{_labels(labels)} {_num(v)}")
+        for (name, labels), (counts, total, n, buckets) in hists:
+            head(name, "histogram", HELP.get(name, ("", name))[1])
+            acc = 0
+            for le, c in zip(list(buckets) + ["+Inf"], counts):
+                acc += c
+                out.append(f"{name}_bucket{_labels(labels + (('le', le),))} {acc}")
+            out.append(f"{name}_sum{_labels(labels)} {_num(float(total))}")
+            out.append(f"{name}_count{_labels(labels)} {n}")
+        for collect in self.collectors:
+            for name, v, labels in collect():
+                head(name, "gauge", name.replace("_", " "))
+                out.append(f"{name}{_labels(tuple(sorted(labels.items())))} {_num(v)}")
+        return "\n".join(out) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def serve(self, port, host="127.0.0.1"):
+        """``/metrics`` on a daemon thread; returns the server."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *a):
+                pass
+
+        srv = ThreadingHTTPServer((host, port), Handler)
+        srv.daemon_threads = True
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        return srv
+
+
+METRICS = Metrics()
+
+
+def component_collector(cache=None, caller=None, rules=None, campaigns=None, ocr=None, router=None):
+    """Collector exporting the ``stats()`` of shared components plus parse and token counters."""
+    from .budget import STATS as BUDGET
+    from .parsing import STATS as PARSE
+
+    def collect():
+        rows = [(f"spamshield_parse_{k}", v, {}) for k, v in PARSE.stats().items()]
+        rows += [(f"spamshield_budget_{k}", v, {}) for k, v in BUDGET.stats().items()]
+        for prefix, comp in (("cache", cache), ("provider", caller), ("campaigns", campaigns), ("ocr", ocr)):
+            if comp is not None:
+                rows += [(f"spamshield_{prefix}_{k}", v, {}) for k, v in comp.stats().items()
+                         if isinstance(v, (int, float)) and not isinstance(v, bool)]
+        if rules is not None:
+            s = rules.stats()
+            rows += [("spamshield_rules_evaluated", s["evaluated"], {}), ("spamshield_rules_decided", s["decided"], {})]
+            rows += [("spamshield_rule_hits", n, {"rule": r}) for r, n in s["rule_hits"].items()]
+        if caller is not None:
+            rows.append(("spamshield_provider_breaker_open", caller.breaker.state != "closed", {}))
+        if router is not None:
+            rows += [("spamshield_model_cost_dollars", s["cost"], {"model": m}) for m, s in router.stats().items()]
+        return rows
+    return collect
+
+
+# ── Client wrapper ────────────────────────────────────────────────────
+def _usage(obj):
+    u = getattr(obj, "usage", None)
+    if u is None:                            # Groq puts streaming usage on the last chunk's x_groq
+        u = getattr(getattr(obj, "x_groq", None), "usage", None)
+    return u
+
+
+def _record(model, t0, usage=None, error=None):
+    METRICS.observe("spamshield_model_seconds", time.perf_counter() - t0, model=model)
+    if error is not None:
+        METRICS.inc("spamshield_model_errors_total", model=model, error=type(error).__name__)
+    if usage is not None:
+        METRICS.inc("spamshield_model_tokens_total", getattr(usage, "prompt_tokens", 0) or 0,
+                    model=model, type="prompt")
+        METRICS.inc("spamshield_model_tokens_total", getattr(usage, "completion_tokens", 0) or 0,
+                    model=model, type="completion")
+
+
+class _MeteredStream:
+    """Passes chunks through; records latency and usage when the stream ends, fails or is abandoned."""
+    def __init__(self, stream, model, t0):
+        self._stream, self._model, self._t0, self._usage, self._done = stream, model, t0, None, False
+
+    def __iter__(self):
+        error = None
+        try:
+            for chunk in self._stream:
+                self._usage = _usage(chunk) or self._usage
+                yield chunk
+        except Exception as e:
+            error = e
+            raise
+        finally:                                # also when the consumer stops early
+            self._finish(error)
+
+    def _finish(self, error=None):
+        if not self._done:
+            self._done = True
+            _record(self._model, self._t0, self._usage, error)
+
+    def close(self):
+        self._finish()
+        if hasattr(self._stream, "close"):
+            self._stream.close()
+
+    def __del__(self):
+        self._finish()                          # never iterated, e.g. a losing hedge
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def metered(client, is_async=False):
+    """``client`` with every ``chat.completions.create`` timed and its token usage counted."""
+    real = client.chat.completions.create
+
+    def create(**kw):
+        model, t0 = kw.get("model", "?"), time.perf_counter()
+        try:
+            r = real(**kw)
+        except Exception as e:
+            _record(model, t0, error=e)
+            raise
+        if kw.get("stream"):
+            return _MeteredStream(r, model, t0)
+        _record(model, t0, _usage(r))
+        return r
+
+    async def acreate(**kw):
+        model, t0 = kw.get("model", "?"), time.perf_counter()
+        try:
+            r = await real(**kw)
+        except asyncio.CancelledError:
+            METRICS.inc("spamshield_model_cancelled_total", model=model)
+            raise
+        except Exception as e:
+            _record(model, t0, error=e)
+            raise
+        _record(model, t0, _usage(r))
+        return r
+    return wrap(acreate if is_async else create, client)
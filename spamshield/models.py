@@ -0,0 +1,184 @@
+"""Model registry and cascade router.
+
+``REGISTRY`` lists the models the detector may call, with their kind
+(text or vision), per-million-token prices and a ``max_tokens`` cap. A
+``Policy`` is a cascade of models from fastest to strongest. The router
+runs the first one and moves to the next only when the verdict needs it:
+confidence below ``escalate_below``, or a verdict in ``escalate_on``
+(SUSPICIOUS by default). A strong model whose call fails leaves the
+earlier verdict standing. Most messages settle on the small model, so the
+average latency stays close to the small model's. The ambiguous ones get
+the large model's answer.
+
+Policies are chosen per content type (``Settings.content_type``), with
+``"*"`` for any other text and ``"image"`` for screenshots. A JSON file
+(``SPAMSHIELD_MODELS``) replaces or extends both tables::
+
+    {"models":   {"llama-3.3-70b-versatile": {"kind": "text", "cost_in": 0.59, "cost_out": 0.79}},
+     "policies": {"*":     {"cascade": ["llama-3.1-8b-instant", "llama-3.3-70b-versatile"],
+                            "escalate_below": 70},
+                  "Email": {"cascade": ["llama-3.3-70b-versatile"]}}}
+
+Each step is counted in ``metrics.METRICS``:
+
+- ``spamshield_cascade_steps_total{model,outcome}``, where outcome is
+  settled or escalated;
+- ``spamshield_cascade_agreement_total{model,reference,agree}``, which
+  compares an escalated verdict with the stronger model's verdict.
+
+``stats()`` joins these with the per-model latency and token series that
+``metrics.metered`` records, and prices the tokens.
+"""
+import json
+from typing import NamedTuple
+
+from .metrics import METRICS
+from .prompts import TEXT_MODEL, VISION_MODEL
+
+
+class Model(NamedTuple):
+    name: str
+    kind: str                   = "text"    # "text" | "vision"
+    cost_in: float              = 0.0       # $ per 1M prompt tokens
+    cost_out: float             = 0.0       # $ per 1M completion tokens
+    max_tokens: int             = 0         # cap on the completion budget, 0 = none
+
+    def cap(self, max_tokens):
+        return min(max_tokens, self.max_tokens) if self.max_tokens else max_tokens
+
+
+class Policy(NamedTuple):
+    cascade: tuple
+    escalate_below: int         = 60
+    escalate_on: tuple          = ("SUSPICIOUS",)
+
+
+# List prices at the time of writing; override them in the config file.
+REGISTRY = {m.name: m for m in (
+    Model(TEXT_MODEL, "text", 0.05, 0.08),
+    Model("llama-3.3-70b-versatile", "text", 0.59, 0.79),
+    Model(VISION_MODEL, "vision", 0.11, 0.34, 900),
+    Model("meta-llama/llama-4-maverick-17b-128e-instruct", "vision", 0.20, 0.60, 900),
+)}
+
+POLICIES = {
+    "*":     Policy((TEXT_MODEL, "llama-3.3-70b-versatile")),
+    "image": Policy((VISION_MODEL,)),
+}
+
+
+class Router:
+    def __init__(self, registry=None, policies=None):
+        self.registry = dict(REGISTRY if registry is None else registry)
+        self.policies = dict(POLICIES if policies is None else policies)
+        for key, p in self.policies.items():
+            unknown = [m for m in p.cascade if m not in self.registry]
+            if unknown or not p.cascade:
+                raise ValueError(f"policy {key!r}: unknown or no models {unknown}")
+
+    @classmethod
+    def load(cls, path):
+        """Defaults, with the file's models and policies added or replaced by name."""
+        with open(path, encoding="utf-8") as f:
+            d = json.load(f)
+        registry = dict(REGISTRY)
+        registry.update((n, Model(n, **m)) for n, m in d.get("models", {}).items())
+        policies = dict(POLICIES)
+        for key, p in d.get("policies", {}).items():
+            policies[key] = Policy(tuple(p["cascade"]), p.get("escalate_below", 60),
+                                   tuple(p.get("escalate_on", ("SUSPICIOUS",))))
+        return cls(registry, policies)
+
+    @classmethod
+    def single(cls, name):
+        """Every text policy is ``name`` alone: for a backend that serves one model, a cascade would repeat it."""
+        return cls(dict(REGISTRY, **{name: Model(name, "text")}), {"*": Policy((name,)), "image": POLICIES["image"]})
+
+    def policy(self, kind, settings=None):
+        """The policy for an image, or for text of ``settings.content_type``."""
+        if kind == "image":
+            return self.policies["image"]
+        return self.policies.get(getattr(settings, "content_type", None)) or self.policies["*"]
+
+    def model(self, name):
+        return self.registry[name]
+
+    def explainer(self, result, settings=None):
+        """The text model that gave ``result`` (so the explanation matches it), else the policy's first."""
+        name = result.get("model")
+        if name in self.registry and self.registry[name].kind == "text":
+            return name
+        return self.policy("text", settings).cascade[0]
+
+    # ── Cascade ───────────────────────────────────────────────────────
+    def escalate(self, policy, step, result):
+        """Whether ``result`` from ``policy.cascade[step]`` goes on to the next model; counted."""
+        more = step + 1 < len(policy.cascade) and (
+            result.get("verdict") in policy.escalate_on or
+            int(result.get("confidence", 0) or 0) < policy.escalate_below)
+        METRICS.inc("spamshield_cascade_steps_total", model=policy.cascade[step],
+                    outcome="escalated" if more else "settled")
+        return more
+
+    def merge(self, prev, result):
+        """``result`` from a stronger model, carrying the verdicts it overruled in ``escalated``."""
+        METRICS.inc("spamshield_cascade_agreement_total", model=prev.get("model", "?"),
+                    reference=result.get("model", "?"), agree=str(prev.get("verdict") == result.get("verdict")).lower())
+        steps = prev.pop("escalated", [])
+        steps.append({k: prev.get(k) for k in ("model", "verdict", "confidence")})
+        return dict(result, escalated=steps)
+
+    def run(self, policy, call):
+        """``call(Model)`` down ``policy.cascade``."""
+        result = None
+        for step, name in enumerate(policy.cascade):
+            try:
+                got = dict(call(self.registry[name]), model=name)
+            except Exception:
+                if result is None:
+                    raise
+                break                           # keep the weaker model's verdict
+            result = got if result is None else self.merge(result, got)
+            if not self.escalate(policy, step, result):
+                break
+        return result
+
+    async def arun(self, policy, call):
+        """``run`` for an ``async`` ``call``."""
+        result = None
+        for step, name in enumerate(policy.cascade):
+            try:
+                got = dict(await call(self.registry[name]), model=name)
+            except Exception:
+                if result is None:
+                    raise
+                break
+            result = got if result is None else self.merge(result, got)
+            if not self.escalate(policy, step, result):
+                break
+        return result
+
+    def stats(self):
+        """Per model: calls, latency, tokens, cost, steps settled / escalated, agreement with the stronger model."""
+        out, blank = {}, dict.fromkeys(("calls", "p50", "p95", "mean", "prompt_tokens", "completion_tokens",
+                                         "cost", "settled", "escalated", "agree", "compared"), 0)
+        for lb, h in METRICS.series("spamshield_model_seconds"):
+            out.setdefault(lb["model"], dict(blank)).update(
+                calls=h.count, p50=h.quantile(.5), p95=h.quantile(.95), mean=h.sum / h.count if h.count else 0.0)
+        for lb, n in METRICS.series("spamshield_model_tokens_total"):
+            s = out.setdefault(lb["model"], dict(blank))
+            s[f"{lb['type']}_tokens"] += n
+        for lb, n in METRICS.series("spamshield_cascade_steps_total"):
+            out.setdefault(lb["model"], dict(blank))[lb["outcome"]] += n
+        for lb, n in METRICS.series("spamshield_cascade_agreement_total"):
+            s = out.setdefault(lb["model"], dict(blank))
+            s["compared"] += n
+            s["agree"] += n if lb["agree"] == "true" else 0
+        for name, s in out.items():
+            m = self.registry.get(name)
+            if m is not None:
+                s["cost"] = (s["prompt_tokens"] * m.cost_in + s["completion_tokens"] * m.cost_out) / 1e6
+            s["agreement"] = s["agree"] / s["compared"] if s["compared"] else None
+            steps = s["settled"] + s["escalated"]
+            s["escalation_rate"] = s["escalated"] / steps if steps else 0.0
+        return out
@@ -0,0 +1,104 @@
+"""Optional local OCR in front of the vision model.
+
+Most screenshots are just a message rendered as pixels. Tesseract reads
+them on the CPU in a few hundred milliseconds. The extracted text can then
+take the fast text-model path instead of the 17B vision model.
+``OCR.read`` reports a mean word confidence. ``OCR.usable`` accepts only
+clean, text-heavy reads, so photos, memes and low-quality captures still
+go to vision.
+
+Results are cached by image key (``PreparedImage.key``). Re-sharing a
+screenshot then skips OCR as well as the model call.
+
+Requires ``pytesseract`` and the ``tesseract`` binary. ``available()``
+reports whether both are present, and nothing here is imported by default.
+"""
+import io
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+try:
+    import pytesseract
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - optional dependency
+    pytesseract = None
+
+
+class OCRResult(NamedTuple):
+    text: str
+    confidence: float       # mean word confidence, 0-100, weighted by word length
+    words: int
+    seconds: float
+
+
+def available():
+    if pytesseract is None:
+        return False
+    try:
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+def _read(data, lang):
+    img = ImageOps.grayscale(Image.open(io.BytesIO(data)))
+    if max(img.size) < 1000:                 # Tesseract wants ~30 px text height
+        img = img.resize((img.width * 2, img.height * 2), Image.LANCZOS)
+    d = pytesseract.image_to_data(img, lang=lang, output_type=pytesseract.Output.DICT)
+    lines, words, weight, total = {}, 0, 0, 0.0
+    for i, word in enumerate(d["text"]):
+        conf = float(d["conf"][i])
+        if conf < 0 or not word.strip():
+            continue
+        lines.setdefault((d["block_num"][i], d["par_num"][i], d["line_num"][i]), []).append(word)
+        words  += 1
+        weight += len(word)
+        total  += conf * len(word)
+    text = "\n".join(" ".join(w) for w in lines.values())
+    return text, (total / weight if weight else 0.0), words
+
+
+class OCR:
+    def __init__(self, min_confidence=80, min_words=6, lang="eng", cache_size=256):
+        self.min_confidence = min_confidence
+        self.min_words      = min_words
+        self.lang           = lang
+        self.cache_size     = cache_size
+        self._cache         = OrderedDict()
+        self._lock          = threading.Lock()
+        self.counts         = {"reads": 0, "cache_hits": 0, "to_text": 0, "to_vision": 0, "seconds": 0.0}
+
+    def read(self, data, key=None):
+        """``OCRResult`` for image bytes; ``seconds`` is 0 on a cache hit."""
+        with self._lock:
+            if key is not None and key in self._cache:
+                self._cache.move_to_end(key)
+                self.counts["cache_hits"] += 1
+                return self._cache[key]._replace(seconds=0.0)
+        t0 = time.perf_counter()
+        text, conf, words = _read(data, self.lang)
+        res = OCRResult(text, conf, words, time.perf_counter() - t0)
+        with self._lock:
+            self.counts["reads"]   += 1
+            self.counts["seconds"] += res.seconds
+            if key is not None:
+                self._cache[key] = res
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return res
+
+    def usable(self, res):
+        ok = res.words >= self.min_words and res.confidence >= self.min_confidence
+        with self._lock:
+            self.counts["to_text" if ok else "to_vision"] += 1
+        return ok
+
+    def stats(self):
+        c = dict(self.counts)
+        routed = c["to_text"] + c["to_vision"]
+        c["text_rate"] = c["to_text"] / routed if routed else 0.0
+        c["avg_seconds"] = c["seconds"] / c["reads"] if c["reads"] else 0.0
+        return c
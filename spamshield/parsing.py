@@ -0,0 +1,198 @@
+"""Tolerant JSON extraction and repair for model output.
+
+``extract`` finds the first balanced ``{...}`` (or ``[...]``) in one pass,
+respecting strings and escapes, instead of a greedy regex that can span two
+objects. If the object never closes, the rest of the text is returned for
+repair. ``repair`` fixes what small models actually emit: single-quoted
+strings, unquoted keys, Python literals, trailing commas, a dangling key or
+comma, an unterminated string, and missing closing brackets. ``coerce``
+normalizes field types. Counters in ``STATS`` record how often repair was needed.
+"""
+import json
+import threading
+
+_CLOSE = {"{": "}", "[": "]"}
+
+
+class ParseStats:
+    def __init__(self):
+        self.ok = self.repaired = self.failed = self.fix_retries = 0
+        self._lock = threading.Lock()
+
+    def add(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def stats(self):
+        total = self.ok + self.repaired + self.failed
+        return {"ok": self.ok, "repaired": self.repaired, "failed": self.failed,
+                "fix_retries": self.fix_retries,
+                "repair_rate": self.repaired / total if total else 0.0,
+                "failure_rate": self.failed / total if total else 0.0}
+
+
+STATS = ParseStats()
+
+
+def extract(raw, opener="{"):
+    """First balanced ``opener`` ... closer span of ``raw``; the unclosed tail if it never balances."""
+    start = raw.find(opener)
+    if start < 0:
+        return raw.strip()
+    depth, in_str, esc, quote = 0, False, False, ""
+    for i in range(start, len(raw)):
+        ch = raw[i]
+        if in_str:
+            if esc:           esc = False
+            elif ch == "\\":  esc = True
+            elif ch == quote: in_str = False
+        elif ch in "\"'":
+            in_str, quote = True, ch
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 0:
+                return raw[start:i + 1]
+    return raw[start:].rstrip().rstrip("`").rstrip()
+
+
+def repair(s):
+    """Best-effort rewrite of almost-JSON into JSON; the result may still be invalid."""
+    out, stack = [], []
+    in_str, esc, quote = False, False, ""
+    i, n = 0, len(s)
+    while i < n:
+        ch = s[i]
+        if in_str:
+            if esc:
+                esc = False; out.append(ch)
+            elif ch == "\\":
+                esc = True; out.append(ch)
+            elif ch == quote:
+                in_str = False; out.append('"')
+            elif ch == '"':           # double quote inside a single-quoted string
+                out.append('\\"')
+            elif ch == "\n":
+                out.append("\\n")
+            else:
+                out.append(ch)
+        elif ch in "\"'":
+            in_str, quote = True, ch; out.append('"')
+        elif ch in "{[":
+            stack.append(ch); out.append(ch)
+        elif ch in "}]":
+            _drop_trailing_comma(out)
+            if stack: stack.pop()
+            out.append(ch)
+        elif ch.isalpha():
+            j = i
+            while j < n and (s[j].isalnum() or s[j] == "_"):
+                j += 1
+            word = s[i:j]
+            k = j
+            while k < n and s[k].isspace():
+                k += 1
+            if k < n and s[k] == ":":    # unquoted key
+                out.append(f'"{word}"')
+            else:
+                out.append({"True": "true", "False": "false", "None": "null"}.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(ch)
+        i += 1
+    if in_str:
+        if esc: out.pop()
+        out.append('"')
+    text = "".join(out).rstrip()
+    # A truncated tail: drop a dangling comma, a key without value or a bare colon.
+    while True:
+        t = text.rstrip()
+        if t.endswith(","):
+            text = t[:-1]
+        elif t.endswith(":"):
+            text = _strip_last_key(t[:-1])
+        else:
+            break
+    if stack and stack[-1] == "{" and text.rstrip().endswith('"') and _ends_with_key(text):
+        text = _strip_last_key(text)
+    return text + "".join(_CLOSE[c] for c in reversed(stack))
+
+
+def _drop_trailing_comma(out):
+    j = len(out) - 1
+    while j >= 0 and out[j].isspace():
+        j -= 1
+    if j >= 0 and out[j] == ",":
+        del out[j]
+
+
+def _ends_with_key(text):
+    """True if the last string token follows ``{`` or ``,`` (a key with no value yet)."""
+    j = text.rstrip()[:-1].rfind('"')
+    while j > 0 and text[j - 1] == "\\":
+        j = text[:j - 1].rfind('"')
+    k = j - 1
+    while k >= 0 and text[k].isspace():
+        k -= 1
+    return k >= 0 and text[k] in "{,"
+
+
+def _strip_last_key(text):
+    t = text.rstrip()
+    if t.endswith('"'):
+        j = t[:-1].rfind('"')
+        t = t[:j] if j >= 0 else t
+    return t.rstrip().rstrip(",")
+
+
+def _int(v):
+    if isinstance(v, bool):
+        return int(v)
+    if isinstance(v, (int, float)):
+        f = float(v)
+    else:
+        try:
+            f = float(str(v).strip().rstrip("%").strip())
+        except ValueError:
+            return 0
+    if isinstance(v, float) and 0 < f <= 1:
+        f *= 100
+    return max(0, min(100, int(round(f))))
+
+
+def coerce(result):
+    """Normalize types in a SCHEMA result in place (ints, upper-case verdict, signal dicts)."""
+    if not isinstance(result, dict):
+        raise json.JSONDecodeError("expected a JSON object", str(result), 0)
+    for k in ("confidence", "spam_score"):
+        if k in result:
+            result[k] = _int(result[k])
+    if isinstance(result.get("verdict"), str):
+        result["verdict"] = result["verdict"].strip().upper()
+    sig = result.get("signals")
+    if sig is not None:
+        if not isinstance(sig, list):
+            sig = [sig]
+        result["signals"] = [s if isinstance(s, dict) else {"label": str(s), "severity": "low"} for s in sig]
+    return result
+
+
+def loads(raw, opener="{"):
+    """Extract, then parse; repair only when strict parsing fails. Raises ``JSONDecodeError``."""
+    raw = raw.replace("```json", "").replace("```", "")
+    s = extract(raw, opener)
+    try:
+        out = json.loads(s)
+        STATS.add("ok")
+        return out
+    except ValueError:
+        pass
+    try:
+        out = json.loads(repair(s))
+        STATS.add("repaired")
+        return out
+    except ValueError:
+        STATS.add("failed")
+        raise json.JSONDecodeError("unrepairable model output", raw, 0)
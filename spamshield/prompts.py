@@ -0,0 +1,174 @@
+"""Prompt building and response parsing shared by every analysis path."""
+import json
+from typing import NamedTuple
+
+from .decision import decide as promote
+from .parsing import coerce, loads
+
+TEXT_MODEL   = "llama-3.1-8b-instant"
+VISION_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+SYSTEM       = "Return valid JSON only."
+
+SCHEMA = '{"verdict":"SPAM|SUSPICIOUS|CLEAN","confidence":0-100,"reason":"...","signals":[{"label":"...","severity":"high|medium|low"}],"spam_score":0-100,"category":"...","sentiment":"..."}'
+
+# Fast mode: a few output tokens for the verdict, the explanation on demand.
+COMPACT        = '{"v":"S|U|C","c":0-100,"k":"P|S|I|M|L|O"}'
+EXPLAIN        = '{"reason":"...","signals":[{"label":"...","severity":"high|medium|low"}],"spam_score":0-100,"sentiment":"..."}'
+VERDICT_CODES  = {"S": "SPAM", "U": "SUSPICIOUS", "C": "CLEAN"}
+CATEGORY_CODES = {"P": "Phishing", "S": "Scam", "I": "Social Engineering", "M": "Promotional",
+                  "L": "Legitimate", "O": "Other"}
+COMPACT_MAX_TOKENS = 24
+PACK_CHARS         = 1500   # per message in a batch prompt; longer ones take the single path
+
+MODES = {"Auto (Balanced)":"Use balanced judgment.",
+         "Strict (Low Tolerance)":"Be strict — flag anything remotely suspicious.",
+         "Lenient (High Tolerance)":"Only flag clear, obvious spam."}
+DEFAULT_MODE  = "Auto (Balanced)"
+CONTENT_TYPES = ["Auto-detect", "Email", "SMS / Text", "Social Media Post", "Comment / Review", "Chat Message"]
+
+
+class Settings(NamedTuple):
+    """Sidebar detection settings. A plain tuple, so it doubles as a cache key."""
+    mode: str               = "Auto (Balanced)"
+    content_type: str       = "Auto-detect"
+    check_phishing: bool    = True
+    check_urgency: bool     = True
+    check_offers: bool      = True
+    check_impersonate: bool = True
+    check_sentiment: bool   = False
+    fast: bool              = False     # compact verdict now, explanation on demand
+
+    def model_key(self):
+        """The fields that change the model's answer, for cache keys. Mode is applied locally (``promote``)."""
+        return tuple(self._replace(mode=DEFAULT_MODE))
+
+
+class Prompt(str):
+    """A prompt that also carries what it asks for, for backends that do not read prompts.
+
+    ``kind`` is text, compact, explain, batch, image or fix; ``items`` the
+    ``(id, text)`` messages in it. It is a plain string to everything else.
+    """
+    def __new__(cls, text, kind, items=()):
+        p = super().__new__(cls, text)
+        p.kind, p.items = kind, tuple(items)
+        return p
+
+
+def ctx(s):
+    checks = []
+    if s.check_phishing:    checks.append("phishing links, deceptive URLs, lookalike domains")
+    if s.check_urgency:     checks.append("urgency tactics, pressure language, countdown threats")
+    if s.check_offers:      checks.append("fake prize claims, lottery wins, suspicious offers")
+    if s.check_impersonate: checks.append("impersonation of banks, government, brands, support teams")
+    if s.check_sentiment:   checks.append("overall sentiment and emotional manipulation")
+    cs   = "\n".join(f"- {c}" for c in checks) if checks else "- General spam patterns"
+    ms   = MODES[DEFAULT_MODE]   # strictness is a local threshold shift, see decision.decide
+    hint = f" Content type: {s.content_type}." if s.content_type != "Auto-detect" else ""
+    return cs, ms, hint
+
+
+def text_prompt(text, s):
+    """``text`` is used as-is; fit it to the token budget first (``budget.fit``)."""
+    cs, ms, hint = ctx(s)
+    return Prompt(f"""Spam detection AI. Analyze this message.{hint}
+MODE: {ms}
+CHECK: {cs}
+Return ONLY valid JSON: {SCHEMA}
+MESSAGE: \"\"\"{text}\"\"\"""", "text", [("", text)])
+
+
+def compact_prompt(text, s):
+    cs, ms, hint = ctx(s)
+    return Prompt(f"""Spam detection AI. Classify this message.{hint}
+MODE: {ms}
+CHECK: {cs}
+Return ONLY this JSON, nothing else: {COMPACT}
+v: S=spam U=suspicious C=clean. c: confidence. k: P=phishing S=scam I=impersonation M=promotional L=legitimate O=other.
+MESSAGE: \"\"\"{text}\"\"\"""", "compact", [("", text)])
+
+
+def explain_prompt(text, s, result):
+    """Follow-up for a fast-mode verdict: the explanation fields only, for the verdict already given."""
+    cs, ms, hint = ctx(s)
+    return Prompt(f"""Spam detection AI. This message was classified {result.get("verdict")} \
+({result.get("confidence", 0)}% confidence, category {result.get("category", "Other")}).{hint}
+Explain that verdict. CHECK: {cs}
+Return ONLY valid JSON: {EXPLAIN}
+MESSAGE: \"\"\"{text}\"\"\"""", "explain", [("", text)])
+
+
+def image_prompt(s):
+    cs, ms, hint = ctx(s)
+    return Prompt(f"""Spam detection AI with vision.{hint}
+Image contains screenshot of message/email/SMS.
+STEP 1: Extract ALL visible text. STEP 2: Analyze for spam.
+MODE: {ms} CHECK: {cs}
+Return ONLY valid JSON: {SCHEMA}
+If no text visible, return CLEAN with low confidence.""", "image")
+
+
+def _slot(text):
+    """``text`` in triple quotes; its own ``\"\"\"`` is escaped, or it would end the slot and shift later ids."""
+    return '"""' + text.replace('"""', '""\\"') + '"""'
+
+
+def batch_prompt(items, s, max_chars=PACK_CHARS):
+    """One prompt for many ``(id, text)`` pairs; the model answers with a JSON array."""
+    cs, ms, hint = ctx(s)
+    items = [(i, t[:max_chars]) for i, t in items]
+    body  = "\n".join(f"[{i}] {_slot(t)}" for i, t in items)
+    return Prompt(f"""Spam detection AI. Analyze EACH message independently.{hint}
+MODE: {ms}
+CHECK: {cs}
+Return ONLY a valid JSON array with one object per message, in input order.
+Each object: {{"id":"<message id>", ...}} with the fields of {SCHEMA}
+Keep every "reason" to one sentence.
+MESSAGES:
+{body}""", "batch", items)
+
+
+def fix_prompt(raw, shape=SCHEMA):
+    """Low-token follow-up that asks the model to re-emit its own output as valid JSON of ``shape``."""
+    return Prompt(f"""Rewrite the text below as ONE valid JSON object of the form {shape}.
+Return ONLY the JSON.
+TEXT: {raw[:2500]}""", "fix")
+
+
+def parse(raw):
+    """SCHEMA dict from model output, repairing near-JSON; raises ``JSONDecodeError``."""
+    return coerce(loads(raw))
+
+
+def parse_compact(raw):
+    """SCHEMA dict from a ``COMPACT`` reply, with the explanation fields left empty.
+
+    A full SCHEMA reply (the model ignored the compact format) is accepted as is.
+    """
+    d = loads(raw)
+    if isinstance(d, dict) and "verdict" in d:
+        return coerce(d)
+    if not isinstance(d, dict) or "v" not in d:
+        raise json.JSONDecodeError("expected a compact verdict", raw, 0)
+    v = str(d["v"]).strip().upper()
+    k = str(d.get("k", "O")).strip()
+    out = coerce({"verdict": VERDICT_CODES.get(v[:1], v), "confidence": d.get("c", 0), "reason": "",
+                  "signals": [], "category": CATEGORY_CODES.get(k.upper(), k.title() or "Other"),
+                  "sentiment": "Neutral", "compact": True})
+    if out["verdict"] not in VERDICT_CODES.values():
+        raise json.JSONDecodeError(f"unknown verdict {v!r}", raw, 0)
+    out["spam_score"] = 100 - out["confidence"] if out["verdict"] == "CLEAN" else out["confidence"]
+    return out
+
+
+def parse_array(raw):
+    out = loads(raw, "[")
+    if not isinstance(out, list):
+        raise json.JSONDecodeError("expected a JSON array", raw, 0)
+    return [coerce(r) for r in out if isinstance(r, dict)]
+
+
+def error_result(e):
+    """SCHEMA-shaped placeholder for an item whose analysis raised."""
+    return {"verdict":"ERROR","confidence":0,"reason":str(e) or type(e).__name__,"signals":[],
+            "spam_score":0,"category":"Unknown","sentiment":"Neutral"}
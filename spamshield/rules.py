@@ -0,0 +1,162 @@
+"""Deterministic rule pre-filter that runs before any LLM call.
+
+Every rule is a precompiled regex tested with one ``search`` against the
+lower-cased message, or, for domain rules, against the hostnames pulled out
+of it once up front (first hit wins, so matching stops early). Caps and
+punctuation ratios are computed alongside. Hits are combined with a noisy-OR
+over per-severity weights. With ``urls`` (a ``urls.UrlAnalyzer``), local
+URL signals (blocklist, brand lookalikes, IDN homographs) join the same
+score. When the score is decisive the engine returns a ``SCHEMA``-compatible
+verdict and the caller skips the model.
+Per-rule hit counters show how much LLM traffic the filter removes.
+"""
+import re
+import threading
+from collections import Counter
+from typing import NamedTuple
+
+WEIGHTS = {"critical": 0.85, "high": 0.45, "medium": 0.25, "low": 0.10}   # critical: URL checks only
+
+
+class Rule(NamedTuple):
+    name: str
+    label: str
+    severity: str
+    check: str      # Settings field that enables the rule, "" = always on
+    category: str
+    pattern: str
+    scope: str = "text"   # "text" = whole message, "hosts" = one hostname per line
+
+
+_TLDS    = r"xyz|top|info|click|loan|win|work|gq|tk|ml|cf|ga|buzz|rest|icu|cam|live|support|country|zip|mov"
+_SHORT   = r"bit\.ly|tinyurl\.com|t\.co|goo\.gl|is\.gd|cutt\.ly|rb\.gy|ow\.ly|tiny\.cc|shorturl\.at"
+_BRANDS  = r"paypal|apple|amazon|netflix|microsoft|google|bank|chase|wellsfargo|hsbc|sbi|hdfc|icici|irs|dhl|fedex|ups|usps|whatsapp|instagram|facebook"
+_BAIT    = r"login|log-in|signin|verify|secure|account|update|confirm|support|wallet|billing|unlock"
+
+RULES = [
+    Rule("url_ip", "Raw IP address link", "high", "check_phishing", "Phishing",
+         r"https?://\d{1,3}(?:\.\d{1,3}){3}"),
+    Rule("url_lookalike", "Lookalike login domain", "high", "check_phishing", "Phishing",
+         rf"(?:{_BRANDS})[\w-]*(?:{_BAIT})|(?:{_BAIT})[\w-]*(?:{_BRANDS})", "hosts"),
+    Rule("url_bad_tld", "Link on high-risk TLD", "medium", "check_phishing", "Phishing",
+         rf"\.(?:{_TLDS})$", "hosts"),
+    Rule("url_shortener", "Shortened link", "medium", "check_phishing", "Phishing",
+         rf"\b(?:{_SHORT})/\w+"),
+    Rule("credentials", "Requests credentials / OTP", "high", "", "Phishing",
+         r"\b(?:otp|one[- ]time (?:password|code)|pin|password|cvv|ssn|social security|bank details|card number"
+         r"|verify (?:your )?(?:account|identity)|confirm (?:your )?(?:account|identity|details)|click (?:here|the link|below) to verify)\b"),
+    Rule("urgency", "Urgency / pressure language", "medium", "check_urgency", "Scam",
+         r"\b(?:urgent(?:ly)?|immediately|act now|right away|final (?:notice|warning)|last chance"
+         r"|(?:within|in) \d+\s*(?:h|hrs?|hours?|mins?|minutes?|days?)\b|expires? (?:today|soon|in)"
+         r"|limited time|suspended|deactivated|locked|permanent(?:ly)? (?:closure|closed|blocked)|legal action)"),
+    Rule("prize", "Prize / lottery bait", "medium", "check_offers", "Scam",
+         r"\b(?:congratulations|congrats|lucky winner|you(?:'ve| have)? (?:won|been selected)|winner|prize"
+         r"|lottery|jackpot|free gift|gift card|claim (?:your|now|it)|reward points)\b"),
+    Rule("money", "Unsolicited money offer", "medium", "check_offers", "Scam",
+         r"\b(?:loan (?:of |is )?(?:rs\.?|inr|\$|usd)?\s?[\d,]+|(?:loan|credit) (?:is )?approved|pre-?approved"
+         r"|(?:small|pay) (?:(?:\$|rs\.?\s?)\d+ )?(?:shipping|processing|delivery|customs) fee|pay (?:\$|rs\.?\s?)\d+ (?:for )?(?:shipping|processing|delivery)|crypto|bitcoin|double your|guaranteed (?:income|returns))"),
+    Rule("impersonation", "Brand / authority impersonation", "medium", "check_impersonate", "Social Engineering",
+         rf"\b(?:(?:{_BRANDS})\s+(?:support|security|team|customer care|helpdesk)|dear (?:customer|user|member|valued)"
+         r"|tax refund|government grant|customs (?:fee|clearance))\b"),
+    Rule("phone_cta", "Call-to-action phone number", "low", "", "Scam",
+         r"\b(?:call|whatsapp|text|sms)\b[^.\n]{0,20}?\+?\d[\d\s-]{8,14}\d"),
+    Rule("opt_out", "Bulk-sender opt-out line", "low", "", "Promotional",
+         r"\b(?:reply stop|text stop|unsubscribe|opt[- ]out)\b"),
+    Rule("free_msg", "Mass-marketing header", "low", "check_offers", "Promotional",
+         r"^\s*(?:free ?msg|ad:|promo:)"),
+]
+
+_TEXT    = [(r.name, re.compile(r.pattern, re.MULTILINE)) for r in RULES if r.scope == "text"]
+_HOSTS   = [(r.name, re.compile(r.pattern, re.MULTILINE)) for r in RULES if r.scope == "hosts"]
+_BY_NAME = {r.name: r for r in RULES}
+_HOST    = re.compile(r"(?<![\w@.-])(?:https?://)?((?:[\w-]+\.)+[a-z][\w-]+)")
+_BANG    = re.compile(r"[!?]{2,}")
+
+CUTS = {"Auto (Balanced)": 0.80, "Strict (Low Tolerance)": 0.70, "Lenient (High Tolerance)": 0.90}
+
+
+def features(text):
+    """Single pass over ``text``; returns ``(rule names hit, caps ratio, punctuation bursts)``."""
+    low   = text.lower()
+    hosts = "\n".join(_HOST.findall(low))
+    hits  = {name for name, rx in _TEXT if rx.search(low)}
+    if hosts:
+        hits.update(name for name, rx in _HOSTS if rx.search(hosts))
+    letters = [c for c in text if c.isalpha()]
+    caps = sum(c.isupper() for c in letters) / len(letters) if len(letters) >= 20 else 0.0
+    return hits, caps, len(_BANG.findall(text))
+
+
+class RuleEngine:
+    def __init__(self, clean_below=None, urls=None):
+        # A CLEAN short-circuit is off unless asked for: a message with no
+        # rule hits can still be social engineering the model would catch.
+        self.clean_below = clean_below
+        self.urls        = urls
+        self.hits        = Counter()
+        self.evaluated   = self.decided = 0
+        self._lock       = threading.Lock()
+
+    def score(self, text, settings=None):
+        hits, caps, bangs = features(text)
+        if settings is not None:
+            hits = {h for h in hits if not _BY_NAME[h].check or getattr(settings, _BY_NAME[h].check)}
+        signals = [(_BY_NAME[h].label, _BY_NAME[h].severity, _BY_NAME[h].category)
+                   for h in sorted(hits, key=lambda n: list(WEIGHTS).index(_BY_NAME[n].severity))]
+        if self.urls is not None and (settings is None or settings.check_phishing):
+            found   = self.urls.signals(text)
+            hits    = hits | {s[0] for s in found}
+            signals = sorted([s[1:] for s in found] + signals, key=lambda s: list(WEIGHTS).index(s[1]))
+        if caps > 0.3:  signals.append(("Excessive capitals", "low", "Promotional"))
+        if bangs >= 2:  signals.append(("Excessive punctuation", "low", "Promotional"))
+        keep = 1.0
+        for _, sev, _ in signals:
+            keep *= 1 - WEIGHTS[sev]
+        return 1 - keep, hits, signals
+
+    def check(self, text, settings=None):
+        """Return a SCHEMA-shaped verdict when the rules are decisive, else ``None``."""
+        score, hits, signals = self.score(text, settings)
+        cut = CUTS.get(getattr(settings, "mode", None), CUTS["Auto (Balanced)"])
+        with self._lock:
+            self.evaluated += 1
+            self.hits.update(hits)
+        if score >= cut:
+            verdict = "SPAM"
+        elif self.clean_below is not None and score <= self.clean_below:
+            verdict = "CLEAN"
+        else:
+            return None
+        with self._lock:
+            self.decided += 1
+        top = signals[0][2] if signals else "Legitimate"
+        return {
+            "verdict": verdict,
+            "confidence": round(score * 100) if verdict == "SPAM" else round((1 - score) * 100),
+            "reason": ("Rule pre-filter matched: " + ", ".join(s[0] for s in signals) + ".") if signals
+                      else "Rule pre-filter found no spam indicators.",
+            "signals": [{"label": s[0], "severity": "high" if s[1] == "critical" else s[1]} for s in signals],
+            "spam_score": round(score * 100),
+            "category": top if verdict == "SPAM" else "Legitimate",
+            "sentiment": "Alarming" if "urgency" in hits else "Enticing" if hits & {"prize", "money"} else "Neutral",
+            "source": "rules",
+        }
+
+    def stats(self):
+        return {"evaluated": self.evaluated, "decided": self.decided,
+                "decided_rate": self.decided / self.evaluated if self.evaluated else 0.0,
+                "rule_hits": dict(self.hits.most_common()),
+                "urls": self.urls.stats() if self.urls is not None else None}
+
+
+class Chain:
+    """Run several pre-filters in order; the first decisive verdict wins."""
+    def __init__(self, *filters):
+        self.filters = [f for f in filters if f is not None]
+
+    def check(self, text, settings=None):
+        for f in self.filters:
+            hit = f.check(text, settings)
+            if hit is not None:
+                return hit
+        return None
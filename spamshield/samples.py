@@ -0,0 +1,44 @@
+"""Sample messages: the app's picker and a small labeled benchmark corpus.
+
+``CORPUS`` is ``[(text, label)]`` with ``label`` ``"SPAM"`` or ``"CLEAN"``.
+It starts from the app's ``SAMPLES`` and adds common spam shapes (phishing,
+delivery, prize, loan, crypto, tech support) and ordinary mail that shares
+their vocabulary ("verify", "account", "free", links), so a regression in
+either direction shows up. It is fixed: benchmark runs stay comparable
+from commit to commit.
+"""
+
+SAMPLES = {
+    "— Try a sample —": "",
+    "🔴 Phishing Email":   "URGENT: Your account has been suspended! Click here to verify: http://secure-bank-login.xyz/verify?token=abc123. Failure within 24h = permanent closure.",
+    "🟡 Suspicious Offer": "Congratulations! You've been selected as today's lucky winner of an iPhone 15 Pro! Just pay $2 shipping: claimprize.info",
+    "🟢 Legit Message":    "Hi, just a reminder that our team meeting is tomorrow at 10am in Conference Room B. Please review the agenda I shared last week.",
+    "🔴 Scam SMS":         "FREE MSG: Your loan of Rs.50,000 is approved! Call 9988776655 now to claim. Limited time. Reply STOP to opt out.",
+}
+
+_LABELS = {"🔴 Phishing Email": "SPAM", "🟡 Suspicious Offer": "SPAM", "🟢 Legit Message": "CLEAN", "🔴 Scam SMS": "SPAM"}
+
+CORPUS = [(SAMPLES[k], v) for k, v in _LABELS.items()] + [
+    ("Your package could not be delivered. Confirm your address and pay the customs fee at dhl-parcel-track.top", "SPAM"),
+    ("Dear customer, your PayPal account is locked. Verify your identity within 24 hours: https://paypa1-secure.com/login", "SPAM"),
+    ("Final notice: your Netflix payment failed. Update your billing details now at netflx-billing.info or lose access.", "SPAM"),
+    ("You have won a $500 Amazon gift card! Claim your prize now, offer expires today: bit.ly/claim-gift", "SPAM"),
+    ("Earn guaranteed returns of 40% a week with our bitcoin trading bot. Double your money, WhatsApp +44 7700 900123", "SPAM"),
+    ("Microsoft Support: we detected a virus on your computer. Call our helpdesk at 1-888-555-0199 immediately.", "SPAM"),
+    ("IRS tax refund pending. Submit your bank details and SSN to receive $1,240 within 2 days.", "SPAM"),
+    ("Your OTP for account recovery is required. Reply with the one-time code we sent to keep your account active.", "SPAM"),
+    ("Pre-approved personal loan of $25,000 with no credit check! Click here to claim your funds today.", "SPAM"),
+    ("HSBC security team: unusual sign-in detected. Confirm your account at http://185.23.44.10/hsbc/verify", "SPAM"),
+    ("Congrats!! You are our lucky winner!!! Reply YES to receive your free gift, just pay a small delivery fee.", "SPAM"),
+    ("Thanks for lunch yesterday, let's do it again next week. I'll bring the slides.", "CLEAN"),
+    ("Your Amazon order #112-4477 has shipped and will arrive Thursday. Track it in the Amazon app.", "CLEAN"),
+    ("Reminder: dentist appointment on Monday at 3:30pm. Reply C to confirm or call us to reschedule.", "CLEAN"),
+    ("Hey, can you verify the numbers in the Q3 report before I send it to finance? No rush, end of week is fine.", "CLEAN"),
+    ("The free workshop on data visualization is on Friday in room 204, sign-up sheet is on the wiki.", "CLEAN"),
+    ("Your monthly statement is ready. Log in to the bank's app as usual to view it; we will never ask for your PIN.", "CLEAN"),
+    ("Mom says dinner is at 7 on Sunday, bring the board game we didn't finish last time.", "CLEAN"),
+    ("Pull request #482 was merged into main. The nightly build will pick it up at 2am.", "CLEAN"),
+    ("Flight BA117 is delayed by 40 minutes. New departure 18:20, gate changes will be shown on the board.", "CLEAN"),
+    ("I shared the holiday photos in the family folder: https://photos.google.com/share/abc", "CLEAN"),
+    ("Your password was changed successfully. If this wasn't you, contact support from the official website.", "CLEAN"),
+]
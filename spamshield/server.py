@@ -0,0 +1,239 @@
+"""Headless HTTP scoring API (stdlib only).
+
+Scores messages without a Streamlit session: no page config, no CSS, no
+script re-runs. HTTP/1.1 keep-alive on a threading server, JSON in and out,
+and the same prompt building, ``parse``, pre-filters, cache and threshold
+promotion as the app. ``SPAMSHIELD_BACKEND`` picks where the model runs
+(``backends.load``), e.g. ``openai:http://127.0.0.1:8080/v1`` for a local
+server, so no request leaves the box.
+
+    python -m spamshield.server --port 8080
+
+    POST /v1/analyze/text   {"text": "...", "settings": {...}, "threshold": 50}
+    POST /v1/analyze/image  {"image_b64": "...", "mime": "image/png", "settings": {...}}
+    POST /v1/analyze/batch  {"messages": [{"id": "a", "text": "..."}, "..."], "pack_size": 20}
+    POST /v1/explain/text   {"text": "...", "result": {...}, "settings": {...}}
+    POST /v1/decide         {"results": [{...}, "..."], "settings": {...}, "threshold": 70}
+    GET  /healthz
+    GET  /metrics           Prometheus text format
+
+With ``"settings": {"fast": true}`` text verdicts come back compact
+(``"compact": true``, empty ``reason``); post one to ``/v1/explain/text``
+to fill in the explanation. Results carry the model's ``raw`` answer; post
+them to ``/v1/decide`` to re-apply another threshold or mode without a
+model call.
+
+A request rejected before its body is read (unknown path, bad or oversized
+``Content-Length``) is answered with ``Connection: close``: the unread
+body would otherwise be parsed as the next request.
+"""
+import argparse
+import base64
+import json
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .backends import load as load_backend
+from .budget import STATS as BUDGET, TOKEN_BUDGET
+from .cache import VerdictCache
+from .campaigns import CampaignIndex
+from .decision import Calibration
+from .detector import Detector
+from .imaging import UNREADABLE, prepare
+from .metrics import METRICS, component_collector
+from .models import Router
+from .ocr import OCR, available as ocr_available
+from .prompts import MODES, Settings
+from .rules import RuleEngine
+from .transport import ResilientCaller
+from .urls import Blocklist, UrlAnalyzer
+
+MAX_BODY = 16 * 1024 * 1024
+
+
+class BadRequest(ValueError):
+    pass
+
+
+class TooLarge(BadRequest):
+    pass
+
+
+def settings_from(d):
+    d = d or {}
+    if not isinstance(d, dict):
+        raise BadRequest("settings must be an object")
+    s = Settings(**{k: v for k, v in d.items() if k in Settings._fields})
+    if s.mode not in MODES:
+        raise BadRequest(f"unknown mode {s.mode!r}")
+    return s
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+    server_version   = "SpamShield/2.0"
+    detector         = None
+
+    def log_message(self, fmt, *args):
+        if os.environ.get("SPAMSHIELD_ACCESS_LOG"):
+            super().log_message(fmt, *args)
+
+    def _send(self, code, obj):
+        body = json.dumps(obj, separators=(",", ":")).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        try:
+            n = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            n = -1
+        if not 0 <= n <= MAX_BODY:
+            self.close_connection = True        # the body stays unread
+            if n > MAX_BODY:
+                raise TooLarge("request body too large")
+            raise BadRequest("Content-Length must be a non-negative integer")
+        try:
+            d = json.loads(self.rfile.read(n) or b"{}")
+        except ValueError:
+            raise BadRequest("body is not valid JSON")
+        if not isinstance(d, dict):
+            raise BadRequest("body must be a JSON object")
+        return d
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            d = self.detector
+            return self._send(200, {"ok": True, "backend": d.backend.stats(), "cache": d.cache.stats() if d.cache else None,
+                                    "rules": d.rules.stats() if d.rules else None,
+                                    "provider": d.caller.stats() if d.caller else None,
+                                    "ocr": d.ocr.stats() if d.ocr else None,
+                                    "tokens": BUDGET.stats(), "models": d.router.stats(),
+                                    "campaigns": d.campaigns.stats() if d.campaigns else None})
+        if self.path == "/metrics":
+            body = METRICS.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            return self.wfile.write(body)
+        self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        route = {"/v1/analyze/text": self._text, "/v1/analyze/image": self._image,
+                 "/v1/analyze/batch": self._batch, "/v1/explain/text": self._explain,
+                 "/v1/decide": self._decide}.get(self.path.split("?")[0])
+        if route is None:
+            self.close_connection = True
+            return self._send(404, {"error": "not found"})
+        try:
+            d = self._body()
+            s = settings_from(d.get("settings"))
+            t = d.get("threshold", 50)
+            if not isinstance(t, int) or not 0 <= t <= 100:
+                raise BadRequest("threshold must be an integer 0-100")
+            self._send(200, route(d, s, t))
+        except TooLarge as e:
+            self._send(413, {"error": str(e)})
+        except BadRequest as e:
+            self._send(400, {"error": str(e)})
+        except json.JSONDecodeError:
+            self._send(502, {"error": "model returned malformed JSON"})
+        except Exception as e:
+            self._send(502, {"error": f"analysis failed: {e}"})
+
+    @staticmethod
+    def _text_arg(d):
+        text = d.get("text")
+        if not isinstance(text, str) or len(text.strip()) < 5:
+            raise BadRequest("text must be a string of at least 5 characters")
+        return text
+
+    def _text(self, d, s, t):
+        return self.detector.analyze_text(self._text_arg(d), s, t)
+
+    def _explain(self, d, s, t):
+        result = d.get("result")
+        if not isinstance(result, dict) or "verdict" not in result:
+            raise BadRequest("result must be a verdict object")
+        return self.detector.explain(self._text_arg(d), result, s, t)
+
+    def _decide(self, d, s, t):
+        results = d.get("results")
+        if not isinstance(results, list) or not all(isinstance(r, dict) and "verdict" in r for r in results):
+            raise BadRequest("results must be a list of verdict objects")
+        return {"results": [self.detector.decide(r, s, t) for r in results]}
+
+    def _image(self, d, s, t):
+        if not isinstance(d.get("image_b64"), str):
+            raise BadRequest("image_b64 is required")
+        try:
+            img = prepare(base64.b64decode(d["image_b64"], validate=True), d.get("mime") or "image/png")
+        except UNREADABLE as e:
+            raise BadRequest(f"image_b64 is not a readable image: {e}")
+        return self.detector.analyze_image(img.b64, img.mime, s, t, image_key=img.key)
+
+    def _batch(self, d, s, t):
+        msgs = d.get("messages")
+        if not isinstance(msgs, list) or not msgs:
+            raise BadRequest("messages must be a non-empty list")
+        items = [(str(m.get("id", i)), str(m.get("text", ""))) if isinstance(m, dict) else (str(i), str(m))
+                 for i, m in enumerate(msgs)]
+        size = d.get("pack_size", 20)
+        if not isinstance(size, int) or size < 1:
+            raise BadRequest("pack_size must be a positive integer")
+        res = self.detector.analyze_batch(items, s, t, size=size)
+        return {"results": [dict(res[mid], id=mid) for mid, _ in items]}
+
+
+def make_server(detector, host="127.0.0.1", port=8080):
+    handler = type("BoundHandler", (Handler,), {"detector": detector})
+    srv = ThreadingHTTPServer((host, port), handler)
+    srv.daemon_threads = True
+    return srv
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m spamshield.server")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8080)))
+    a = ap.parse_args(argv)
+    local = os.environ.get("SPAMSHIELD_LOCAL_MODEL")
+    if local:
+        from .local_model import LocalClassifier
+        local = LocalClassifier.load(local)
+    bl   = os.environ.get("SPAMSHIELD_BLOCKLIST")
+    urls = UrlAnalyzer(blocklist=Blocklist.load(bl) if bl else None)
+    cal  = os.environ.get("SPAMSHIELD_CALIBRATION")
+    mods = os.environ.get("SPAMSHIELD_MODELS")
+    ocr = OCR() if os.environ.get("SPAMSHIELD_OCR", "1") == "1" and ocr_available() else None
+    caller = ResilientCaller(timeout=float(os.environ.get("SPAMSHIELD_TIMEOUT", 20)),
+                             retries=int(os.environ.get("SPAMSHIELD_RETRIES", 3)),
+                             hedge=os.environ.get("SPAMSHIELD_HEDGE") == "1")
+    detector = Detector(backend=load_backend(max_retries=0), rules=RuleEngine(urls=urls), local_model=local,
+                        caller=caller, ocr=ocr, calibration=Calibration.load(cal) if cal else None,
+                        router=Router.load(mods) if mods else None,
+                        token_budget=int(os.environ.get("SPAMSHIELD_TOKEN_BUDGET", TOKEN_BUDGET)),
+                        campaigns=CampaignIndex(capacity=int(os.environ.get("SPAMSHIELD_CAMPAIGN_SIZE", 50000)),
+                                                path=os.environ.get("SPAMSHIELD_CAMPAIGN_DB") or None),
+                        cache=VerdictCache(maxsize=int(os.environ.get("SPAMSHIELD_CACHE_SIZE", 2048)),
+                                           ttl=float(os.environ.get("SPAMSHIELD_CACHE_TTL", 86400)),
+                                           path=os.environ.get("SPAMSHIELD_CACHE_DB") or None))
+    METRICS.register(component_collector(cache=detector.cache, caller=caller, rules=detector.rules,
+                                         campaigns=detector.campaigns, ocr=ocr, router=detector.router))
+    srv = make_server(detector, a.host, a.port)
+    print(f"SpamShield API on http://{a.host}:{a.port}")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
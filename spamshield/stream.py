@@ -0,0 +1,65 @@
+"""Incremental reader for a streamed JSON object.
+
+``IncrementalJSON.feed(chunk)`` returns the top-level ``(key, value)`` pairs
+completed by that chunk, so ``verdict`` and ``confidence`` can be shown while
+the model is still writing ``reason`` and ``signals``. It tracks string,
+escape and nesting state in one pass over each chunk and never re-scans
+earlier text. Anything before the first ``{`` (markdown fences, chatter) is
+skipped.
+"""
+import json
+
+
+class IncrementalJSON:
+    def __init__(self):
+        self.buf     = []      # chars of the current top-level "key": value
+        self.depth   = 0
+        self.in_str  = False
+        self.escape  = False
+        self.done    = False
+        self.fields  = {}
+
+    def _flush(self):
+        item = "".join(self.buf).strip().rstrip(",").strip()
+        self.buf = []
+        if not item:
+            return None
+        try:
+            pair = json.loads("{" + item + "}")
+        except ValueError:
+            return None
+        self.fields.update(pair)
+        return next(iter(pair.items()), None)
+
+    def feed(self, chunk):
+        out = []
+        for ch in chunk:
+            if self.done:
+                break
+            if self.depth == 0:
+                if ch == "{":
+                    self.depth = 1
+                continue
+            if self.in_str:
+                self.buf.append(ch)
+                if self.escape:      self.escape = False
+                elif ch == "\\":     self.escape = True
+                elif ch == '"':      self.in_str = False
+                continue
+            if ch == '"':
+                self.in_str = True
+            elif ch in "{[":
+                self.depth += 1
+            elif ch in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    pair = self._flush()
+                    if pair: out.append(pair)
+                    self.done = True
+                    continue
+            elif ch == "," and self.depth == 1:
+                pair = self._flush()
+                if pair: out.append(pair)
+                continue
+            self.buf.append(ch)
+        return out
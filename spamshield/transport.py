@@ -0,0 +1,261 @@
+"""Resilient LLM call layer: timeouts, jittered backoff, hedging, circuit breaker.
+
+``ResilientCaller`` wraps any ``create(**kwargs)`` callable (sync or async):
+
+- every attempt gets ``timeout`` seconds, passed through to the SDK;
+- 429, 5xx, timeouts and connection errors are retried with full-jitter
+  exponential backoff, honoring ``Retry-After`` when the provider sends it;
+- with ``hedge=True`` a duplicate request goes out once the first has been
+  in flight longer than the recent p95 latency, and the first success wins;
+- a ``CircuitBreaker`` fails fast while the provider is degraded.
+
+Hedging trades load for tail latency, which only pays where someone is
+waiting; ``plain()`` is the same caller without it, for bulk work.
+
+``resilient(client, caller)`` returns a drop-in client whose
+``chat.completions.create`` goes through the caller, so every code path that
+takes a client (bulk packing, streaming, the fix-JSON retry) gets the same
+policy. Exercise it against :mod:`spamshield.fake_groq`.
+"""
+import asyncio
+import copy
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .clients import wrap
+
+
+class CircuitOpen(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    """Opens after ``failures`` consecutive errors; one probe is let through after ``reset_after`` s.
+
+    Every admitted call must end in ``record`` (or ``release`` if it was
+    cancelled), or a half-open breaker never admits another probe.
+    """
+    def __init__(self, failures=5, reset_after=30.0):
+        self.failures    = failures
+        self.reset_after = reset_after
+        self.state       = "closed"
+        self._count      = 0
+        self._opened     = 0.0
+        self._probing    = False
+        self._lock       = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return
+            if self.state == "open" and time.monotonic() - self._opened >= self.reset_after:
+                self.state, self._probing = "half-open", False
+            if self.state == "open" or self._probing:
+                raise CircuitOpen("provider circuit open — failing fast")
+            self._probing = True                # this caller is the probe; the rest fail fast
+
+    def record(self, ok):
+        with self._lock:
+            self._probing = False
+            if ok:
+                self.state, self._count = "closed", 0
+                return
+            self._count += 1
+            if self.state == "half-open" or self._count >= self.failures:
+                self.state, self._opened = "open", time.monotonic()
+
+    def release(self):
+        """The call ended without an outcome (cancelled); the next caller may probe."""
+        with self._lock:
+            self._probing = False
+
+
+def status_of(exc):
+    code = getattr(exc, "status_code", None)
+    if code is None:
+        code = getattr(getattr(exc, "response", None), "status_code", None)
+    return code
+
+
+def retry_after(exc):
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(exc):
+    code = status_of(exc)
+    if code is not None:
+        return code == 429 or code >= 500
+    name = type(exc).__name__
+    return (isinstance(exc, (TimeoutError, ConnectionError, asyncio.TimeoutError))
+            or "Timeout" in name or "Connection" in name)
+
+
+class ResilientCaller:
+    def __init__(self, timeout=20.0, retries=3, backoff=0.5, max_backoff=8.0, hedge=False,
+                 hedge_delay=1.5, breaker=None):
+        self.timeout     = timeout
+        self.retries     = retries
+        self.backoff     = backoff
+        self.max_backoff = max_backoff
+        self.hedge       = hedge
+        self.hedge_delay = hedge_delay      # used until enough latencies are recorded
+        self.breaker     = breaker or CircuitBreaker()
+        self.latencies   = deque(maxlen=200)
+        self.counts      = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "errors": 0, "short_circuits": 0}
+        self._lock       = threading.Lock()
+        self._pool       = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge") if hedge else None
+
+    def _count(self, k):
+        with self._lock:
+            self.counts[k] += 1
+
+    def plain(self):
+        """This caller without hedging, sharing its breaker, latencies and counts."""
+        if not self.hedge:
+            return self
+        other = copy.copy(self)
+        other.hedge, other._pool = False, None
+        return other
+
+    def _settle(self, exc):
+        # A provider that answers a bad request is up; a local error says nothing about it.
+        if status_of(exc) is not None:
+            self.breaker.record(True)
+        else:
+            self.breaker.release()
+
+    def p95(self):
+        if len(self.latencies) < 20:
+            return self.hedge_delay
+        lat = sorted(self.latencies)
+        return lat[int(0.95 * (len(lat) - 1))]
+
+    def _delay(self, attempt, exc):
+        d = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        ra = retry_after(exc)
+        return max(d, ra) if ra is not None else d
+
+    def _kw(self, kw):
+        kw.setdefault("timeout", self.timeout)
+        return kw
+
+    # ── sync ──────────────────────────────────────────────────────────
+    def call(self, create, **kw):
+        kw = self._kw(kw)
+        for attempt in range(self.retries + 1):
+            try:
+                self.breaker.allow()
+            except CircuitOpen:
+                self._count("short_circuits"); raise
+            self._count("calls")
+            t0 = time.perf_counter()
+            try:
+                out = self._hedged(create, kw) if self.hedge else create(**kw)
+            except Exception as e:
+                self._count("errors")
+                if not is_retryable(e):
+                    self._settle(e)
+                    raise
+                self.breaker.record(False)
+                if attempt >= self.retries:
+                    raise
+                self._count("retries")
+                time.sleep(self._delay(attempt, e))
+                continue
+            self.breaker.record(True)
+            self.latencies.append(time.perf_counter() - t0)
+            return out
+
+    def _hedged(self, create, kw):
+        first = self._pool.submit(create, **kw)
+        done, _ = wait([first], timeout=self.p95())
+        if done:
+            return first.result()
+        self._count("hedges")
+        second = self._pool.submit(create, **kw)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    if f is second: self._count("hedge_wins")
+                    for p in pending:
+                        p.add_done_callback(_close_result)
+                    return f.result()
+                error = f.exception()
+        raise error
+
+    # ── async ─────────────────────────────────────────────────────────
+    async def acall(self, create, **kw):
+        kw = self._kw(kw)
+        for attempt in range(self.retries + 1):
+            try:
+                self.breaker.allow()
+            except CircuitOpen:
+                self._count("short_circuits"); raise
+            self._count("calls")
+            t0 = time.perf_counter()
+            try:
+                out = await (self._ahedged(create, kw) if self.hedge else create(**kw))
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                self._count("errors")
+                if not is_retryable(e):
+                    self._settle(e)
+                    raise
+                self.breaker.record(False)
+                if attempt >= self.retries:
+                    raise
+                self._count("retries")
+                await asyncio.sleep(self._delay(attempt, e))
+                continue
+            self.breaker.record(True)
+            self.latencies.append(time.perf_counter() - t0)
+            return out
+
+    async def _ahedged(self, create, kw):
+        first = asyncio.ensure_future(create(**kw))
+        done, _ = await asyncio.wait({first}, timeout=self.p95())
+        if done:
+            return first.result()
+        self._count("hedges")
+        second = asyncio.ensure_future(create(**kw))
+        pending, error = {first, second}, None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    if f is second: self._count("hedge_wins")
+                    for p in pending: p.cancel()
+                    return f.result()
+                error = f.exception()
+        raise error
+
+    def stats(self):
+        return dict(self.counts, breaker=self.breaker.state, p95=self.p95())
+
+
+def _close_result(f):
+    # The losing hedge of a streaming call holds an open connection.
+    if f.exception() is None and hasattr(f.result(), "close"):
+        f.result().close()
+
+
+def resilient(client, caller, is_async=False):
+    """``client`` with ``chat.completions.create`` routed through ``caller``."""
+    if caller is None:
+        return client
+    create = client.chat.completions.create
+    if is_async:
+        return wrap(lambda **kw: caller.acall(create, **kw), client)
+    return wrap(lambda **kw: caller.call(create, **kw), client)
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spamshield.backends import GroqBackend
+from spamshield.fake_groq import FakeGroq
+from spamshield.metrics import METRICS
+
+
+@pytest.fixture
+def fake():
+    """A FakeGroq on a free port; yields ``(fake, url)``."""
+    f = FakeGroq(latency=0.0, seed=1)
+    srv, url = f.serve()
+    yield f, url
+    srv.shutdown()
+
+
+@pytest.fixture
+def backend(fake):
+    return GroqBackend("x", fake[1], max_retries=0)
+
+
+@pytest.fixture(autouse=True)
+def _metrics():
+    METRICS.reset()
+    yield
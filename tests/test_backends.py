@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from spamshield.backends import Backend, ClassifierBackend, Unsupported
+from spamshield.detector import Detector
+from spamshield.models import Router
+from spamshield.prompts import Prompt
+from spamshield.transport import ResilientCaller
+
+
+class _Stub:
+    """Spam-likeness by keyword, in ``predict_proba`` shape."""
+    def predict_proba(self, texts):
+        return [0.9 if "prize" in t.lower() else 0.1 for t in texts]
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        Backend()
+
+
+def test_single_model_backend_gets_one_step_router():
+    d = Detector(backend=ClassifierBackend(_Stub()))
+    assert d.router.policy("text").cascade == ("classifier",)
+    r = d.analyze_text("Claim your prize now, you won a prize!")
+    assert r["verdict"] == "SPAM" and r["model"] == "classifier" and "escalated" not in r
+
+
+def test_explicit_router_wins():
+    d = Detector(backend=ClassifierBackend(_Stub()), router=Router())
+    assert len(d.router.policy("text").cascade) == 2
+
+
+def test_stream_errors_raise_inside_the_caller():
+    calls = []
+
+    class Flaky(ClassifierBackend):
+        def complete(self, kw):
+            calls.append(1)
+            if len(calls) == 1:
+                raise ConnectionError("reset")
+            return super().complete(kw)
+    d = Detector(backend=Flaky(_Stub()), caller=ResilientCaller(retries=1, backoff=0))
+    events = list(d.stream_text("lunch at noon?"))
+    assert events[-1][0] == "done" and events[-1][1]["verdict"] == "CLEAN"
+    assert d.caller.counts["retries"] == 1
+
+
+def test_batch_packs_through_classifier():
+    d = Detector(backend=ClassifierBackend(_Stub()))
+    res = d.analyze_batch([("a", "win a prize"), ("b", "see you at lunch")])
+    assert res["a"]["verdict"] == "SPAM" and res["b"]["verdict"] == "CLEAN"
+
+
+def test_classifier_has_no_vision():
+    with pytest.raises(Unsupported):
+        ClassifierBackend(_Stub()).complete({"messages": [{"role": "user", "content": [{"type": "image_url"}]}]})
+
+
+def test_classifier_reads_the_request_not_the_wording():
+    b = ClassifierBackend(_Stub())
+    reply = lambda p: b.complete({"messages": [{"role": "user", "content": p}]})["choices"][0]["message"]["content"]
+    assert json.loads(reply(Prompt("reworded", "compact", [("", "win a prize")]))) == {"v": "S", "c": 90, "k": "O"}
+    assert [r["id"] for r in json.loads(reply(Prompt("?", "batch", [("a", "hi"), ("b", "prize")])))] == ["a", "b"]
+    assert set(json.loads(reply(Prompt("?", "explain", [("", "hi")])))) == {"reason", "signals", "spam_score", "sentiment"}
+    with pytest.raises(Unsupported):
+        reply('MESSAGE: """win a prize"""')
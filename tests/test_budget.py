@@ -0,0 +1,52 @@
+import json
+
+from spamshield.budget import GAP, MAX_TOKENS, completion_budget, count_tokens, fit
+from spamshield.fake_groq import FakeGroq
+from spamshield.prompts import Settings
+
+EMAIL  = "\n\n".join(
+    ["From: Security Team <alerts@example-bank.co>\nSubject: Action needed on your account",
+     "Dear customer, we noticed an unusual sign-in to your account this morning."]
+    + [" ".join(f"Paragraph {i} sentence {j} is about the weekly team schedule." for j in range(6))
+       for i in range(8)]
+    + ["Confirm your details at https://example-bank.co.verify-login.net/secure before tonight.",
+       "Regards, the team."])
+
+
+def test_short_text_is_untouched():
+    f = fit("lunch at noon?", 750)
+    assert f.text == "lunch at noon?" and f.saved == 0
+
+
+def test_fit_keeps_header_url_and_edges():
+    f = fit(EMAIL, 180)
+    assert f.tokens_in > 3 * 180 and f.tokens_out <= 180
+    assert f.text.startswith("From: Security Team")
+    assert "Subject: Action needed" in f.text
+    assert "https://example-bank.co.verify-login.net/secure" in f.text
+    assert "unusual sign-in" in f.text                 # first paragraph
+    assert "Regards, the team." in f.text              # last paragraph
+    assert GAP in f.text and "Paragraph 3 sentence 4" not in f.text
+
+
+def test_unbreakable_blob_is_cut():
+    f = fit("x" * 5000, 100)
+    assert f.tokens_out < f.tokens_in and f.text == "x" * 300
+
+
+def test_full_schema_reply_fits_the_completion_budget():
+    s = Settings(check_sentiment=True)
+    reply = dict(FakeGroq(latency=0).verdict("URGENT: verify your password to claim your free prize"),
+                 reason="This message pressures the reader to act within hours, impersonates a bank, and "
+                        "asks for credentials through a link whose domain does not belong to the bank. "
+                        "It also promises a prize that was never entered for.",
+                 signals=[{"label": f"Signal about check number {i} in plain words", "severity": "high"}
+                          for i in range(6)])
+    text = "```json\n" + json.dumps(reply, indent=2) + "\n```"
+    assert count_tokens(text) <= completion_budget(s) < MAX_TOKENS
+
+
+def test_budget_grows_with_checks_and_input():
+    none = Settings(check_phishing=False, check_urgency=False, check_offers=False, check_impersonate=False)
+    assert completion_budget(none) < completion_budget(Settings()) < completion_budget(Settings(), 750)
+    assert completion_budget(Settings(), 10 ** 6) == MAX_TOKENS
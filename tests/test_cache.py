@@ -0,0 +1,33 @@
+import time
+
+from spamshield.cache import VerdictCache, make_key
+
+
+def test_key_ignores_formatting_but_not_settings():
+    assert make_key("Win  a\nprize", ("a",)) == make_key(" Win a prize ", ("a",))
+    assert make_key("Win a prize", ("a",)) != make_key("Win a prize", ("b",))
+
+
+def test_lru_evicts_oldest():
+    c = VerdictCache(maxsize=2)
+    c.set("a", 1); c.set("b", 2)
+    c.get("a")
+    c.set("c", 3)
+    assert c.get("b") is None and c.get("a") == 1 and c.get("c") == 3
+    assert c.stats()["hits"] == 3 and c.stats()["misses"] == 1
+
+
+def test_ttl_expires():
+    c = VerdictCache(ttl=0.01)
+    c.set("a", {"verdict": "SPAM"})
+    time.sleep(0.02)
+    assert c.get("a") is None
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "v.db")
+    VerdictCache(path=path).set("a", {"verdict": "CLEAN"})
+    c = VerdictCache(path=path)
+    assert c.get("a") == {"verdict": "CLEAN"} and c.stats()["disk_hits"] == 1
+    c.clear()
+    assert VerdictCache(path=path).get("a") is None
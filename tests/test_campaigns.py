@@ -0,0 +1,32 @@
+from spamshield.campaigns import CampaignIndex
+from spamshield.prompts import Settings
+
+SPAM  = "Congratulations Anna! You won $500. Claim your prize at http://win-now.top/abc123 before midnight tonight."
+CLEAN = "Hi Anna, your order 4411 has shipped and will arrive Tuesday. Track it at https://shop.example.com/t/9911."
+
+
+def test_template_variant_reuses_spam_verdict():
+    idx = CampaignIndex()
+    idx.add(SPAM, Settings(), {"verdict": "SPAM", "confidence": 92})
+    hit = idx.check(SPAM.replace("Anna", "Priya").replace("500", "750"), Settings())
+    assert hit["verdict"] == "SPAM" and hit["source"] == "campaign" and hit["similarity"] >= 0.75
+
+
+def test_clean_verdicts_are_not_reused():
+    idx = CampaignIndex()
+    idx.add(CLEAN, Settings(), {"verdict": "CLEAN", "confidence": 95})
+    assert idx.stats()["size"] == 0
+    assert idx.check(CLEAN.replace("shop.example.com", "shop-example.top"), Settings()) is None
+
+
+def test_scoped_by_settings(tmp_path):
+    idx = CampaignIndex(path=str(tmp_path / "c.db"))
+    idx.add(SPAM, Settings(), {"verdict": "SPAM", "confidence": 92})
+    assert idx.check(SPAM, Settings(check_phishing=False)) is None
+    assert CampaignIndex(path=str(tmp_path / "c.db")).check(SPAM, Settings())["verdict"] == "SPAM"
+
+
+def test_short_messages_never_match():
+    idx = CampaignIndex()
+    idx.add("ok thanks", Settings(), {"verdict": "SPAM", "confidence": 90})
+    assert idx.check("ok thanks", Settings()) is None
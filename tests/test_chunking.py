@@ -0,0 +1,37 @@
+from spamshield.chunking import MAX_CHUNKS, decisive, reduce, split
+from spamshield.detector import Detector
+
+LONG = " ".join(f"Sentence number {i} talks about the quarterly report." for i in range(400))
+
+
+def test_split_is_bounded_and_overlapping():
+    chunks = split(LONG, 300)
+    assert 1 < len(chunks) <= MAX_CHUNKS
+    for a, b in zip(chunks, chunks[1:]):
+        assert b.start < a.end                  # neighbours share text across the cut
+        assert a.text.endswith("[…]") and b.text.startswith("[…]")
+    assert chunks[0].start == 0 and chunks[-1].end == len(LONG)
+
+
+def test_short_text_is_one_chunk():
+    assert [c.text for c in split("just a few words", 300)] == ["just a few words"]
+
+
+def test_reduce_takes_the_riskiest_chunk():
+    chunks = split(LONG, 300)[:3]
+    done = {0: {"verdict": "CLEAN", "confidence": 90, "spam_score": 5, "reason": "fine",
+                "signals": [{"label": "x", "severity": "low"}]},
+            2: {"verdict": "SPAM", "confidence": 95, "spam_score": 92, "reason": "payload",
+                "signals": [{"label": "X", "severity": "high"}]}}
+    out = reduce(done, chunks)
+    assert out["verdict"] == "SPAM" and out["reason"] == "Part 3 of 3: payload"
+    assert out["signals"] == [{"label": "X", "severity": "high"}]
+    assert out["chunks"] == {"total": 3, "analyzed": 2, "riskiest": 2, "span": [chunks[2].start, chunks[2].end]}
+    assert decisive(out) and not decisive(done[0])
+
+
+def test_payload_at_the_end_of_a_long_message(backend):
+    text = LONG + " URGENT winner: claim your free prize, verify your password now."
+    r = Detector(backend=backend, token_budget=300).analyze_text(text)
+    assert r["verdict"] == "SPAM" and r["chunks"]["riskiest"] == r["chunks"]["total"] - 1
+    assert r["chunks"]["analyzed"] <= r["chunks"]["total"]
@@ -0,0 +1,51 @@
+from spamshield.decision import MODE_SHIFT, Calibration, decide, raw_of, sweep
+
+
+def test_raw_of_coerces_strings():
+    raw = raw_of({"verdict": "suspicious", "confidence": "85%", "spam_score": "70"})
+    assert raw["verdict"] == "SUSPICIOUS" and raw["confidence"] == 85 and raw["spam_score"] == 70
+
+
+def test_decide_is_repeatable_from_raw():
+    r = {"verdict": "SUSPICIOUS", "confidence": 70, "spam_score": 65}
+    assert decide(r, 50)["verdict"] == "SPAM"
+    assert decide(r, 80)["verdict"] == "SUSPICIOUS"
+    assert r["raw"]["verdict"] == "SUSPICIOUS"
+
+
+def test_auto_is_the_original_promotion_rule():
+    for v in ("SPAM", "SUSPICIOUS", "CLEAN"):
+        for conf in (10, 45, 50, 90):
+            for score in (0, 20, 60, 95):
+                r = decide({"verdict": v, "confidence": conf, "spam_score": score}, 50, "Auto (Balanced)")
+                want = "SPAM" if v == "SUSPICIOUS" and conf >= 50 else v
+                assert (r["verdict"], r["confidence"]) == (want, conf)
+
+
+def test_strict_flags_borderline_clean():
+    r = {"verdict": "CLEAN", "confidence": 60, "spam_score": 40}
+    assert decide(r, 50)["verdict"] == "CLEAN"
+    assert decide(r, 50, "Strict (Low Tolerance)") == dict(r, verdict="SUSPICIOUS", confidence=60)
+
+
+def test_lenient_clears_weak_suspicious():
+    r = {"verdict": "SUSPICIOUS", "confidence": 45, "spam_score": 40}
+    assert decide(r, 50)["verdict"] == "SUSPICIOUS"
+    assert decide(r, 50, "Lenient (High Tolerance)") == dict(r, verdict="CLEAN", confidence=45)
+    assert decide(r, 50, "Strict (Low Tolerance)")["verdict"] == "SPAM"
+
+
+def test_rule_verdicts_keep_their_scale():
+    r = {"verdict": "CLEAN", "confidence": 50, "spam_score": 90, "source": "rules"}
+    assert decide(r, 50, "Strict (Low Tolerance)")["verdict"] == "CLEAN"
+
+
+def test_sweep_matches_decide():
+    rows = [({"verdict": v, "confidence": c, "spam_score": s, "model": "m"}, None)
+            for v in ("SPAM", "SUSPICIOUS", "CLEAN") for c in (30, 60, 90) for s in (10, 40, 70)]
+    for mode in MODE_SHIFT:
+        for cal in (None, Calibration()):
+            for row in sweep(rows, range(10, 91, 20), mode, cal):
+                got = [decide(dict(raw), row["threshold"], mode, cal)["verdict"] for raw, _ in rows]
+                assert {v: got.count(v) for v in ("SPAM", "SUSPICIOUS", "CLEAN")} == \
+                       {v: row[v] for v in ("SPAM", "SUSPICIOUS", "CLEAN")}
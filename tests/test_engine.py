@@ -0,0 +1,58 @@
+import asyncio
+import hashlib
+
+from spamshield.cache import VerdictCache
+from spamshield.detector import Detector
+from spamshield.engine import AsyncEngine
+from spamshield.metrics import METRICS
+from spamshield.rules import RuleEngine
+
+PHISH = ("URGENT: your account is suspended!! Verify your password and OTP immediately at "
+         "http://paypal-login-secure.xyz/verify or call +1 800 555 0199 now!!")
+
+
+def test_analyze_text(backend):
+    e = AsyncEngine(backend=backend)
+    out = e.run(["URGENT winner claim your free prize now", "See you at lunch, the slides are ready."])
+    assert [r["verdict"] for r in out] == ["SPAM", "CLEAN"]
+
+
+def test_analyze_image(fake, backend):
+    f, _ = fake
+    b64 = "aGVsbG8="
+    f.images[hashlib.sha256(b64.encode()).hexdigest()] = "URGENT verify your password, claim your prize"
+    r = asyncio.run(AsyncEngine(backend=backend).analyze_image(b64, "image/png"))
+    assert r["verdict"] == "SPAM"
+    assert r["model"].startswith("meta-llama/")
+
+
+class _Stub:
+    """A blocking client stub: every completion is the same reply."""
+    def __init__(self, reply):
+        self.calls = 0
+        self.chat  = self
+        self.completions = self
+        self.reply = reply
+
+    def create(self, **kw):
+        self.calls += 1
+        msg = type("M", (), {"content": self.reply})
+        return type("R", (), {"choices": [type("C", (), {"message": msg})], "usage": None})
+
+
+def test_async_engine_uses_injected_client():
+    stub = _Stub('{"verdict":"SPAM","confidence":95,"reason":"stub","signals":[],"spam_score":95}')
+    d = Detector(client=stub)
+    res = d.async_engine().run(["one message here", "another message"])
+    assert [r["verdict"] for r in res] == ["SPAM", "SPAM"] and stub.calls == 2
+
+
+def test_async_scans_share_the_detector_pipeline():
+    stub = _Stub('{"verdict":"CLEAN","confidence":90,"reason":"stub","signals":[],"spam_score":5}')
+    d = Detector(client=stub, cache=VerdictCache(), rules=RuleEngine())
+    d.analyze_text("See you at lunch")
+    res = d.async_engine().run(["See you at lunch", PHISH])
+    assert [r["verdict"] for r in res] == ["CLEAN", "SPAM"] and stub.calls == 1
+    paths = {lb["path"] for lb, _ in METRICS.series("spamshield_requests_seconds")}
+    assert paths == {"model", "cache", "rules"}
+    assert {lb["verdict"]: n for lb, n in METRICS.series("spamshield_verdicts_total")} == {"CLEAN": 2, "SPAM": 1}
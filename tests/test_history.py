@@ -0,0 +1,34 @@
+from spamshield.history import HistoryStore
+
+
+def _fill(h):
+    for i, v in enumerate(["SPAM", "CLEAN", "SUSPICIOUS", "SPAM", "CLEAN"]):
+        h.add({"verdict": v, "confidence": 80, "spam_score": 10 * i}, f"msg {i}", session="a" if i % 2 else "b")
+
+
+def test_counts_follow_inserts_and_clears():
+    h = HistoryStore()
+    _fill(h)
+    assert h.counts() == {"SPAM": 2, "SUSPICIOUS": 1, "CLEAN": 2, "total": 5}
+    assert h.counts("a") == {"SPAM": 1, "SUSPICIOUS": 0, "CLEAN": 1, "total": 2}
+    h.clear("a")
+    assert h.counts()["total"] == 3 and h.counts("a")["total"] == 0
+    h.clear()
+    assert h.stats() == {"scans": 0, "spam": 0, "suspicious": 0, "clean": 0}
+
+
+def test_keyset_pages_are_newest_first():
+    h = HistoryStore()
+    _fill(h)
+    first = h.page(limit=2)
+    assert [r["preview"] for r in first] == ["msg 4", "msg 3"]
+    rest = h.page(limit=10, before=first[-1]["id"])
+    assert [r["preview"] for r in rest] == ["msg 2", "msg 1", "msg 0"]
+    assert [r["preview"] for r in h.page(session="b", verdict="SPAM")] == ["msg 0"]
+
+
+def test_raws_round_trip(tmp_path):
+    h = HistoryStore(str(tmp_path / "h.db"))
+    _fill(h)
+    assert len(h.raws()) == 5 and len(h.raws(limit=2, session="a")) == 2
+    assert HistoryStore(h.path).counts()["total"] == 5    # persisted
@@ -0,0 +1,37 @@
+import io
+
+import pytest
+
+from spamshield.bench import render
+from spamshield.imaging import UNREADABLE, prepare
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def test_distinct_screenshots_get_distinct_keys():
+    shots = [prepare(render(f"Order #{i} has shipped, track it in the app.")) for i in range(60)]
+    assert len({p.key for p in shots}) == 60
+    assert all(p.key.startswith("sha256:") for p in shots)
+
+
+def test_same_bytes_same_key():
+    data = render("Your package is on its way")
+    assert prepare(data).key == prepare(data).key
+
+
+def test_compact_image_reports_its_own_size():
+    img = Image.new("1", (2000, 1000))   # a checkerboard: tiny as PNG, large as JPEG
+    img.putdata([(x + y) % 2 * 255 for y in range(1000) for x in range(2000)])
+    buf = io.BytesIO()
+    img.save(buf, "PNG")
+    prep = prepare(buf.getvalue(), "image/png")
+    assert prep.data == buf.getvalue()
+    assert (prep.width, prep.height) == (2000, 1000)
+
+
+def test_oversized_image_is_unreadable(monkeypatch):
+    buf = io.BytesIO()
+    Image.new("RGB", (200, 200), "white").save(buf, "PNG")
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)      # 40k px is over twice the limit
+    with pytest.raises(UNREADABLE):
+        prepare(buf.getvalue(), "image/png")
@@ -0,0 +1,58 @@
+import numpy as np
+
+from spamshield.detector import Detector
+from spamshield.local_model import LocalClassifier, featurize, read_labeled
+from spamshield.metrics import METRICS
+
+SPAM  = ["WINNER! claim your free prize now", "urgent: verify your bank password here",
+         "free loan approved, click to claim", "your account is suspended, verify now"]
+HAM   = ["lunch at noon tomorrow?", "the quarterly report is attached",
+         "see you at the station at six", "thanks for the notes from the meeting"]
+TEXTS, LABELS = SPAM + HAM, [1] * len(SPAM) + [0] * len(HAM)
+
+
+def _model():
+    return LocalClassifier(2 ** 12).fit(TEXTS, LABELS, epochs=200)
+
+
+def test_features_are_l2_normalized():
+    indptr, _, values = featurize(["a b c", ""], 2 ** 12)
+    assert list(np.diff(indptr))[1] == 0
+    assert abs(float((values[:indptr[1]] ** 2).sum()) - 1.0) < 1e-5
+
+
+def test_fit_separates_the_training_set():
+    p = _model().predict_proba(TEXTS)
+    assert (p[:len(SPAM)] > 0.5).all() and (p[len(SPAM):] < 0.5).all()
+
+
+def test_band_escalates_and_counts():
+    m = LocalClassifier(2 ** 12)
+    assert m.decide(0.55, 50, 15) is None
+    r = m.decide(0.9, 50, 15)
+    assert (r["verdict"], r["confidence"], r["spam_score"], r["source"]) == ("SPAM", 90, 90, "local")
+    assert m.decide(0.1, 50, 15)["verdict"] == "CLEAN" and m.decide(0.1, 50, 15)["confidence"] == 90
+    assert m.stats() == {"decided": 3, "escalated": 1, "decided_rate": 0.75}
+
+
+def test_save_load_round_trip(tmp_path):
+    m = _model()
+    m.save(tmp_path / "m.npz")
+    back = LocalClassifier.load(tmp_path / "m.npz")
+    assert back.n_features == m.n_features
+    assert np.allclose(back.predict_proba(TEXTS), m.predict_proba(TEXTS))
+
+
+def test_read_labeled_csv_and_jsonl():
+    csv = b"text,label\nwin a prize,spam\nlunch?,ham\nno label,\n"
+    assert read_labeled(csv, "x.csv") == (["win a prize", "lunch?"], [1, 0])
+    jsonl = b'{"message": "win", "spam": true}\n{"message": "hi", "spam": false}\n{"message": "?"}\n'
+    assert read_labeled(jsonl, "x.jsonl") == (["win", "hi"], [1, 0])
+
+
+def test_detector_settles_confident_messages_locally(backend):
+    text = "WINNER! claim your free prize now"
+    assert Detector(backend=backend, local_model=_model(), band=15).analyze_text(text)["source"] == "local"
+    assert not list(METRICS.series("spamshield_model_seconds"))
+    assert "source" not in Detector(backend=backend, local_model=_model(), band=51).analyze_text(text)
+    assert list(METRICS.series("spamshield_model_seconds"))    # the band covers every score: escalated
@@ -0,0 +1,84 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from spamshield.metrics import METRICS, metered
+
+
+class _Slow:
+    """An async client whose completions never finish, or raise ``error``."""
+    def __init__(self, error=None):
+        self.chat, self.completions, self.error = self, self, error
+
+    async def create(self, **kw):
+        if self.error:
+            raise self.error
+        await asyncio.sleep(10)
+
+
+def _counts(name):
+    return {lb["model"]: n for lb, n in METRICS.series(name)}
+
+
+def test_cancellation_is_not_an_error():
+    client = metered(_Slow(), is_async=True)
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(client.chat.completions.create(model="m"), 0.01)
+    asyncio.run(main())
+    assert _counts("spamshield_model_errors_total") == {}
+    assert _counts("spamshield_model_cancelled_total") == {"m": 1}
+    assert "spamshield_model_cancelled_total" in METRICS.render()
+
+
+def test_errors_are_counted():
+    client = metered(_Slow(ConnectionError("reset")), is_async=True)
+    with pytest.raises(ConnectionError):
+        asyncio.run(client.chat.completions.create(model="m"))
+    assert _counts("spamshield_model_errors_total") == {"m": 1}
+
+
+class _Chunks:
+    """A blocking client streaming ``n`` chunks, the last one carrying usage."""
+    def __init__(self, n=5):
+        self.chat, self.completions, self.n, self.base_url = self, self, n, "http://x"
+
+    def create(self, **kw):
+        for i in range(self.n):
+            usage = SimpleNamespace(prompt_tokens=10, completion_tokens=self.n) if i == self.n - 1 else None
+            yield SimpleNamespace(usage=usage)
+
+
+def _calls(model="m"):
+    return {lb["model"]: h.count for lb, h in METRICS.series("spamshield_model_seconds")}.get(model, 0)
+
+
+def test_finished_stream_records_once_with_usage():
+    stream = metered(_Chunks()).chat.completions.create(model="m", stream=True)
+    assert len(list(stream)) == 5
+    stream.close()
+    assert _calls() == 1
+    assert {lb["type"]: n for lb, n in METRICS.series("spamshield_model_tokens_total")} == {"prompt": 10, "completion": 5}
+
+
+def test_abandoned_streams_are_timed():
+    client = metered(_Chunks())
+    stream = client.chat.completions.create(model="m", stream=True)
+    for _ in stream:
+        break
+    stream.close()
+    assert _calls() == 1
+    never = client.chat.completions.create(model="m", stream=True)
+    del never                                   # a losing hedge, never read
+    assert _calls() == 2
+
+
+def test_wrapped_client_keeps_other_attributes():
+    assert metered(_Chunks()).base_url == "http://x"
+
+
+def test_label_values_are_escaped():
+    METRICS.inc("spamshield_model_errors_total", model='a"b\\c\nd', error="X")
+    assert 'model="a\\"b\\\\c\\nd"' in METRICS.render()
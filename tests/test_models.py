@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from spamshield.detector import Detector
+from spamshield.metrics import METRICS
+from spamshield.models import POLICIES, Policy, Router
+from spamshield.prompts import TEXT_MODEL
+
+BIG = "llama-3.3-70b-versatile"
+
+
+def _calls(answers):
+    seen = []
+    def call(model):
+        seen.append(model.name)
+        got = answers[model.name]
+        if isinstance(got, Exception):
+            raise got
+        return got
+    return seen, call
+
+
+def test_confident_verdict_settles_on_the_small_model():
+    seen, call = _calls({TEXT_MODEL: {"verdict": "CLEAN", "confidence": 90}})
+    r = Router().run(POLICIES["*"], call)
+    assert seen == [TEXT_MODEL] and r["model"] == TEXT_MODEL and "escalated" not in r
+
+
+def test_suspicious_escalates_and_records_the_overruled_step():
+    seen, call = _calls({TEXT_MODEL: {"verdict": "SUSPICIOUS", "confidence": 70},
+                         BIG: {"verdict": "SPAM", "confidence": 95}})
+    r = Router().run(POLICIES["*"], call)
+    assert seen == [TEXT_MODEL, BIG] and r["verdict"] == "SPAM" and r["model"] == BIG
+    assert r["escalated"] == [{"model": TEXT_MODEL, "verdict": "SUSPICIOUS", "confidence": 70}]
+    s = Router().stats()[TEXT_MODEL]
+    assert s["escalated"] == 1 and s["compared"] == 1 and s["agreement"] == 0.0
+
+
+def test_low_confidence_escalates():
+    seen, call = _calls({TEXT_MODEL: {"verdict": "CLEAN", "confidence": 40},
+                         BIG: {"verdict": "CLEAN", "confidence": 90}})
+    Router().run(POLICIES["*"], call)
+    assert seen == [TEXT_MODEL, BIG]
+
+
+def test_failed_strong_model_keeps_the_weaker_verdict():
+    _, call = _calls({TEXT_MODEL: {"verdict": "SUSPICIOUS", "confidence": 60}, BIG: RuntimeError("down")})
+    assert Router().run(POLICIES["*"], call)["model"] == TEXT_MODEL
+    _, call = _calls({TEXT_MODEL: RuntimeError("down")})
+    with pytest.raises(RuntimeError):
+        Router().run(POLICIES["*"], call)
+
+
+def test_single_and_load(tmp_path):
+    r = Router.single("local-model")
+    assert r.policy("text").cascade == ("local-model",) and r.policy("image") == POLICIES["image"]
+    path = tmp_path / "models.json"
+    path.write_text(json.dumps({"models": {"m": {"kind": "text", "cost_in": 1.0}},
+                                "policies": {"Email": {"cascade": ["m"], "escalate_below": 80}}}))
+    r = Router.load(path)
+    assert r.policy("text", type("S", (), {"content_type": "Email"})()) == Policy(("m",), 80, ("SUSPICIOUS",))
+    assert r.policy("text").cascade == POLICIES["*"].cascade
+    path.write_text(json.dumps({"policies": {"*": {"cascade": ["nope"]}}}))
+    with pytest.raises(ValueError):
+        Router.load(path)
+
+
+def test_detector_escalates_suspicious_text(backend):
+    r = Detector(backend=backend).analyze_text("Please click the link in this note.")
+    assert r["model"] == BIG and r["escalated"][0]["model"] == TEXT_MODEL
+    assert {lb["model"] for lb, _ in METRICS.series("spamshield_model_seconds")} == {TEXT_MODEL, BIG}
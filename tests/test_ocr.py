@@ -0,0 +1,74 @@
+import base64
+import hashlib
+
+import pytest
+
+from spamshield import ocr
+from spamshield.detector import Detector
+from spamshield.metrics import METRICS
+from spamshield.ocr import OCR, OCRResult
+from spamshield.prompts import TEXT_MODEL, VISION_MODEL, Settings
+
+CLEAN_READ = ("URGENT winner: claim your free prize now, verify your password today", 92.0, 11)
+B64        = base64.b64encode(b"screenshot").decode()
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    """Count ``_read`` calls; the tesseract binary is not needed."""
+    calls, answer = [], [CLEAN_READ]
+    monkeypatch.setattr(ocr, "_read", lambda data, lang: calls.append(data) or answer[0])
+    return calls, answer
+
+
+def test_usable_needs_words_and_confidence():
+    o = OCR(min_confidence=80, min_words=6)
+    assert o.usable(OCRResult("a b c d e f", 80.0, 6, 0.1))
+    assert not o.usable(OCRResult("a b c d e", 95.0, 5, 0.1))
+    assert not o.usable(OCRResult("a b c d e f", 79.9, 6, 0.1))
+    assert o.stats()["to_text"] == 1 and o.stats()["to_vision"] == 2
+
+
+def test_reads_are_cached_per_image_key(reads):
+    calls, _ = reads
+    o = OCR(cache_size=1)
+    assert o.read(b"x", "k1").text == CLEAN_READ[0]
+    assert o.read(b"x", "k1").seconds == 0.0
+    o.read(b"y", "k2"); o.read(b"x", "k1")      # k1 was evicted by k2
+    o.read(b"z"); o.read(b"z")                 # no key, no cache
+    assert len(calls) == 5 and o.stats()["cache_hits"] == 1
+
+
+def _models():
+    return {lb["model"] for lb, _ in METRICS.series("spamshield_model_seconds")}
+
+
+def test_clean_read_takes_the_text_path(backend, reads):
+    r = Detector(backend=backend, ocr=OCR()).analyze_image(B64, "image/png", image_key="k")
+    assert r["verdict"] == "SPAM" and _models() == {TEXT_MODEL}
+    assert [h.count for _, h in METRICS.series("spamshield_ocr_seconds")] == [1]
+
+
+def test_poor_read_falls_back_to_vision(backend, reads):
+    reads[1][0] = ("l0w qua1ity", 40.0, 2)
+    d = Detector(backend=backend, ocr=OCR())
+    d.analyze_image(B64, "image/png", image_key="k")
+    assert _models() == {VISION_MODEL} and d.ocr.stats()["to_vision"] == 1
+
+
+def test_stream_times_the_ocr_stage(backend, reads):
+    ev = list(Detector(backend=backend, ocr=OCR()).stream_image(B64, "image/png", image_key="k"))
+    assert ev[-1][2]["ocr"] > 0 and ev[-1][2]["total"] >= ev[-1][2]["ocr"]
+    assert [h.count for _, h in METRICS.series("spamshield_ocr_seconds")] == [1]
+
+
+def test_explain_falls_back_to_vision_when_the_read_is_unusable(fake, backend, reads):
+    f, _ = fake
+    f.images[hashlib.sha256(B64.encode()).hexdigest()] = "URGENT verify your password, claim your prize"
+    d = Detector(backend=backend, ocr=OCR(), settings=Settings(fast=True))
+    r = d.analyze_image(B64, "image/png")
+    assert r["compact"] and _models() == {TEXT_MODEL}
+    reads[1][0] = ("l0w qua1ity", 40.0, 2)
+    e = d.explain_image(B64, "image/png", r)
+    assert "compact" not in e and e["reason"] and e["verdict"] == r["verdict"]
+    assert _models() == {TEXT_MODEL, VISION_MODEL}
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from spamshield.detector import Detector
+from spamshield.fake_groq import MALFORMED, malform
+from spamshield.parsing import coerce, loads
+from spamshield.prompts import TEXT_MODEL, VISION_MODEL, Settings, parse, parse_compact
+from spamshield.stream import IncrementalJSON
+
+GOOD = {"verdict": "SPAM", "confidence": 90, "reason": "x", "signals": [{"label": "a", "severity": "high"}],
+        "spam_score": 90}
+
+
+@pytest.mark.parametrize("kind", [k for k in MALFORMED if k != "prose_only"])
+def test_repairs_what_small_models_emit(kind):
+    out = loads(malform(json.dumps(GOOD), kind))
+    assert out["verdict"] == "SPAM" and out["confidence"] == 90
+
+
+def test_prose_only_is_unrepairable():
+    with pytest.raises(json.JSONDecodeError):
+        loads(malform(json.dumps(GOOD), "prose_only"))
+
+
+def test_coerce():
+    r = coerce({"verdict": " spam ", "confidence": "85%", "spam_score": 0.7, "signals": "caps"})
+    assert r == {"verdict": "SPAM", "confidence": 85, "spam_score": 70, "signals": [{"label": "caps", "severity": "low"}]}
+
+
+def test_parse_compact():
+    r = parse_compact('{"v":"U","c":"62%","k":"P"}')
+    assert (r["verdict"], r["confidence"], r["category"], r["compact"]) == ("SUSPICIOUS", 62, "Phishing", True)
+    assert parse_compact(json.dumps(GOOD))["verdict"] == "SPAM"       # full replies pass through
+    assert parse("```json\n" + json.dumps(GOOD) + "\n```")["spam_score"] == 90
+
+
+def test_incremental_fields_as_they_complete():
+    j = IncrementalJSON()
+    got = [j.feed(c) for c in ('```json\n{"verd', 'ict":"SPAM", "confi', 'dence": 9',
+                               '0, "signals":[{"a":"}"}],"reason":"a, b"}', ' trailing')]
+    assert got[1] == [("verdict", "SPAM")] and got[2] == []
+    assert got[3] == [("confidence", 90), ("signals", [{"a": "}"}]), ("reason", "a, b")]
+    assert j.done and j.fields["reason"] == "a, b"
+
+
+class _Replies:
+    """A blocking client stub answering with ``replies`` in turn; records each call's model."""
+    def __init__(self, *replies):
+        self.replies, self.models = list(replies), []
+        self.chat = self.completions = self
+
+    def create(self, **kw):
+        self.models.append(kw["model"])
+        msg = type("M", (), {"content": self.replies.pop(0)})
+        return type("R", (), {"choices": [type("C", (), {"message": msg})], "usage": None})
+
+
+def test_fix_retry_keeps_the_compact_shape():
+    stub = _Replies("It is spam, clearly.", '{"v":"S","c":91,"k":"P"}')
+    r = Detector(client=stub, settings=Settings(fast=True)).complete_text("Claim your prize")
+    assert (r["verdict"], r["confidence"], r["compact"]) == ("SPAM", 91, True)
+    assert stub.models == [TEXT_MODEL, TEXT_MODEL]
+
+
+def test_fix_retry_goes_to_the_model_that_answered():
+    stub = _Replies("It is spam, clearly.", json.dumps(GOOD))
+    assert Detector(client=stub).analyze_image("aGVsbG8=", "image/png")["verdict"] == "SPAM"
+    assert stub.models == [VISION_MODEL, VISION_MODEL]
@@ -0,0 +1,38 @@
+from spamshield.prompts import Settings
+from spamshield.rules import Chain, RuleEngine
+from spamshield.urls import UrlAnalyzer
+
+PHISH = ("URGENT: your account is suspended!! Verify your password and OTP immediately at "
+         "http://paypal-login-secure.xyz/verify or call +1 800 555 0199 now!!")
+
+
+def test_decisive_phish_skips_the_model():
+    r = RuleEngine().check(PHISH)
+    assert r["verdict"] == "SPAM" and r["source"] == "rules" and r["spam_score"] >= 80
+    assert r["category"] == "Phishing"
+
+
+def test_ordinary_message_goes_to_the_model():
+    assert RuleEngine().check("Team meeting moved to 3pm, agenda attached.") is None
+
+
+def test_disabled_checks_are_ignored():
+    off = Settings(check_phishing=False, check_urgency=False)
+    assert RuleEngine().score(PHISH, off)[0] < RuleEngine().score(PHISH)[0]
+
+
+def test_idn_homograph_alone_is_decisive():
+    r = RuleEngine(urls=UrlAnalyzer()).check("Your statement is ready: https://xn--pple-43d.com/statement")
+    assert r is not None and r["verdict"] == "SPAM"
+
+
+def test_clean_short_circuit_is_opt_in():
+    assert RuleEngine(clean_below=0.05).check("Team meeting moved to 3pm.")["verdict"] == "CLEAN"
+
+
+def test_chain_first_decisive_wins():
+    class Always:
+        def check(self, text, settings=None):
+            return {"verdict": "CLEAN", "source": "local"}
+    assert Chain(None, RuleEngine(), Always()).check(PHISH)["source"] == "rules"
+    assert Chain(RuleEngine(), Always()).check("hello there")["source"] == "local"
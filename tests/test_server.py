@@ -0,0 +1,59 @@
+import http.client
+import json
+import socket
+import threading
+
+import pytest
+
+from spamshield.detector import Detector
+from spamshield.server import MAX_BODY, make_server
+
+
+@pytest.fixture
+def api(backend):
+    srv = make_server(Detector(backend=backend), port=0)
+    threading.Thread(target=srv.serve_forever, args=(0.05,), daemon=True).start()
+    yield srv.server_address[1]
+    srv.shutdown()
+
+
+def post(port, path, body, headers=None):
+    c = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    c.request("POST", path, body=body, headers=headers or {"Content-Type": "application/json"})
+    r = c.getresponse()
+    return r.status, json.loads(r.read()), r.getheader("Connection")
+
+
+def raw(port, head):
+    """The status line, read to end of stream: times out unless the server closes."""
+    with socket.create_connection(("127.0.0.1", port), timeout=2) as s:
+        s.sendall(head)
+        data = b""
+        while chunk := s.recv(65536):
+            data += chunk
+        return data.split(b"\r\n", 1)[0]
+
+
+def test_analyze_text(api):
+    status, res, _ = post(api, "/v1/analyze/text", json.dumps({"text": "Lunch at noon tomorrow?"}))
+    assert status == 200 and res["verdict"] == "CLEAN"
+
+
+def test_bad_json_is_400(api):
+    status, res, conn = post(api, "/v1/analyze/text", "{nope")
+    assert status == 400 and conn is None
+
+
+@pytest.mark.parametrize("length, code", [(b"abc", b"400"), (b"-5", b"400"), (str(MAX_BODY + 1).encode(), b"413")])
+def test_bad_content_length_closes(api, length, code):
+    assert code in raw(api, b"POST /v1/analyze/text HTTP/1.1\r\nHost: x\r\nContent-Length: " + length + b"\r\n\r\n")
+
+
+def test_unknown_post_path_closes(api):
+    assert b"404" in raw(api, b"POST /nope HTTP/1.1\r\nHost: x\r\nContent-Length: 2\r\n\r\n{}")
+
+
+def test_decide_reapplies_threshold(api):
+    _, res, _ = post(api, "/v1/analyze/text", json.dumps({"text": "URGENT winner! Claim your free prize now, act now"}))
+    status, out, _ = post(api, "/v1/decide", json.dumps({"results": [res], "threshold": 100}))
+    assert status == 200 and out["results"][0]["raw"] == res["raw"]
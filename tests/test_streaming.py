@@ -0,0 +1,76 @@
+from spamshield import Detector
+from spamshield.backends import GroqBackend
+from spamshield.decision import MODE_SHIFT
+from spamshield.fake_groq import FakeGroq
+from spamshield.models import Router
+from spamshield.prompts import TEXT_MODEL, Settings
+
+
+def _stream(reply, text="Please verify your account details soon."):
+    f = FakeGroq(latency=0.0, reply=reply, chunk_chars=3)
+    srv, url = f.serve()
+    try:
+        return list(Detector(backend=GroqBackend("x", url, max_retries=0)).stream_text(text))
+    finally:
+        srv.shutdown()
+
+
+def test_verdict_event_waits_for_confidence():
+    ev = _stream('{"verdict":"SUSPICIOUS","confidence":40,"reason":"odd link","signals":[],'
+                 '"spam_score":40,"category":"Scam","sentiment":"Neutral"}')
+    kinds = [e for e, _, _ in ev]
+    assert kinds[0] == "verdict" and kinds[-1] == "done"
+    first = ev[0][1]
+    assert first["verdict"] == "SUSPICIOUS" and first["confidence"] == 40
+    assert "raw" not in first
+    assert ev[-1][1]["raw"]["confidence"] == 40
+
+
+def test_verdict_then_fields_in_order():
+    ev = _stream('{"verdict":"CLEAN","confidence":90,"reason":"fine","signals":[],'
+                 '"spam_score":5,"category":"Legitimate","sentiment":"Neutral"}')
+    assert [e for e, _, _ in ev].count("verdict") == 1
+    assert ev[-1][2]["first_verdict"] <= ev[-1][2]["total"]
+
+
+def test_final_result_is_coerced_like_blocking_path():
+    ev = _stream('{"verdict":"spam","confidence":"85%","reason":"x","signals":"link",'
+                 '"spam_score":"90","category":"Scam","sentiment":"Alarming"}')
+    done = ev[-1][1]
+    assert done["verdict"] == "SPAM" and done["confidence"] == 85 and done["spam_score"] == 90
+    assert done["signals"] == [{"label": "link", "severity": "low"}]
+
+
+def test_final_result_repairs_keys_the_reader_drops():
+    ev = _stream("{'verdict': 'SPAM', 'confidence': 80, 'reason': 'x', 'signals': [], "
+                 "'spam_score': 80, 'category': 'Scam', 'sentiment': 'Neutral'}")
+    assert ev[-1][1]["verdict"] == "SPAM" and ev[-1][1]["reason"] == "x"
+
+
+def _modes(reply, mode):
+    f = FakeGroq(latency=0.0, reply=reply, chunk_chars=3)
+    srv, url = f.serve()
+    try:
+        d = Detector(backend=GroqBackend("x", url, max_retries=0), router=Router.single(TEXT_MODEL))
+        return list(d.stream_text("Please verify your account details soon.", Settings(mode=mode)))
+    finally:
+        srv.shutdown()
+
+
+def test_partial_verdict_is_the_final_one():
+    replies = ('{"verdict":"CLEAN","confidence":40,"reason":"ok","signals":[],"spam_score":5}',
+               '{"verdict":"SUSPICIOUS","confidence":45,"reason":"odd","signals":[],"spam_score":20}',
+               '{"verdict":"CLEAN","confidence":70,"reason":"ok","signals":[],"spam_score":60}')
+    for reply in replies:
+        for mode in MODE_SHIFT:
+            ev = _modes(reply, mode)
+            verdicts = [r for e, r, _ in ev if e == "verdict"]
+            assert len(verdicts) == 1
+            assert (verdicts[0]["verdict"], verdicts[0]["confidence"]) == (ev[-1][1]["verdict"], ev[-1][1]["confidence"])
+
+
+def test_escalation_streams_one_verdict_event(backend):
+    ev = list(Detector(backend=backend).stream_text("Please click the link in this note."))
+    kinds = [e for e, _, _ in ev]
+    assert kinds.count("verdict") == 1 and kinds.count("escalate") == 1
+    assert ev[-1][1]["model"] == "llama-3.3-70b-versatile"
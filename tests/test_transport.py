@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+import pytest
+
+from spamshield.backends import ClassifierBackend, Unsupported
+from spamshield.detector import Detector
+from spamshield.transport import CircuitBreaker, CircuitOpen, ResilientCaller
+
+
+class _Status(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.status_code = code
+
+
+def _half_open():
+    b = CircuitBreaker(failures=1, reset_after=0.01)
+    b.allow(); b.record(False)
+    time.sleep(0.02)
+    return b
+
+
+def test_half_open_admits_one_probe():
+    b = _half_open()
+    b.allow()
+    assert b.state == "half-open"
+    with pytest.raises(CircuitOpen):
+        b.allow()
+    b.record(True)
+    assert b.state == "closed"
+    b.allow()
+
+
+def test_failed_probe_reopens():
+    b = _half_open()
+    b.allow(); b.record(False)
+    assert b.state == "open"
+    with pytest.raises(CircuitOpen):
+        b.allow()
+
+
+def test_bad_request_closes_half_open_breaker():
+    caller = ResilientCaller(retries=0, breaker=_half_open())
+
+    def create(**kw):
+        raise _Status(400)
+    with pytest.raises(_Status):
+        caller.call(create)
+    assert caller.breaker.state == "closed"
+
+
+def test_local_error_releases_half_open_probe():
+    caller = ResilientCaller(retries=0, breaker=_half_open())
+
+    def create(**kw):
+        raise ValueError("bad")
+    with pytest.raises(ValueError):
+        caller.call(create)
+    assert caller.breaker.state == "half-open"
+    caller.breaker.allow()                  # the slot is free for the next probe
+
+
+def test_local_errors_leave_breaker_closed():
+    class Stub:
+        def predict_proba(self, texts):
+            return [0.1 for _ in texts]
+    d = Detector(backend=ClassifierBackend(Stub()), caller=ResilientCaller(retries=0))
+    for _ in range(d.caller.breaker.failures + 1):
+        with pytest.raises(Unsupported):
+            d.analyze_image("aGk=", "image/png")
+    assert d.caller.breaker.state == "closed"
+    assert d.analyze_text("see you at lunch")["verdict"] == "CLEAN"
+
+
+def test_cancelled_probe_releases():
+    caller = ResilientCaller(retries=0, breaker=_half_open())
+
+    async def create(**kw):
+        await asyncio.sleep(10)
+
+    async def main():
+        task = asyncio.ensure_future(caller.acall(create))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    asyncio.run(main())
+    caller.breaker.allow()                  # the next caller gets to probe
+
+
+def test_retries_then_closes():
+    calls = []
+
+    def create(**kw):
+        calls.append(kw)
+        if len(calls) < 3:
+            raise _Status(503)
+        return "ok"
+    caller = ResilientCaller(retries=3, backoff=0)
+    assert caller.call(create) == "ok"
+    assert caller.counts["retries"] == 2 and caller.breaker.state == "closed"
+    assert calls[0]["timeout"] == caller.timeout
+
+
+def test_plain_shares_breaker_without_hedging():
+    caller = ResilientCaller(hedge=True)
+    plain  = caller.plain()
+    assert not plain.hedge and plain.breaker is caller.breaker and plain.counts is caller.counts
+    assert ResilientCaller().plain().hedge is False
+
+
+def test_bulk_paths_do_not_hedge(backend):
+    d = Detector(backend=backend, caller=ResilientCaller(hedge=True, retries=0))
+    assert d.bulk.caller.hedge is False and d.caller.hedge is True
+    assert d.async_engine().caller.hedge is False
+    res = d.analyze_batch([("a", "hello, lunch at noon?"), ("b", "see you then")])
+    assert set(res) == {"a", "b"}
+    assert d.caller.counts["hedges"] == 0
@@ -0,0 +1,47 @@
+import pytest
+
+from spamshield.urls import Blocklist, UrlAnalyzer, host_of, mixed_script, registered
+
+
+def names(ua, url):
+    return [(s[0], s[2]) for s in ua.analyze_host(*host_of(url))]
+
+
+@pytest.fixture
+def ua():
+    return UrlAnalyzer()
+
+
+@pytest.mark.parametrize("url", ["jobs.apply.io", "phase.dev", "uses.tech", "finance.com",
+                                 "paypal.com", "www.amazon.co.uk", "日本example.jp"])
+def test_no_false_positives(ua, url):
+    assert names(ua, url) == []
+
+
+@pytest.mark.parametrize("url, name", [("paypall.com", "url_typosquat"), ("amazom.co.uk", "url_typosquat"),
+                                       ("paypa1.com", "url_homoglyph"), ("paypal.secure-login.top", "url_brand")])
+def test_lookalikes(ua, url, name):
+    assert names(ua, url)[-1][0] == name
+
+
+def test_typos_only_on_the_registered_name(ua):
+    assert names(ua, "paypall.example.com") == []
+    assert names(ua, "login.paypall.com") == [("url_typosquat", "high")]
+
+
+def test_idn_homograph_is_critical(ua):
+    assert ("url_idn", "critical") in names(ua, "xn--pple-43d.com")     # Cyrillic а
+    assert mixed_script("pаypal") and not mixed_script("shop日本")
+
+
+def test_registered():
+    assert registered("a.b.example.co.uk") == "example.co.uk"
+    assert registered("a.example.com") == "example.com"
+
+
+def test_blocklist_matches_parents(tmp_path):
+    bl = Blocklist.from_domains(["evil.top", "# comment"])
+    assert bl.match("login.evil.top") == "evil.top" and bl.match("good.top") is None
+    bl.save(tmp_path / "bl.bin")
+    assert len(Blocklist.load(tmp_path / "bl.bin")) == 1
+    assert names(UrlAnalyzer(blocklist=bl), "evil.top")[0] == ("url_blocklist", "critical")